@@ -0,0 +1,27 @@
+"""Add composite indexes for keyset pagination of tasks
+
+Revision ID: 0003_task_pagination_indexes
+Revises: 0002_add_chat_tables
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_task_pagination_indexes'
+down_revision = '0002_add_chat_tables'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_tasks_user_completed_created_at', 'tasks', ['user_id', 'completed', 'created_at', 'id'], unique=False)
+    op.create_index('ix_tasks_user_completed_title', 'tasks', ['user_id', 'completed', 'title', 'id'], unique=False)
+    op.create_index('ix_tasks_user_completed_due_date', 'tasks', ['user_id', 'completed', 'due_date', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_user_completed_due_date', table_name='tasks')
+    op.drop_index('ix_tasks_user_completed_title', table_name='tasks')
+    op.drop_index('ix_tasks_user_completed_created_at', table_name='tasks')
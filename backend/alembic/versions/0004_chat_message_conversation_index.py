@@ -0,0 +1,49 @@
+"""Add chat_messages.conversation_id and its history index
+
+Migration 0002 created chat_messages without the conversation_id column that
+the ChatMessage model declares. Add it with its foreign key, plus a composite
+(conversation_id, created_at, id) index for paginated history reads.
+
+Revision ID: 0004_chat_message_conversation_index
+Revises: 0003_task_pagination_indexes
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_chat_message_conversation_index'
+down_revision = '0003_task_pagination_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    columns = {c['name'] for c in sa.inspect(bind).get_columns('chat_messages')}
+
+    if 'conversation_id' not in columns:
+        with op.batch_alter_table('chat_messages') as batch_op:
+            batch_op.add_column(sa.Column('conversation_id', sa.Integer(), nullable=True))
+        # Without the column no message could be tied to a conversation, so any
+        # existing rows are unreachable; drop them before making it NOT NULL.
+        op.execute('DELETE FROM chat_messages WHERE conversation_id IS NULL')
+        with op.batch_alter_table('chat_messages') as batch_op:
+            batch_op.alter_column('conversation_id', existing_type=sa.Integer(), nullable=False)
+            batch_op.create_foreign_key(
+                'fk_chat_messages_conversation_id', 'chat_conversations', ['conversation_id'], ['id']
+            )
+
+    op.create_index(
+        'ix_chat_messages_conversation_created_at', 'chat_messages',
+        ['conversation_id', 'created_at', 'id'], unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chat_messages_conversation_created_at', table_name='chat_messages')
+    with op.batch_alter_table('chat_messages') as batch_op:
+        batch_op.drop_constraint('fk_chat_messages_conversation_id', type_='foreignkey')
+        batch_op.drop_column('conversation_id')
@@ -0,0 +1,35 @@
+"""Add per-user task counters for the dashboard stats endpoint
+
+Revision ID: 0006_task_stats
+Revises: 0005_task_full_text_search
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_task_stats'
+down_revision = '0005_task_full_text_search'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'task_stats',
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('completed', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+    # seed the counters from the tasks that already exist
+    op.execute(
+        "INSERT INTO task_stats (user_id, total, completed) "
+        "SELECT user_id, count(*), sum(CASE WHEN completed THEN 1 ELSE 0 END) FROM tasks GROUP BY user_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('task_stats')
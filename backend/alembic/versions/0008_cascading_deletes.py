@@ -0,0 +1,38 @@
+"""Cascade conversation deletes to their messages
+
+Recreate fk_chat_messages_conversation_id with ON DELETE CASCADE so the
+database removes a conversation's messages with it. Messages whose
+conversation is already gone are dropped first; they would violate the
+constraint when the table is rebuilt.
+
+Revision ID: 0008_cascading_deletes
+Revises: 0007_jobs
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_cascading_deletes'
+down_revision = '0007_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute('DELETE FROM chat_messages WHERE conversation_id NOT IN (SELECT id FROM chat_conversations)')
+    with op.batch_alter_table('chat_messages') as batch_op:
+        batch_op.drop_constraint('fk_chat_messages_conversation_id', type_='foreignkey')
+        batch_op.create_foreign_key(
+            'fk_chat_messages_conversation_id', 'chat_conversations', ['conversation_id'], ['id'],
+            ondelete='CASCADE',
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('chat_messages') as batch_op:
+        batch_op.drop_constraint('fk_chat_messages_conversation_id', type_='foreignkey')
+        batch_op.create_foreign_key(
+            'fk_chat_messages_conversation_id', 'chat_conversations', ['conversation_id'], ['id']
+        )
@@ -0,0 +1,40 @@
+"""Add the import progress table
+
+Revision ID: 0009_imports
+Revises: 0008_cascading_deletes
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_imports'
+down_revision = '0008_cascading_deletes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'imports',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('lines', sa.Integer(), nullable=False),
+        sa.Column('tasks', sa.Integer(), nullable=False),
+        sa.Column('conversations', sa.Integer(), nullable=False),
+        sa.Column('messages', sa.Integer(), nullable=False),
+        sa.Column('conversation_ids', sa.JSON(), nullable=False),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_imports_user_id'), 'imports', ['user_id'])
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_imports_user_id'), table_name='imports')
+    op.drop_table('imports')
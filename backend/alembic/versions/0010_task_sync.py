@@ -0,0 +1,37 @@
+"""Add the delta sync index and task tombstones
+
+Revision ID: 0010_task_sync
+Revises: 0009_imports
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010_task_sync'
+down_revision = '0009_imports'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_tasks_user_updated_at', 'tasks', ['user_id', 'updated_at', 'id'])
+    op.create_table(
+        'task_tombstones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_task_tombstones_user_deleted_at', 'task_tombstones', ['user_id', 'deleted_at', 'id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_task_tombstones_user_deleted_at', table_name='task_tombstones')
+    op.drop_table('task_tombstones')
+    op.drop_index('ix_tasks_user_updated_at', table_name='tasks')
@@ -0,0 +1,35 @@
+"""Add the pending due-date index and the reminder scanner state
+
+Revision ID: 0011_deadlines
+Revises: 0010_task_sync
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011_deadlines'
+down_revision = '0010_task_sync'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_tasks_pending_due', 'tasks', ['due_date', 'id'],
+        sqlite_where=sa.text('completed = 0 AND due_date IS NOT NULL'),
+        postgresql_where=sa.text('completed = false AND due_date IS NOT NULL'),
+    )
+    op.create_table(
+        'reminder_scans',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('scanned_through', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('reminder_scans')
+    op.drop_index('ix_tasks_pending_due', table_name='tasks')
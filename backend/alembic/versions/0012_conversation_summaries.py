@@ -0,0 +1,36 @@
+"""Add message counts and last-message previews to conversations
+
+Adds the denormalized summary columns to chat_conversations; 0013 fills them
+in from chat_messages.
+
+Revision ID: 0012_conversation_summaries
+Revises: 0011_deadlines
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012_conversation_summaries'
+down_revision = '0011_deadlines'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('chat_conversations', sa.Column('message_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('chat_conversations', sa.Column('last_message_at', sa.DateTime(), nullable=True))
+    op.add_column('chat_conversations', sa.Column('last_message_snippet', sa.String(length=200), nullable=True))
+    op.create_index(
+        'ix_chat_conversations_user_updated_at', 'chat_conversations', ['user_id', 'updated_at', 'id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chat_conversations_user_updated_at', table_name='chat_conversations')
+    with op.batch_alter_table('chat_conversations') as batch_op:
+        batch_op.drop_column('last_message_snippet')
+        batch_op.drop_column('last_message_at')
+        batch_op.drop_column('message_count')
@@ -0,0 +1,48 @@
+"""Backfill conversation message counts and previews
+
+Fills in the summary columns added by 0012 from chat_messages, one UPDATE per
+1000 conversation ids. The UPDATEs run outside the migration transaction
+(`autocommit_block`), each committing on its own, so no lock is held longer
+than one batch and writers get in between. Every batch recomputes from
+chat_messages, so running the migration again after an interruption is safe.
+
+Revision ID: 0013_backfill_conversation_summaries
+Revises: 0012_conversation_summaries
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0013_backfill_conversation_summaries'
+down_revision = '0012_conversation_summaries'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+BACKFILL = sa.text(
+    "UPDATE chat_conversations SET "
+    "message_count = (SELECT count(*) FROM chat_messages m WHERE m.conversation_id = chat_conversations.id), "
+    "last_message_at = (SELECT max(m.created_at) FROM chat_messages m "
+    "WHERE m.conversation_id = chat_conversations.id), "
+    "last_message_snippet = (SELECT substr(m.content, 1, 200) FROM chat_messages m "
+    "WHERE m.conversation_id = chat_conversations.id ORDER BY m.created_at DESC, m.id DESC LIMIT 1) "
+    "WHERE id > :low AND id <= :high"
+)
+
+
+def upgrade() -> None:
+    # commits the migration transaction so far; each statement below is its own transaction
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        top = conn.execute(sa.text("SELECT max(id) FROM chat_conversations")).scalar() or 0
+        for low in range(0, top, BACKFILL_BATCH_SIZE):
+            conn.execute(BACKFILL, {"low": low, "high": low + BACKFILL_BATCH_SIZE})
+
+
+def downgrade() -> None:
+    # the columns go with 0012's downgrade
+    pass
@@ -0,0 +1,148 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from .metrics import observe_phase
+
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL = float(os.environ.get("AUTH_CACHE_TTL", "300"))
+
+
+class TokenCache:
+    """Bounded LRU cache of verified tokens.
+
+    Maps the SHA-256 digest of a token (never the token itself) to its user id.
+    Entries expire at the token's `exp` claim or after `ttl` seconds, whichever
+    comes first.
+    """
+
+    def __init__(self, maxsize: int = AUTH_CACHE_SIZE, ttl: float = AUTH_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[str]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                user_id, expires_at = entry
+                if expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return user_id
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token: str, user_id: str, exp: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (user_id, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Read once at startup; use `configure()` to change it at runtime (e.g. in tests).
+_jwt_secret = os.environ.get('JWT_SECRET')
+token_cache = TokenCache()
+
+
+def configure(secret: Optional[str]) -> None:
+    """Set the JWT secret and drop every cached verification."""
+    global _jwt_secret
+    _jwt_secret = secret
+    token_cache.clear()
+
+
+def verify_token(token: str, cache: Optional[TokenCache] = token_cache) -> str:
+    """Return the user id for a bearer token.
+
+    If a JWT secret is configured, verify the HS256 JWT (expect `sub` claim as user id),
+    consulting `cache` first. Otherwise, for convenience in local dev, treat the token
+    string as the user id.
+    """
+    if not _jwt_secret:
+        # Fallback: treat token as user_id (dev only)
+        return token
+
+    if cache is not None:
+        user_id = cache.get(token)
+        if user_id is not None:
+            return user_id
+
+    import jwt  # deferred: only needed once a secret is configured
+
+    start = time.perf_counter()
+    try:
+        payload = jwt.decode(token, _jwt_secret, algorithms=["HS256"])
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid JWT token")
+    finally:
+        observe_phase("auth", time.perf_counter() - start)
+    user_id = payload.get('sub') or payload.get('user_id')
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+    if cache is not None:
+        cache.put(token, user_id, payload.get('exp'))
+    return user_id
+
+
+def get_current_user(authorization: Optional[str] = Header(None)) -> str:
+    """Auth dependency shared by all routers."""
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Missing Authorization header")
+    parts = authorization.split()
+    if len(parts) != 2 or parts[0].lower() != "bearer":
+        raise HTTPException(status_code=401, detail="Invalid Authorization header")
+    return verify_token(parts[1])
+
+
+def require_admin(authorization: Optional[str] = Header(None)) -> None:
+    """Admin guard for the operational endpoints (`/api/admin/*`, `/metrics`).
+
+    If `ADMIN_TOKEN` is set, require `Authorization: Bearer <ADMIN_TOKEN>`.
+    Otherwise admin endpoints are only served in development.
+    """
+    admin_token = os.environ.get('ADMIN_TOKEN')
+    if admin_token:
+        if authorization != f"Bearer {admin_token}":
+            raise HTTPException(status_code=403, detail="Admin token required")
+        return
+    if os.environ.get("ENV", "development") != "development":
+        raise HTTPException(status_code=404, detail="Not Found")
@@ -0,0 +1,47 @@
+"""Per-request auth overhead with and without the verified-token cache.
+
+    python -m backend.benchmarks.bench_auth --iterations 100000
+"""
+import argparse
+import json
+import time
+
+import jwt
+
+from backend import auth
+
+
+def _per_call_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    secret = "bench-secret"
+    auth.configure(secret)
+    token = jwt.encode({"sub": "bench-user", "exp": int(time.time()) + 3600}, secret, algorithm="HS256")
+    header = f"Bearer {token}"
+    cache = auth.TokenCache()
+
+    uncached = _per_call_us(lambda: auth.verify_token(token, cache=None), args.iterations)
+    cached = _per_call_us(lambda: auth.verify_token(token, cache=cache), args.iterations)
+    dependency = _per_call_us(lambda: auth.get_current_user(header), args.iterations)
+
+    print(json.dumps({
+        "iterations": args.iterations,
+        "uncached_us_per_call": round(uncached, 2),
+        "cached_us_per_call": round(cached, 2),
+        "get_current_user_cached_us_per_call": round(dependency, 2),
+        "speedup": round(uncached / cached, 1),
+        "cache": cache.stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Bulk task endpoints vs. the equivalent number of single-row calls.
+
+Runs in-process against a throwaway SQLite database:
+
+    python -m backend.benchmarks.bench_bulk --items 200
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="bench-bulk-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from backend import models  # noqa: E402,F401
+from backend.db import create_db_and_tables  # noqa: E402
+from backend.main import app  # noqa: E402
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=200)
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    client = TestClient(app)
+    n = args.items
+    single = {"Authorization": "Bearer bench-single"}
+    bulk = {"Authorization": "Bearer bench-bulk"}
+    single_ids, bulk_ids = [], []
+
+    def create_single():
+        for i in range(n):
+            single_ids.append(client.post("/api/tasks", json={"title": f"task {i}"}, headers=single).json()["id"])
+
+    def create_bulk():
+        resp = client.post("/api/tasks/bulk", json={"items": [{"title": f"task {i}"} for i in range(n)]}, headers=bulk)
+        bulk_ids.extend(r["id"] for r in resp.json()["results"])
+
+    def update_single():
+        for task_id in single_ids:
+            client.put(f"/api/tasks/{task_id}", json={"completed": True}, headers=single)
+
+    def update_bulk():
+        client.patch("/api/tasks/bulk", json={"items": [{"id": i, "completed": True} for i in bulk_ids]}, headers=bulk)
+
+    def delete_single():
+        for task_id in single_ids:
+            client.delete(f"/api/tasks/{task_id}", headers=single)
+
+    def delete_bulk():
+        client.request("DELETE", "/api/tasks/bulk", json={"ids": bulk_ids}, headers=bulk)
+
+    results = {}
+    for op, single_fn, bulk_fn in (
+        ("create", create_single, create_bulk),
+        ("update", update_single, update_bulk),
+        ("delete", delete_single, delete_bulk),
+    ):
+        single_s, bulk_s = _timed(single_fn), _timed(bulk_fn)
+        results[op] = {
+            "items": n,
+            "single_calls_s": round(single_s, 4),
+            "bulk_call_s": round(bulk_s, 4),
+            "speedup": round(single_s / bulk_s, 1),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
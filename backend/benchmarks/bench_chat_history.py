@@ -0,0 +1,93 @@
+"""Chat history reads on a conversation with many messages.
+
+Seeds one conversation on a throwaway SQLite database and compares loading the
+full history with the paginated windows:
+
+    python -m backend.benchmarks.bench_chat_history --messages 100000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp(prefix="bench-history-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from backend.db import create_db_and_tables, engine  # noqa: E402
+from backend.main import app  # noqa: E402
+from backend.models import ChatConversation, ChatMessage  # noqa: E402
+
+USER = "bench-history"
+
+
+def seed(messages: int) -> int:
+    with engine.begin() as conn:
+        conv_id = conn.execute(insert(ChatConversation).values(
+            user_id=USER, title="bench", created_at=datetime.utcnow(), updated_at=datetime.utcnow(),
+        )).inserted_primary_key[0]
+        start = datetime.utcnow() - timedelta(seconds=messages)
+        batch = []
+        for i in range(messages):
+            batch.append({
+                "user_id": USER, "conversation_id": conv_id, "content": f"message {i}",
+                "sender": "user" if i % 2 == 0 else "bot", "created_at": start + timedelta(seconds=i),
+            })
+            if len(batch) == 10000:
+                conn.execute(insert(ChatMessage), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(ChatMessage), batch)
+    return conv_id
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    conv_id = seed(args.messages)
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {USER}"}
+    url = f"/api/chat/conversations/{conv_id}/messages"
+
+    latest = client.get(url, params={"limit": args.limit}, headers=headers)
+    # a cursor from the middle of the history, as if the user scrolled back halfway
+    cursor = latest.headers["X-Before-Cursor"]
+    for _ in range(args.messages // args.limit // 2):
+        cursor = client.get(url, params={"limit": args.limit, "before": cursor}, headers=headers).headers["X-Before-Cursor"]
+
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT id FROM chat_messages WHERE conversation_id = ? "
+            "ORDER BY created_at DESC, id DESC LIMIT 51", (conv_id,)
+        ).fetchall()
+
+    print(json.dumps({
+        "messages": args.messages,
+        "full_history_ms": _time(lambda: client.get(url, headers=headers), 3),
+        "latest_window_ms": _time(lambda: client.get(url, params={"limit": args.limit}, headers=headers), 10),
+        "scroll_back_midway_ms": _time(
+            lambda: client.get(url, params={"limit": args.limit, "before": cursor}, headers=headers), 10
+        ),
+        "query_plan": [row[-1] for row in plan],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
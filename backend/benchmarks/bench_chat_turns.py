@@ -0,0 +1,68 @@
+"""Chat turns per second (POST .../messages) against a running server.
+
+    uvicorn backend.main:app --port 8000
+    python -m backend.benchmarks.bench_chat_turns --url http://127.0.0.1:8000
+
+Run it once per database backend (SQLite / Postgres via DATABASE_URL) and per
+revision to compare before/after numbers.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--token", default="bench-chat")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=2000)
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.token}"}
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        # one conversation per worker, like independent users chatting
+        conv_ids = []
+        for _ in range(args.concurrency):
+            resp = await client.post("/api/chat/conversations", json={}, headers=headers)
+            conv_ids.append(resp.json()["id"])
+
+        latencies, errors = [], 0
+        remaining = args.turns
+
+        async def worker(conv_id: int):
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                resp = await client.post(
+                    f"/api/chat/conversations/{conv_id}/messages",
+                    json={"content": "how do I complete a task?"},
+                    headers=headers,
+                )
+                latencies.append(time.perf_counter() - start)
+                if resp.status_code != 201:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(c) for c in conv_ids))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(json.dumps({
+        "turns": len(latencies),
+        "errors": errors,
+        "concurrency": args.concurrency,
+        "turns_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""ChatbotService throughput against the previous per-keyword scan.
+
+Generates a deterministic corpus, answers it with both implementations using
+identically seeded RNGs, checks the answers match and reports messages/sec.
+
+    python -m backend.benchmarks.bench_chatbot --messages 100000
+"""
+import argparse
+import json
+import random
+import time
+
+from backend.chatbot_service import ChatbotService, TASK_KEYWORDS
+
+_FILLER = ["please", "can you", "tell me", "the", "weather", "my", "today", "a", "recipe", "quickly", "thanks", "again"]
+_KEYWORDS = list(TASK_KEYWORDS) + ["hello", "completed", "deleted", "sorting", "task list", "HELP"]
+
+
+def legacy_get_response(bot: ChatbotService, rng: random.Random, user_message: str) -> str:
+    """The original implementation, kept verbatim apart from the injected rng."""
+    try:
+        message_lower = (user_message or "").lower().strip()
+        if not message_lower:
+            return "Please type a question about tasks so I can help. For example: 'How do I create a task?'"
+        task_keywords = [
+            "task", "create", "delete", "complete", "done", "due", "deadline",
+            "filter", "sort", "help", "how", "add", "update", "edit",
+        ]
+        if not any(k in message_lower for k in task_keywords):
+            return "I can only help with task management. Please ask about creating, completing, deleting, or managing tasks."
+        for keyword, responses in bot.responses.items():
+            if keyword == "default":
+                continue
+            if keyword in message_lower or _similar_key(keyword, message_lower):
+                return rng.choice(responses)
+        return rng.choice(bot.responses["task"]) if "task" in bot.responses else "I can help with tasks. What would you like to do?"
+    except Exception:
+        return "Sorry, I couldn't process that. Please ask a question about tasks."
+
+
+def _similar_key(keyword: str, message: str) -> bool:
+    keyword_words = set(keyword.split())
+    message_words = set(message.split())
+    return len(keyword_words & message_words) > 0
+
+
+def make_corpus(n: int, seed: int = 1234) -> list:
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(n):
+        words = rng.choices(_FILLER, k=rng.randint(2, 12))
+        for _ in range(rng.choice([0, 0, 1, 1, 2])):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(_KEYWORDS))
+        corpus.append(" ".join(words) + rng.choice(["", "?", "!", "   "]))
+    return corpus
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.messages)
+
+    legacy_bot = ChatbotService()
+    legacy_rng = random.Random(args.seed)
+    start = time.perf_counter()
+    legacy = [legacy_get_response(legacy_bot, legacy_rng, m) for m in corpus]
+    legacy_s = time.perf_counter() - start
+
+    bot = ChatbotService(rng=random.Random(args.seed))
+    start = time.perf_counter()
+    compiled = bot.get_responses(corpus)
+    compiled_s = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(legacy, compiled) if a != b)
+    print(json.dumps({
+        "messages": len(corpus),
+        "legacy_msgs_per_s": round(len(corpus) / legacy_s),
+        "compiled_msgs_per_s": round(len(corpus) / compiled_s),
+        "speedup": round(legacy_s / compiled_s, 2),
+        "mismatches": mismatches,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Requests/sec of GET /api/tasks at increasing client concurrency.
+
+Run against a live server, e.g.:
+
+    uvicorn backend.main:app --port 8000
+    python -m backend.benchmarks.bench_concurrency --url http://127.0.0.1:8000
+
+Point it at a checkout of the previous (sync handler) revision and at the
+current one to compare before/after numbers.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+
+async def _seed(client: httpx.AsyncClient, headers: dict, tasks: int) -> None:
+    existing = (await client.get("/api/tasks", headers=headers)).json()
+    for i in range(len(existing), tasks):
+        resp = await client.post("/api/tasks", json={"title": f"bench task {i}"}, headers=headers)
+        resp.raise_for_status()
+
+
+async def _run_level(url: str, headers: dict, concurrency: int, total: int, path: str) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies = []
+    errors = 0
+    remaining = total
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                try:
+                    resp = await client.get(path, headers=headers)
+                    if resp.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--token", default="bench-user", help="bearer token (user id in dev mode)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--requests", type=int, default=5000, help="requests per concurrency level")
+    parser.add_argument("--tasks", type=int, default=20, help="tasks to seed for the bench user")
+    parser.add_argument("--path", default="/api/tasks?limit=20")
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.token}"}
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        await _seed(client, headers, args.tasks)
+
+    results = []
+    for level in args.concurrency:
+        results.append(await _run_level(args.url, headers, level, args.requests, args.path))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
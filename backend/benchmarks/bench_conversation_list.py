@@ -0,0 +1,112 @@
+"""Conversation list with previews: one request vs. one per conversation.
+
+Seeds `--conversations` conversations of `--messages` messages each for one
+user on a throwaway SQLite database, with their summaries filled in as the
+migration does. It then compares the two ways of getting every conversation
+with its message count and latest message:
+- `n_plus_one`: list the conversations, then fetch each one's messages
+- `summaries`: `GET /api/chat/conversations`, which carries them
+The response cache is off, so every request reaches the database.
+
+    python -m backend.benchmarks.bench_conversation_list --conversations 200 --messages 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp(prefix="bench-conversations-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+# one client making hundreds of requests would hit the chat_read limit
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event, insert  # noqa: E402
+
+from backend import cache  # noqa: E402
+from backend.conversations import refresh_summaries  # noqa: E402
+from backend.db import async_engine, async_session_scope, create_db_and_tables, engine  # noqa: E402
+from backend.main import app  # noqa: E402
+from backend.models import ChatConversation, ChatMessage  # noqa: E402
+
+USER = "bench-conversations"
+
+
+def seed(conversations: int, messages: int) -> list:
+    start = datetime.utcnow() - timedelta(seconds=conversations * messages)
+    with engine.begin() as conn:
+        ids = []
+        for c in range(conversations):
+            conv_id = conn.execute(insert(ChatConversation).values(
+                user_id=USER, title=f"Conversation {c}", created_at=start, updated_at=start,
+            )).inserted_primary_key[0]
+            conn.execute(insert(ChatMessage), [{
+                "user_id": USER, "conversation_id": conv_id, "content": f"message {i} of conversation {c}",
+                "sender": "user" if i % 2 == 0 else "bot",
+                "created_at": start + timedelta(seconds=c * messages + i),
+            } for i in range(messages)])
+            ids.append(conv_id)
+    asyncio.run(_summarize(ids))
+    return ids
+
+
+async def _summarize(ids: list) -> None:
+    try:
+        async with async_session_scope() as session:
+            await refresh_summaries(session, ids)
+            await session.commit()
+    finally:
+        await async_engine.dispose()
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    seed(args.conversations, args.messages)
+    # nothing cached: each request reaches the database
+    cache.configure_cache(cache.MemoryCache(maxsize=0))
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {USER}"}
+
+    def n_plus_one():
+        for conv in client.get("/api/chat/conversations", headers=headers).json():
+            client.get(f"/api/chat/conversations/{conv['id']}/messages", headers=headers).json()
+
+    def summaries():
+        client.get("/api/chat/conversations", headers=headers).json()
+
+    results = {}
+    for name, fn in (("n_plus_one", n_plus_one), ("summaries", summaries)):
+        statements = []
+
+        def count(conn, cursor, statement, *params):
+            statements.append(statement)
+
+        event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+        try:
+            fn()
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+        results[name] = {"ms": _time(fn, args.repeat), "statements": len(statements)}
+    print(json.dumps({"conversations": args.conversations, "messages": args.messages, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Due-soon / overdue pages and the reminder scanner vs. what they replace.
+
+Seeds `--tasks` tasks spread over `--users` users on a throwaway SQLite
+database (or DATABASE_URL); 60% have a due date within a year either side of
+now and 30% are completed. Then times:
+- a user's due-soon and overdue pages (`deadlines.pending_due`) against the
+  pending list sorted by due date that clients fetched to find them
+- one scanner run over the last `--window` seconds of deadlines, with and
+  without the `ix_tasks_pending_due` partial index
+
+    python -m backend.benchmarks.bench_deadlines --tasks 10000000 --users 10000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp(prefix="bench-deadlines-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+
+from sqlalchemy import insert, text  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from backend import deadlines  # noqa: E402
+from backend.db import async_engine, create_db_and_tables, engine  # noqa: E402
+from backend.models import ReminderScan, Task  # noqa: E402
+from backend.stats import DUE_SOON_WINDOW  # noqa: E402
+
+
+def seed(tasks: int, users: int, now: datetime) -> None:
+    rng = random.Random(0)
+    year = 365 * 24 * 3600
+    with engine.begin() as conn:
+        batch = []
+        for i in range(tasks):
+            dated = rng.random() < 0.6
+            batch.append({
+                "user_id": f"user{i % users}", "title": f"Task {i}", "completed": rng.random() < 0.3,
+                "due_date": now + timedelta(seconds=rng.uniform(-year, year)) if dated else None,
+                "created_at": now, "updated_at": now,
+            })
+            if len(batch) == 20000:
+                conn.execute(insert(Task), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Task), batch)
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("ANALYZE"))
+
+
+def _time(stmt, repeat: int = 5):
+    best, rows = float("inf"), 0
+    with Session(engine) as session:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = len(session.exec(stmt).all())
+            best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 2), rows
+
+
+def _compare(name: str, page, baseline) -> dict:
+    page_ms, page_rows = _time(page)
+    baseline_ms, baseline_rows = _time(baseline)
+    return {
+        "query": name, "page_ms": page_ms, "baseline_ms": baseline_ms,
+        "speedup": round(baseline_ms / page_ms, 1) if page_ms else None,
+        "rows": [page_rows, baseline_rows],
+    }
+
+
+async def _scan(now: datetime, window: int, repeat: int = 5) -> dict:
+    best, reminded = float("inf"), 0
+    try:
+        for _ in range(repeat):
+            # the scanner does not remind a window twice, so each run is set back by `window`
+            async with deadlines.async_session_scope() as session:
+                scan = await session.get(ReminderScan, deadlines.OVERDUE_SCAN)
+                if scan is None:
+                    scan = ReminderScan(name=deadlines.OVERDUE_SCAN, scanned_through=now)
+                scan.scanned_through = now - timedelta(seconds=window)
+                session.add(scan)
+                await session.commit()
+            start = time.perf_counter()
+            reminded = (await deadlines.scan_overdue(now))["reminded"]
+            best = min(best, time.perf_counter() - start)
+    finally:
+        await async_engine.dispose()
+    return {"ms": round(best * 1000, 2), "reminded": reminded}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=10000000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--window", type=int, default=3600, help="seconds of deadlines one scan covers")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    now = datetime.utcnow()
+    create_db_and_tables()
+    start = time.perf_counter()
+    seed(args.tasks, args.users, now)
+    seed_s = time.perf_counter() - start
+
+    pending = select(*deadlines.TASK_COLUMNS).where(
+        Task.user_id == "user0", Task.completed == False, Task.due_date.isnot(None)  # noqa: E712
+    ).order_by(Task.due_date, Task.id)
+    results = [
+        _compare("due", deadlines.pending_due("user0", now, now + DUE_SOON_WINDOW).limit(args.limit), pending),
+        _compare("overdue", deadlines.pending_due("user0", None, now).limit(args.limit), pending),
+    ]
+    scanner = {"indexed": asyncio.run(_scan(now, args.window))}
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_tasks_pending_due"))
+    scanner["unindexed"] = asyncio.run(_scan(now, args.window))
+    print(json.dumps({
+        "tasks": args.tasks, "users": args.users, "seed_s": round(seed_s, 1), "results": results,
+        "scanner": scanner,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Deleting a conversation with many messages: ORM vs set-based vs batched.
+
+Seeds one conversation with `--messages` messages on a throwaway SQLite
+database and times removing it
+- through the ORM (load every message, `session.delete` each one),
+- with one set-based `DELETE ... WHERE conversation_id = ?`,
+- with `deletion.delete_conversation_messages` (`DELETE_BATCH_SIZE` batches),
+and then a whole-account delete. While each delete runs, a probe inserts a
+task every few milliseconds in its own transaction; its worst latency shows
+how long other writers were locked out:
+
+    python -m backend.benchmarks.bench_deletes --messages 100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp(prefix="bench-deletes-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+
+from sqlalchemy import delete, func, insert  # noqa: E402
+from sqlmodel import select  # noqa: E402
+
+from backend import deletion  # noqa: E402
+from backend.db import async_engine, async_session_scope, create_db_and_tables, engine  # noqa: E402
+from backend.models import ChatConversation, ChatMessage, Task  # noqa: E402
+
+USER = "bench-deletes"
+PROBE_USER = "bench-probe"
+
+
+def seed(messages: int, tasks: int = 0) -> int:
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conv_id = conn.execute(insert(ChatConversation).values(
+            user_id=USER, title="bench", created_at=now, updated_at=now,
+        )).inserted_primary_key[0]
+        start = now - timedelta(seconds=messages)
+        for offset in range(0, messages, 10000):
+            conn.execute(insert(ChatMessage), [{
+                "user_id": USER, "conversation_id": conv_id, "content": f"message {i}",
+                "sender": "user" if i % 2 == 0 else "bot", "created_at": start + timedelta(seconds=i),
+            } for i in range(offset, min(messages, offset + 10000))])
+        if tasks:
+            conn.execute(insert(Task), [{
+                "user_id": USER, "title": f"Task {i}", "completed": False, "created_at": now, "updated_at": now,
+            } for i in range(tasks)])
+    return conv_id
+
+
+async def orm_delete(conv_id: int) -> None:
+    async with async_session_scope() as session:
+        for message in (await session.exec(select(ChatMessage).where(ChatMessage.conversation_id == conv_id))).all():
+            await session.delete(message)
+        await session.delete(await session.get(ChatConversation, conv_id))
+        await session.commit()
+
+
+async def single_delete(conv_id: int) -> None:
+    async with async_session_scope() as session:
+        await session.execute(delete(ChatMessage).where(ChatMessage.conversation_id == conv_id))
+        await session.execute(delete(ChatConversation).where(ChatConversation.id == conv_id))
+        await session.commit()
+
+
+async def batched_delete(conv_id: int) -> None:
+    await deletion.delete_conversation_messages(conv_id)
+    async with async_session_scope() as session:
+        await session.execute(delete(ChatConversation).where(ChatConversation.id == conv_id))
+        await session.commit()
+
+
+async def _probe(stop: asyncio.Event, latencies: list) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        async with async_session_scope() as session:
+            session.add(Task(user_id=PROBE_USER, title="probe"))
+            await session.commit()
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.005)
+
+
+async def _measure(run) -> dict:
+    stop, latencies = asyncio.Event(), []
+    probe = asyncio.create_task(_probe(stop, latencies))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    await run()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+    return {"delete_ms": round(elapsed * 1000, 1),
+            "probe_max_ms": round(max(latencies) * 1000, 1), "probe_writes": len(latencies)}
+
+
+async def _remaining() -> int:
+    async with async_session_scope() as session:
+        return (await session.exec(select(func.count()).select_from(ChatMessage))).one()
+
+
+async def _run(args) -> dict:
+    report = {}
+    strategies = {"orm": orm_delete, "single_statement": single_delete, "batched": batched_delete}
+    for name, strategy in strategies.items():
+        if name == "orm" and args.skip_orm:
+            continue
+        conv_id = seed(args.messages)
+        report[name] = await _measure(lambda: strategy(conv_id))
+        assert await _remaining() == 0, f"{name} left messages behind"
+    seed(args.messages, tasks=args.tasks)
+    report["account"] = await _measure(lambda: deletion.delete_account(USER))
+    await async_engine.dispose()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--tasks", type=int, default=10000, help="tasks of the account in the account delete")
+    parser.add_argument("--skip-orm", action="store_true", help="skip the (slow) ORM strategy")
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    report = asyncio.run(_run(args))
+    print(json.dumps({"messages": args.messages, "batch_size": deletion.DELETE_BATCH_SIZE, **report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Streaming export/import throughput and server memory for large accounts.
+
+Seeds `--rows` tasks for one user on a throwaway SQLite database, starts
+uvicorn on it and streams `GET /api/export` as NDJSON and CSV, sampling the
+server's resident memory while the response is read. The NDJSON export is then
+uploaded to `POST /api/import` for a second user. For comparison, the same rows
+are also materialized as one in-memory JSON list (what a list endpoint without
+a page limit would do), measured in this process:
+
+    python -m backend.benchmarks.bench_export --rows 1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp(prefix="bench-export-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+
+import httpx  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from sqlmodel import select  # noqa: E402
+
+from backend.benchmarks.loadtest import spawn_server, wait_until_up  # noqa: E402
+from backend.db import DATABASE_URL, create_db_and_tables, engine  # noqa: E402
+from backend.models import Task  # noqa: E402
+from backend.routes.tasks import TASK_COLUMNS, TASK_FIELDS  # noqa: E402
+from backend.serialization import dumps, rows_to_dicts  # noqa: E402
+
+USER = "bench-export"
+IMPORT_USER = "bench-import"
+MB = 1024 * 1024
+
+
+def seed(rows: int) -> None:
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        for offset in range(0, rows, 10000):
+            conn.execute(insert(Task), [{
+                "user_id": USER, "title": f"Task {i}", "description": f"Description of task {i}",
+                "completed": i % 3 == 0, "due_date": now + timedelta(days=i % 30) if i % 2 else None,
+                "created_at": now, "updated_at": now,
+            } for i in range(offset, min(rows, offset + 10000))])
+
+
+def rss(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class MemorySampler:
+    """Peak resident memory of a process while a block runs."""
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self.pid, self.interval = pid, interval
+
+    async def __aenter__(self):
+        self.start = self.peak = rss(self.pid)
+        self._task = asyncio.create_task(self._sample())
+        return self
+
+    async def _sample(self):
+        while True:
+            self.peak = max(self.peak, rss(self.pid))
+            await asyncio.sleep(self.interval)
+
+    async def __aexit__(self, *exc):
+        self._task.cancel()
+        self.peak = max(self.peak, rss(self.pid))
+
+    def report(self) -> dict:
+        return {"rss_start_mb": round(self.start / MB, 1), "rss_peak_growth_mb": round((self.peak - self.start) / MB, 1)}
+
+
+async def export(client: httpx.AsyncClient, pid: int, params: dict, path: str = None) -> dict:
+    out = open(path, "wb") if path else None
+    size = 0
+    start = time.perf_counter()
+    async with MemorySampler(pid) as memory:
+        async with client.stream("GET", "/api/export", params=params, headers={"Authorization": f"Bearer {USER}"}) as resp:
+            resp.raise_for_status()
+            async for chunk in resp.aiter_raw():
+                size += len(chunk)
+                if out:
+                    out.write(chunk)
+    elapsed = time.perf_counter() - start
+    if out:
+        out.close()
+    return {"seconds": round(elapsed, 2), "mb": round(size / MB, 1), "mb_per_s": round(size / MB / elapsed, 1),
+            **memory.report()}
+
+
+async def upload(client: httpx.AsyncClient, pid: int, path: str, rows: int) -> dict:
+    async def body():
+        with open(path, "rb") as f:
+            while chunk := f.read(64 * 1024):
+                yield chunk
+
+    start = time.perf_counter()
+    async with MemorySampler(pid) as memory:
+        resp = await client.post("/api/import", content=body(), headers={"Authorization": f"Bearer {IMPORT_USER}"})
+    elapsed = time.perf_counter() - start
+    result = resp.json()
+    assert result["status"] == "succeeded", result
+    return {"seconds": round(elapsed, 2), "rows_per_s": round(rows / elapsed), "tasks": result["tasks"],
+            **memory.report()}
+
+
+async def run(args, pid: int) -> dict:
+    url = f"http://127.0.0.1:{args.port}"
+    await wait_until_up(url)
+    ndjson_path = os.path.join(_tmpdir, "export.ndjson")
+    async with httpx.AsyncClient(base_url=url, timeout=None) as client:
+        report = {}
+        report["ndjson"] = await export(client, pid, {"kind": "tasks"}, ndjson_path)
+        report["ndjson"]["rows_per_s"] = round(args.rows / report["ndjson"]["seconds"])
+        report["csv"] = await export(client, pid, {"kind": "tasks", "format": "csv"})
+        report["csv"]["rows_per_s"] = round(args.rows / report["csv"]["seconds"])
+        if not args.skip_import:
+            report["import"] = await upload(client, pid, ndjson_path, args.rows)
+    return report
+
+
+def in_memory() -> dict:
+    start_rss = rss(os.getpid())
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        rows = conn.execute(select(*TASK_COLUMNS).where(Task.user_id == USER)).all()
+    body = dumps(rows_to_dicts(TASK_FIELDS, rows))
+    peak = rss(os.getpid())
+    return {"seconds": round(time.perf_counter() - start, 2), "mb": round(len(body) / MB, 1),
+            "rss_growth_mb": round((peak - start_rss) / MB, 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--skip-import", action="store_true")
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    seed(args.rows)
+    engine.dispose()
+
+    server = spawn_server(args.port, DATABASE_URL)
+    try:
+        report = asyncio.run(run(args, server.pid))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    report["in_memory_list"] = in_memory()
+    print(json.dumps({"rows": args.rows, **report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
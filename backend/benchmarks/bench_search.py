@@ -0,0 +1,86 @@
+"""Indexed full-text search vs. a LIKE '%q%' scan.
+
+Seeds `--tasks` tasks spread over `--users` users on a throwaway SQLite
+database (or DATABASE_URL), then times both queries for one user:
+
+    python -m backend.benchmarks.bench_search --tasks 1000000 --users 10
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+_tmpdir = tempfile.mkdtemp(prefix="bench-search-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+
+from sqlalchemy import insert  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from backend.db import create_db_and_tables, engine  # noqa: E402
+from backend.models import Task  # noqa: E402
+from backend.search import like_statement, search_statement  # noqa: E402
+
+_VOCAB = [f"word{i}" for i in range(5000)] + [
+    "groceries", "invoice", "meeting", "report", "dentist", "plumber", "budget", "review", "deploy", "birthday",
+]
+
+
+def seed(tasks: int, users: int) -> None:
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        batch = []
+        for i in range(tasks):
+            batch.append({
+                "user_id": f"user{i % users}",
+                "title": " ".join(rng.choices(_VOCAB, k=4)),
+                "description": " ".join(rng.choices(_VOCAB, k=20)),
+                "completed": False, "created_at": now, "updated_at": now,
+            })
+            if len(batch) == 20000:
+                conn.execute(insert(Task), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Task), batch)
+
+
+def _time(stmt, repeat: int = 5):
+    best, rows = float("inf"), 0
+    with Session(engine) as session:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = len(session.exec(stmt).all())
+            best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 2), rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--query", nargs="+", default=["dentist", "plumber budget", "word42"])
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    start = time.perf_counter()
+    seed(args.tasks, args.users)
+    seed_s = time.perf_counter() - start
+
+    results = []
+    for q in args.query:
+        fts_ms, fts_rows = _time(search_statement(engine.dialect.name, "user0", q, args.limit, 0))
+        like_ms, like_rows = _time(like_statement("user0", q).limit(args.limit))
+        results.append({
+            "q": q, "fts_ms": fts_ms, "like_ms": like_ms,
+            "speedup": round(like_ms / fts_ms, 1) if fts_ms else None,
+            "rows": [fts_rows, like_rows],
+        })
+    print(json.dumps({"tasks": args.tasks, "users": args.users, "seed_s": round(seed_s, 1), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""ORM + pydantic + json list responses vs. column rows + orjson.
+
+Seeds `--tasks` tasks for one user on a throwaway SQLite database (or
+DATABASE_URL) and times building the full `GET /api/tasks` body both ways,
+split into query and encode time, plus the end-to-end request:
+
+    python -m backend.benchmarks.bench_serialization --tasks 10000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp(prefix="bench-serialization-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from sqlmodel import select  # noqa: E402
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+
+from backend.db import async_engine, create_db_and_tables, engine  # noqa: E402
+from backend.main import app  # noqa: E402
+from backend.models import Task, TaskRead  # noqa: E402
+from backend.routes.tasks import TASK_COLUMNS, TASK_FIELDS  # noqa: E402
+from backend.serialization import dumps, rows_to_dicts  # noqa: E402
+
+USER = "bench"
+
+
+def seed(tasks: int) -> None:
+    now = datetime.utcnow()
+    rows = [{
+        "user_id": USER, "title": f"Task {i}", "description": f"Description of task {i}" * 3,
+        "completed": i % 3 == 0, "due_date": now + timedelta(days=i % 30) if i % 2 else None,
+        "created_at": now, "updated_at": now,
+    } for i in range(tasks)]
+    with engine.begin() as conn:
+        conn.execute(insert(Task), rows)
+
+
+async def old_path(session: AsyncSession):
+    start = time.perf_counter()
+    results = (await session.exec(select(Task).where(Task.user_id == USER))).all()
+    queried = time.perf_counter()
+    body = json.dumps(jsonable_encoder([TaskRead.from_orm(t) for t in results])).encode()
+    return queried - start, time.perf_counter() - queried, body
+
+
+async def new_path(session: AsyncSession):
+    start = time.perf_counter()
+    results = (await session.exec(select(*TASK_COLUMNS).where(Task.user_id == USER))).all()
+    queried = time.perf_counter()
+    body = dumps(rows_to_dicts(TASK_FIELDS, results))
+    return queried - start, time.perf_counter() - queried, body
+
+
+async def _best(path, repeat: int):
+    best = None
+    for _ in range(repeat):
+        # a fresh session each time so the old path pays for building identities
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            query_s, encode_s, body = await path(session)
+        if best is None or query_s + encode_s < best[0] + best[1]:
+            best = (query_s, encode_s, body)
+    return best
+
+
+async def _compare(repeat: int):
+    old = await _best(old_path, repeat)
+    new = await _best(new_path, repeat)
+    # pooled aiosqlite connections are tied to this event loop
+    await async_engine.dispose()
+    return old, new
+
+
+def _request_ms(repeat: int) -> float:
+    best = float("inf")
+    with TestClient(app) as client:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            # a fresh query string each time defeats the response cache
+            response = client.get("/api/tasks", params={"status": "all", "n": time.perf_counter_ns()},
+                                  headers={"Authorization": f"Bearer {USER}"})
+            response.raise_for_status()
+            best = min(best, time.perf_counter() - start)
+        client.portal.call(async_engine.dispose)
+    return round(best * 1000, 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    seed(args.tasks)
+
+    old, new = asyncio.run(_compare(args.repeat))
+    assert json.loads(old[2]) == json.loads(new[2]), "paths disagree"
+
+    def report(result):
+        query_s, encode_s, body = result
+        return {"query_ms": round(query_s * 1000, 1), "encode_ms": round(encode_s * 1000, 1),
+                "total_ms": round((query_s + encode_s) * 1000, 1), "bytes": len(body)}
+
+    old_r, new_r = report(old), report(new)
+    print(json.dumps({
+        "tasks": args.tasks,
+        "old": old_r,
+        "new": new_r,
+        "speedup": round(old_r["total_ms"] / new_r["total_ms"], 1) if new_r["total_ms"] else None,
+        "request_ms": _request_ms(args.repeat),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
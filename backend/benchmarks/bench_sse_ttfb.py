@@ -0,0 +1,90 @@
+"""Time-to-first-byte of the streaming chat endpoint vs. the blocking one.
+
+Starts uvicorn in-process on a throwaway SQLite database and swaps in a chatbot
+that takes `--token-delay` seconds per token, then measures TTFB and total time
+for several reply lengths:
+
+    python -m backend.benchmarks.bench_sse_ttfb --tokens 10 100 500
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="bench-sse-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+from backend import models  # noqa: E402,F401
+from backend.chatbot_service import ChatbotService  # noqa: E402
+from backend.db import create_db_and_tables  # noqa: E402
+from backend.main import app  # noqa: E402
+from backend.routes import chat  # noqa: E402
+
+
+class SlowChatbot(ChatbotService):
+    """Emits `tokens` words, sleeping `delay` seconds before each one."""
+
+    def __init__(self, tokens: int, delay: float):
+        super().__init__()
+        self.tokens = tokens
+        self.delay = delay
+
+    def stream_response(self, user_message: str):
+        for i in range(self.tokens):
+            time.sleep(self.delay)
+            yield f"word{i} "
+
+    def get_response(self, user_message: str) -> str:
+        return "".join(self.stream_response(user_message))
+
+
+def _measure(client: httpx.Client, path: str, headers: dict) -> dict:
+    start = time.perf_counter()
+    ttfb = None
+    with client.stream("POST", path, json={"content": "help me with a task"}, headers=headers) as resp:
+        for _ in resp.iter_raw():
+            if ttfb is None:
+                ttfb = time.perf_counter() - start
+    total = time.perf_counter() - start
+    return {"ttfb_ms": round(ttfb * 1000, 1), "total_ms": round(total * 1000, 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    server = uvicorn.Server(uvicorn.Config(app, port=args.port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    headers = {"Authorization": "Bearer bench-sse"}
+    results = []
+    with httpx.Client(base_url=f"http://127.0.0.1:{args.port}", timeout=120) as client:
+        conv_id = client.post("/api/chat/conversations", json={}, headers=headers).json()["id"]
+        base = f"/api/chat/conversations/{conv_id}/messages"
+        for tokens in args.tokens:
+            chat.chatbot = SlowChatbot(tokens, args.token_delay)
+            results.append({
+                "reply_tokens": tokens,
+                "stream": _measure(client, base + "/stream", headers),
+                "blocking": _measure(client, base, headers),
+            })
+
+    server.should_exit = True
+    thread.join()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Cold start: time from spawning a worker to its first served request.
+
+Migrates a throwaway SQLite database with Alembic, then starts uvicorn on it
+`--runs` times per configuration and measures, from the moment the process is
+spawned, when `/health` first answers and how long the first `GET /api/tasks`
+and first chat request take. The worker's own phase timings come from
+`GET /api/admin/startup`. Configurations:
+- `create+eager`: `SCHEMA_ON_STARTUP=create`, `LAZY_ROUTERS=false` (the old startup)
+- `create+lazy`, `check+eager` and `check+lazy` (the production startup)
+
+    python -m backend.benchmarks.bench_startup --runs 10
+
+It also counts the statements each schema mode runs against an up-to-date
+database; on Postgres every one of them is a network round trip.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="bench-startup-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+
+import httpx  # noqa: E402
+from alembic.config import main as alembic_main  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from backend.benchmarks.loadtest import spawn_server  # noqa: E402
+from backend.db import DATABASE_URL, async_engine, check_schema_revision, create_db_and_tables, engine  # noqa: E402
+
+CONFIGS = {
+    "create+eager": {"SCHEMA_ON_STARTUP": "create", "LAZY_ROUTERS": "false"},
+    "create+lazy": {"SCHEMA_ON_STARTUP": "create", "LAZY_ROUTERS": "true"},
+    "check+eager": {"SCHEMA_ON_STARTUP": "check", "LAZY_ROUTERS": "false"},
+    "check+lazy": {"SCHEMA_ON_STARTUP": "check", "LAZY_ROUTERS": "true"},
+}
+AUTH = {"Authorization": "Bearer bench-startup"}
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+
+def migrate() -> None:
+    # alembic.ini locates the scripts relative to the repository root
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(os.path.dirname(ALEMBIC_INI)))
+    try:
+        alembic_main(argv=["-c", ALEMBIC_INI, "upgrade", "head"])
+    finally:
+        os.chdir(cwd)
+
+
+def schema_statements() -> dict:
+    """Statements each schema mode runs on a migrated database."""
+    counts = {}
+    for name, eng, run in (
+        ("create", engine, create_db_and_tables),
+        ("check", async_engine.sync_engine, lambda: asyncio.run(_check())),
+    ):
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(eng, "before_cursor_execute", count)
+        try:
+            run()
+        finally:
+            event.remove(eng, "before_cursor_execute", count)
+        counts[name] = len(statements)
+    return counts
+
+
+async def _check() -> None:
+    try:
+        await check_schema_revision()
+    finally:
+        await async_engine.dispose()
+
+
+def cold_start(port: int, config: dict) -> dict:
+    os.environ.update(config)
+    url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = spawn_server(port, DATABASE_URL)
+    try:
+        with httpx.Client(base_url=url, timeout=30) as client:
+            while True:
+                try:
+                    if client.get("/health").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.perf_counter() - start > 30:
+                    raise RuntimeError(f"server at {url} did not come up")
+                time.sleep(0.005)
+            up = time.perf_counter() - start
+            t = time.perf_counter()
+            client.get("/api/tasks", headers=AUTH).raise_for_status()
+            tasks = time.perf_counter() - t
+            t = time.perf_counter()
+            client.get("/api/chat/conversations", headers=AUTH).raise_for_status()
+            chat = time.perf_counter() - t
+            report = client.get("/api/admin/startup").json()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return {"up": up, "first_tasks": tasks, "first_chat": chat, "report": report}
+
+
+def summarize(runs: list) -> dict:
+    def median_ms(values):
+        return round(statistics.median(values) * 1000, 1)
+
+    phases = {}
+    for run in runs:
+        for name, ms in run["report"]["phases_ms"].items():
+            phases.setdefault(name, []).append(ms / 1000)
+    return {
+        "health_up_ms": median_ms([r["up"] for r in runs]),
+        "first_tasks_ms": median_ms([r["first_tasks"] for r in runs]),
+        "first_chat_ms": median_ms([r["first_chat"] for r in runs]),
+        "worker_ready_ms": median_ms([r["report"]["ready_ms"] / 1000 for r in runs]),
+        "process_ready_ms": median_ms([(r["report"]["process_ready_ms"] or 0) / 1000 for r in runs]),
+        "phases_ms": {name: median_ms(values) for name, values in phases.items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    migrate()
+    report = {"schema_statements": schema_statements()}
+    engine.dispose()
+    runs = {name: [] for name in CONFIGS}
+    # interleaved, so drift (caches, other load) affects every configuration alike
+    for _ in range(args.runs):
+        for name, config in CONFIGS.items():
+            runs[name].append(cold_start(args.port, config))
+    report.update({name: summarize(results) for name, results in runs.items()})
+    print(json.dumps({"runs": args.runs, **report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
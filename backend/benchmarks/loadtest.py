@@ -0,0 +1,269 @@
+"""Mixed-workload load test of the Task API with latency/RPS per endpoint.
+
+Seeds `--users` users with `--tasks` tasks and `--messages` chat turns each,
+then drives a weighted mix of task list/create/update/delete calls and chat
+turns at each `--concurrency` level for `--duration` seconds. Prints p50/p95/
+p99 latency, RPS and errors per endpoint as JSON.
+
+Against a running server:
+
+    uvicorn backend.main:app --port 8000
+    python -m backend.benchmarks.loadtest --url http://127.0.0.1:8000
+
+or fully offline, spawning uvicorn on a throwaway SQLite database (pass
+`--database-url` to point the spawned server at a local Postgres instead):
+
+    python -m backend.benchmarks.loadtest --spawn
+
+Store a run with `--save-baseline base.json`; a later run with
+`--baseline base.json` flags endpoints whose p95 grew or whose RPS dropped by
+more than `--tolerance` and exits with status 1 if any did.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+DEFAULT_MIX = "list=50,create=15,update=20,delete=5,chat=10"
+
+LIST = "GET /api/tasks"
+CREATE = "POST /api/tasks"
+UPDATE = "PUT /api/tasks/{id}"
+DELETE = "DELETE /api/tasks/{id}"
+CHAT = "POST /api/chat/conversations/{id}/messages"
+OPERATIONS = {"list": LIST, "create": CREATE, "update": UPDATE, "delete": DELETE, "chat": CHAT}
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """'list=50,create=10' -> {'list': 50.0, 'create': 10.0}"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation '{name}' (choose from {', '.join(OPERATIONS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: Dict[str, List[float]], errors: Dict[str, int], elapsed: float) -> Dict[str, dict]:
+    report = {}
+    for endpoint in sorted(set(latencies) | set(errors)):
+        values = sorted(latencies.get(endpoint, []))
+        report[endpoint] = {
+            "requests": len(values),
+            "errors": errors.get(endpoint, 0),
+            "rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+        }
+    return report
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> List[dict]:
+    """Endpoints (per concurrency level) whose p95 or RPS regressed beyond `tolerance`."""
+    regressions = []
+    for level, endpoints in current["levels"].items():
+        for endpoint, stats in endpoints.items():
+            base = baseline.get("levels", {}).get(level, {}).get(endpoint)
+            if not base:
+                continue
+            if base["p95_ms"] and stats["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+                regressions.append({"concurrency": level, "endpoint": endpoint, "metric": "p95_ms",
+                                    "baseline": base["p95_ms"], "current": stats["p95_ms"]})
+            if base["rps"] and stats["rps"] < base["rps"] * (1 - tolerance):
+                regressions.append({"concurrency": level, "endpoint": endpoint, "metric": "rps",
+                                    "baseline": base["rps"], "current": stats["rps"]})
+            if stats["errors"] > base["errors"]:
+                regressions.append({"concurrency": level, "endpoint": endpoint, "metric": "errors",
+                                    "baseline": base["errors"], "current": stats["errors"]})
+    return regressions
+
+
+class UserState:
+    """Ids a simulated user can act on."""
+
+    def __init__(self, token: str):
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.task_ids: List[int] = []
+        self.conversation_id: Optional[int] = None
+
+
+async def seed(client: httpx.AsyncClient, users: int, tasks: int, messages: int, prefix: str) -> List[UserState]:
+    states = [UserState(f"{prefix}-{i}") for i in range(users)]
+
+    async def seed_user(state: UserState) -> None:
+        for start in range(0, tasks, 500):
+            items = [{"title": f"load task {n}", "description": "seeded"} for n in range(start, min(tasks, start + 500))]
+            resp = await client.post("/api/tasks/bulk", json={"items": items}, headers=state.headers)
+            resp.raise_for_status()
+            state.task_ids.extend(r["id"] for r in resp.json()["results"])
+        resp = await client.post("/api/chat/conversations", json={"title": "load"}, headers=state.headers)
+        resp.raise_for_status()
+        state.conversation_id = resp.json()["id"]
+        for n in range(messages):
+            resp = await client.post(f"/api/chat/conversations/{state.conversation_id}/messages",
+                                     json={"content": f"how do I create task {n}?"}, headers=state.headers)
+            resp.raise_for_status()
+
+    await asyncio.gather(*(seed_user(state) for state in states))
+    return states
+
+
+async def _call(client: httpx.AsyncClient, op: str, state: UserState, rng: random.Random):
+    """Issue one request for `op`; returns (endpoint, response)."""
+    if op in ("update", "delete") and not state.task_ids:
+        op = "create"
+    if op == "list":
+        return LIST, await client.get("/api/tasks", params={"limit": 50}, headers=state.headers)
+    if op == "create":
+        resp = await client.post("/api/tasks", json={"title": "load task", "description": "created"}, headers=state.headers)
+        if resp.status_code == 201:
+            state.task_ids.append(resp.json()["id"])
+        return CREATE, resp
+    if op == "update":
+        task_id = rng.choice(state.task_ids)
+        body = {"completed": rng.random() < 0.5, "title": f"load task {rng.randrange(10**6)}"}
+        return UPDATE, await client.put(f"/api/tasks/{task_id}", json=body, headers=state.headers)
+    if op == "delete":
+        task_id = state.task_ids.pop(rng.randrange(len(state.task_ids)))
+        return DELETE, await client.delete(f"/api/tasks/{task_id}", headers=state.headers)
+    return CHAT, await client.post(f"/api/chat/conversations/{state.conversation_id}/messages",
+                                   json={"content": "how do I complete a task?"}, headers=state.headers)
+
+
+async def run_level(url: str, states: List[UserState], mix: Dict[str, float], concurrency: int,
+                    duration: float, seed_value: int) -> Dict[str, dict]:
+    ops, weights = list(mix), list(mix.values())
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker(n: int) -> None:
+            rng = random.Random(seed_value * 100003 + n)
+            while time.perf_counter() < deadline:
+                op = rng.choices(ops, weights)[0]
+                state = rng.choice(states)
+                start = time.perf_counter()
+                try:
+                    endpoint, resp = await _call(client, op, state, rng)
+                except httpx.HTTPError:
+                    errors[OPERATIONS[op]] += 1
+                    continue
+                latencies[endpoint].append(time.perf_counter() - start)
+                # another worker may have deleted the task in the meantime
+                lost_race = resp.status_code == 404 and endpoint in (UPDATE, DELETE)
+                if resp.status_code >= 400 and not lost_race:
+                    errors[endpoint] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return summarize(latencies, errors, elapsed)
+
+
+def spawn_server(port: int, database_url: Optional[str]) -> subprocess.Popen:
+    env = dict(os.environ)
+    env["DATABASE_URL"] = database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='loadtest-'), 'load.db')}"
+    env.pop("ASYNC_DATABASE_URL", None)
+    env.pop("JWT_SECRET", None)  # dev auth: the bearer token is the user id
+    # measure capacity, not the per-user limits (a few seeded users issue every request)
+    env.setdefault("RATE_LIMIT_ENABLED", "false")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, start_new_session=True,
+    )
+
+
+async def wait_until_up(url: str, timeout: float = 30) -> None:
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=url) as client:
+        while True:
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"server at {url} did not come up within {timeout}s")
+            await asyncio.sleep(0.2)
+
+
+async def run(args) -> dict:
+    async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+        states = await seed(client, args.users, args.tasks, args.messages, args.prefix)
+
+    levels = {}
+    for level in args.concurrency:
+        levels[str(level)] = await run_level(args.url, states, args.mix, level, args.duration, args.seed)
+    return {
+        "users": args.users, "tasks": args.tasks, "messages": args.messages,
+        "duration_s": args.duration, "mix": args.mix, "levels": levels,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=None, help="server to test (default: http://127.0.0.1:<port>)")
+    parser.add_argument("--spawn", action="store_true", help="start a local uvicorn for the run")
+    parser.add_argument("--port", type=int, default=8765, help="port of the spawned server")
+    parser.add_argument("--database-url", default=None, help="DATABASE_URL of the spawned server (default: temp SQLite)")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=100, help="tasks seeded per user")
+    parser.add_argument("--messages", type=int, default=10, help="chat turns seeded per user")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"operation weights ({DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--prefix", default="load-user", help="user id prefix (ids are <prefix>-<n>)")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative p95/RPS change (0.2 = 20%%)")
+    parser.add_argument("--save-baseline", help="write this run's report here")
+    args = parser.parse_args()
+    args.url = args.url or f"http://127.0.0.1:{args.port}"
+
+    server = spawn_server(args.port, args.database_url) if args.spawn else None
+    try:
+        if server is not None:
+            asyncio.run(wait_until_up(args.url))
+        report = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(report, json.load(f), args.tolerance)
+        status = 1 if report["regressions"] else 0
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""Per-user response cache with ETag support for the list endpoints.
+
+Every mutation bumps the user's version counter. A list response is cached
+under (version, user, path, query string) and served with `ETag: "<version>"`,
+so a request whose `If-None-Match` matches the current version gets a 304
+without touching the database, and a bump implicitly invalidates every cached
+list of that user.
+
+Concurrent misses on the same key are coalesced: the first request runs the
+query and encodes the body, identical requests arriving meanwhile wait for and
+share that result instead of issuing their own query. The key includes the
+version, so a request never joins a build that started before a write it
+should see.
+
+Writes are also timestamped per user (`wrote_recently`), so reads can be kept
+on the primary database right after a user's own write when read replicas
+are configured (see `db.get_read_session`). A body read from a replica may
+still lag behind the version it would be cached under, so it is served
+without an ETag and not cached.
+
+The default backend is an in-process LRU, which is only coherent within a
+single worker. Set `CACHE_URL=redis://...` to share versions and responses
+between workers through Redis (requires the optional `redis` package).
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+from .metrics import COALESCED
+
+CACHE_URL = os.environ.get("CACHE_URL", "")
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "10000"))
+RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", "300"))
+# how long after a write the user's reads stay on the primary (0 disables)
+READ_YOUR_WRITES_SECONDS = float(os.environ.get("READ_YOUR_WRITES_SECONDS", "5"))
+
+# set by `db` when read replicas are configured; without them write times are not needed
+track_writes = False
+
+
+def _initial_version() -> int:
+    # Versions start from the clock rather than 0, so a counter that was evicted
+    # or lost on restart never reuses a value an old ETag may still carry.
+    return time.time_ns() // 1000
+
+
+class MemoryCache:
+    """Bounded in-process LRU for both version counters and responses.
+
+    Responses expire after `ttl` seconds, like in Redis; version counters do not.
+    """
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, ttl: int = RESPONSE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (value, monotonic expiry time or None)
+        self._entries = OrderedDict()
+
+    def _put(self, key: str, value, ttl: Optional[float] = None) -> None:
+        self._entries[key] = (value, time.monotonic() + ttl if ttl else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: Optional[int] = None) -> None:
+        self._put(key, value, ttl or self.ttl)
+
+    async def get_version(self, key: str) -> int:
+        version = await self.get(key)
+        if version is None:
+            version = _initial_version()
+            self._put(key, version)
+        return version
+
+    async def bump_version(self, key: str) -> int:
+        version = max(await self.get_version(key) + 1, _initial_version())
+        self._put(key, version)
+        return version
+
+
+class RedisCache:
+    """Cache backend on a Redis-compatible asyncio client (e.g. `redis.asyncio.Redis`).
+
+    Only `get`, `set(..., ex=, nx=)` and `incr` are used, so any client exposing
+    those coroutines works, including a local fake in tests.
+    """
+
+    def __init__(self, client, ttl: int = RESPONSE_CACHE_TTL):
+        self.client = client
+        self.ttl = ttl
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[int] = None) -> None:
+        await self.client.set(key, value, ex=ttl or self.ttl)
+
+    async def get_version(self, key: str) -> int:
+        version = await self.client.get(key)
+        if version is None:
+            await self.client.set(key, _initial_version(), nx=True)
+            version = await self.client.get(key)
+        return int(version)
+
+    async def bump_version(self, key: str) -> int:
+        await self.get_version(key)
+        return int(await self.client.incr(key))
+
+
+def _build_cache():
+    if CACHE_URL.startswith(("redis://", "rediss://")):
+        import redis.asyncio as redis  # optional dependency
+
+        return RedisCache(redis.from_url(CACHE_URL))
+    return MemoryCache()
+
+
+response_cache = _build_cache()
+
+
+def configure_cache(backend) -> None:
+    """Swap the cache backend (e.g. for tests)."""
+    global response_cache
+    response_cache = backend
+
+
+class SingleFlight:
+    """Runs one coroutine per key at a time; concurrent callers with the key share its result."""
+
+    def __init__(self):
+        self._flights: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Result of `func()` and whether it was shared with an earlier caller."""
+        loop = asyncio.get_running_loop()
+        flight = self._flights.get(key)
+        # a flight left over from another event loop cannot be awaited here
+        if flight is not None and flight.get_loop() is loop:
+            return await asyncio.shield(flight), True
+        flight = loop.create_task(func())
+        self._flights[key] = flight
+        flight.add_done_callback(lambda done: self._land(key, done))
+        # shielded: a caller that disconnects must not cancel the others' result
+        return await asyncio.shield(flight), False
+
+    def _land(self, key: str, flight: asyncio.Task) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+
+_in_flight = SingleFlight()
+
+
+def _version_key(user_id: str) -> str:
+    return f"v:{user_id}"
+
+
+def _written_key(user_id: str) -> str:
+    return f"w:{user_id}"
+
+
+async def bump_user_version(user_id: str) -> None:
+    """Invalidate every cached list response of `user_id`; call after each mutation."""
+    await response_cache.bump_version(_version_key(user_id))
+    if track_writes and READ_YOUR_WRITES_SECONDS > 0:
+        await response_cache.set(
+            _written_key(user_id), repr(time.time()).encode(), ttl=math.ceil(READ_YOUR_WRITES_SECONDS)
+        )
+
+
+async def wrote_recently(user_id: str) -> bool:
+    """Whether `user_id` wrote within the last READ_YOUR_WRITES_SECONDS."""
+    if READ_YOUR_WRITES_SECONDS <= 0:
+        return False
+    written_at = await response_cache.get(_written_key(user_id))
+    return written_at is not None and time.time() - float(written_at) < READ_YOUR_WRITES_SECONDS
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+async def cached_json_response(
+    request: Request,
+    user_id: str,
+    build: Callable[[], Awaitable[Tuple[bytes, Dict[str, str]]]],
+) -> Response:
+    """Serve a per-user JSON list with ETag / If-None-Match support.
+
+    `build` runs the query and returns the encoded body plus any extra response
+    headers; it is only called on a cache miss, and once for concurrent
+    identical misses.
+    """
+    version = await response_cache.get_version(_version_key(user_id))
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    scope = hashlib.sha256(f"{request.url.path}?{query}".encode()).hexdigest()[:32]
+    key = f"r:{version}:{user_id}:{scope}"
+
+    cached = await response_cache.get(key)
+    if cached is not None:
+        meta, _, body = cached.partition(b"\n")
+        extra = json.loads(meta)
+    else:
+        # set by db.get_read_session: the body may predate `version`
+        from_replica = getattr(request.state, "read_replica", False)
+
+        async def build_and_store():
+            body, extra = await build()
+            if not from_replica:
+                await response_cache.set(key, json.dumps(extra).encode() + b"\n" + body)
+            return body, extra
+
+        # a read kept on the primary (read-your-writes) must not join a replica build
+        flight = f"{key}:replica" if from_replica else key
+        (body, extra), shared = await _in_flight.do(flight, build_and_store)
+        if shared:
+            COALESCED.inc(getattr(request.scope.get("route"), "path", request.url.path))
+        if from_replica:
+            # an ETag would let the client keep a stale body until the next write
+            del headers["ETag"]
+    return Response(content=body, media_type="application/json", headers={**headers, **extra})
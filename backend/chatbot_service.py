@@ -1,11 +1,43 @@
 import random
-from typing import List
+import re
+from typing import Iterable, Iterator, List, Optional
+
+
+# Words that mark a message as task-related; anything else is declined.
+TASK_KEYWORDS = (
+    "task",
+    "create",
+    "delete",
+    "complete",
+    "done",
+    "due",
+    "deadline",
+    "filter",
+    "sort",
+    "help",
+    "how",
+    "add",
+    "update",
+    "edit",
+)
+
+EMPTY_MESSAGE_RESPONSE = "Please type a question about tasks so I can help. For example: 'How do I create a task?'"
+OFF_TOPIC_RESPONSE = "I can only help with task management. Please ask about creating, completing, deleting, or managing tasks."
+ERROR_RESPONSE = "Sorry, I couldn't process that. Please ask a question about tasks."
+
+# a word plus the whitespace that follows it
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
 
 
 class ChatbotService:
-    """Simple rule-based chatbot service for task management assistance."""
+    """Simple rule-based chatbot service for task management assistance.
+
+    `rng` picks among the canned replies; pass a seeded `random.Random` for
+    reproducible answers. It defaults to the `random` module.
+    """
 
-    def __init__(self):
+    def __init__(self, rng: Optional[random.Random] = None):
+        self.rng = rng or random
         self.responses = {
             "hello": [
                 "Hello! I'm your task assistant. How can I help you today?",
@@ -42,6 +74,12 @@ class ChatbotService:
                 "Feel free to ask me about your tasks!",
             ],
         }
+        # Built once: (keyword, replies) in priority order (dict order of `responses`).
+        # A keyword matches as a substring, which also covers whole-word matches.
+        self._intents = tuple(
+            (keyword, tuple(replies)) for keyword, replies in self.responses.items() if keyword != "default"
+        )
+        self._fallback = tuple(self.responses["task"])
 
     def get_response(self, user_message: str) -> str:
         """Generate a response based on user message."""
@@ -50,47 +88,33 @@ class ChatbotService:
 
             # If message is empty after trimming, prompt user
             if not message_lower:
-                return "Please type a question about tasks so I can help. For example: 'How do I create a task?'"
+                return EMPTY_MESSAGE_RESPONSE
 
             # Only allow task-related topics. If user asks unrelated questions, politely decline.
-            task_keywords = [
-                "task",
-                "create",
-                "delete",
-                "complete",
-                "done",
-                "due",
-                "deadline",
-                "filter",
-                "sort",
-                "help",
-                "how",
-                "add",
-                "update",
-                "edit",
-            ]
-
-            # Quick check: if none of the task keywords appear, respond that bot only handles tasks
-            if not any(k in message_lower for k in task_keywords):
-                return "I can only help with task management. Please ask about creating, completing, deleting, or managing tasks."
-
-            # Check for different keywords (task-focused)
-            for keyword, responses in self.responses.items():
-                if keyword == "default":
-                    continue
-                if keyword in message_lower or self._similar_key(keyword, message_lower):
-                    return random.choice(responses)
+            for keyword in TASK_KEYWORDS:
+                if keyword in message_lower:
+                    break
+            else:
+                return OFF_TOPIC_RESPONSE
+
+            for keyword, replies in self._intents:
+                if keyword in message_lower:
+                    return self.rng.choice(replies)
 
             # If nothing matched but message contains a task keyword, return a helpful generic task response
-            return random.choice(self.responses["task"]) if "task" in self.responses else "I can help with tasks. What would you like to do?"
+            return self.rng.choice(self._fallback)
         except Exception:
             # Fail-safe fallback to avoid raising inside the web request
-            return "Sorry, I couldn't process that. Please ask a question about tasks."
-
-    def _similar_key(self, keyword: str, message: str) -> bool:
-        """Check for semantic similarity between keyword and message."""
-        # Simple similarity check based on common words
-        keyword_words = set(keyword.split())
-        message_words = set(message.split())
-        overlap = len(keyword_words & message_words)
-        return overlap > 0
+            return ERROR_RESPONSE
+
+    def get_responses(self, messages: Iterable[str]) -> List[str]:
+        """Generate responses for a batch of messages, in order."""
+        return [self.get_response(message) for message in messages]
+
+    def stream_response(self, user_message: str) -> Iterator[str]:
+        """Yield the response in chunks as they are produced.
+
+        Joining the chunks gives exactly `get_response(user_message)`. Slower
+        generators should override this to yield tokens as soon as they exist.
+        """
+        yield from _TOKEN_RE.findall(self.get_response(user_message))
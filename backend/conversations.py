@@ -0,0 +1,66 @@
+"""Denormalized conversation summaries for the conversation list.
+
+Each `chat_conversations` row carries its `message_count`, `last_message_at`
+and `last_message_snippet` (the first `SNIPPET_LENGTH` characters of the
+latest message), so listing conversations with previews is one read of the
+(user_id, updated_at, id) index instead of a message query per conversation.
+
+They are written in the transaction that adds the messages: `record_messages`
+where messages are added through the ORM (one chat turn), `refresh_summaries`
+after set-based inserts and deletes (import, retention), which recomputes them
+from `chat_messages` in one UPDATE per `SUMMARY_BATCH_SIZE` conversations.
+"""
+from typing import Iterable, Sequence
+
+from sqlalchemy import func, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .models import ChatConversation, ChatMessage
+
+SNIPPET_LENGTH = 200
+SUMMARY_BATCH_SIZE = 500
+
+
+def snippet(content: str) -> str:
+    return content[:SNIPPET_LENGTH]
+
+
+def record_messages(conv: ChatConversation, messages: Sequence[ChatMessage]) -> None:
+    """Count `messages`, the conversation's newest, into `conv`; flushed with them."""
+    last = messages[-1]
+    # an SQL increment, so concurrent turns in one conversation both count
+    conv.message_count = ChatConversation.message_count + len(messages)
+    conv.last_message_at = last.created_at
+    conv.last_message_snippet = snippet(last.content)
+    conv.updated_at = last.created_at
+
+
+def _summary_values() -> dict:
+    messages = ChatMessage.conversation_id == ChatConversation.id
+    latest = (
+        select(func.substr(ChatMessage.content, 1, SNIPPET_LENGTH))
+        .where(messages)
+        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+        .limit(1)
+    )
+    return {
+        # not a chat turn: the list order stays as it was
+        "updated_at": ChatConversation.updated_at,
+        "message_count": select(func.count()).select_from(ChatMessage).where(messages).scalar_subquery(),
+        "last_message_at": select(func.max(ChatMessage.created_at)).where(messages).scalar_subquery(),
+        "last_message_snippet": latest.scalar_subquery(),
+    }
+
+
+async def refresh_summaries(session: AsyncSession, conversation_ids: Iterable[int]) -> None:
+    """Recompute the summaries of `conversation_ids` from their messages (in the caller's transaction)."""
+    ids = sorted(set(conversation_ids))
+    for start in range(0, len(ids), SUMMARY_BATCH_SIZE):
+        batch = ids[start:start + SUMMARY_BATCH_SIZE]
+        await session.execute(
+            update(ChatConversation)
+            .where(ChatConversation.id.in_(batch))
+            .values(**_summary_values())
+            .execution_options(synchronize_session=False)
+        )
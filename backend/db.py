@@ -1,18 +1,372 @@
+import asyncio
+import logging
 import os
-from contextlib import contextmanager
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, List, Optional
+from fastapi import Depends, Request
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlmodel import create_engine, Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import cache
+from .auth import get_current_user
+
+logger = logging.getLogger(__name__)
 
 DATABASE_URL = os.environ.get("DATABASE_URL") or "sqlite:///./dev.db"
+# Read replicas for the read-heavy list endpoints: comma-separated URLs in DATABASE_URL form
+DATABASE_REPLICA_URLS = [u.strip() for u in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+REPLICA_CHECK_INTERVAL = float(os.environ.get("REPLICA_CHECK_INTERVAL", "10"))
+REPLICA_CHECK_TIMEOUT = float(os.environ.get("REPLICA_CHECK_TIMEOUT", "2"))
+
+# Connection pool settings (ignored for in-memory SQLite)
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+POOL_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# SQLite connection pragmas
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# async drivers used by the request handlers, keyed by backend
+_ASYNC_DRIVERS = {
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Rewrite a sync DATABASE_URL for its async driver (asyncpg / aiosqlite)."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in _ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    query = dict(parsed.query)
+    # asyncpg takes `ssl` rather than libpq's `sslmode` (e.g. Neon URLs)
+    if backend != "sqlite" and "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    return str(parsed.set(drivername=_ASYNC_DRIVERS[backend], query=query))
+
+
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+
+class PoolStats:
+    """Checkout and wait counters collected by the instrumented pools."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, waited: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.total_wait, 6),
+                "wait_seconds_max": round(self.max_wait, 6),
+                "wait_seconds_avg": round(self.total_wait / self.checkouts, 6) if self.checkouts else 0.0,
+            }
+
+
+class _StatsPoolMixin:
+    """Times how long each checkout waits for a free connection."""
+
+    stats: PoolStats
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return conn
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep the cumulative counters
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class StatsQueuePool(_StatsPoolMixin, QueuePool):
+    pass
+
+
+class StatsAsyncQueuePool(_StatsPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+
+def _engine_options(url: str, is_async: bool) -> dict:
+    parsed = make_url(url)
+    if _is_memory_sqlite(url):
+        # a single shared connection; pooling settings do not apply
+        return {}
+    options = {
+        "poolclass": StatsAsyncQueuePool if is_async else StatsQueuePool,
+        "pool_size": POOL_SIZE,
+        "max_overflow": POOL_MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING,
+    }
+    if parsed.get_backend_name() == "sqlite":
+        options["connect_args"] = {"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+        if not is_async:
+            # pooled connections are handed to FastAPI's worker threads
+            options["connect_args"]["check_same_thread"] = False
+    return options
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def _instrument(eng) -> None:
+    eng.pool.stats = PoolStats()
+    if eng.dialect.name == "sqlite":
+        event.listen(eng, "connect", _set_sqlite_pragmas)
+
+
+# called with the sync engine of each async engine built from then on (metrics.install)
+engine_hooks: List[Callable] = []
+
+
+def _build_async_engine(url: str) -> AsyncEngine:
+    aengine = create_async_engine(url, echo=False, **_engine_options(url, True))
+    _instrument(aengine.sync_engine)
+    for hook in engine_hooks:
+        hook(aengine.sync_engine)
+    return aengine
+
+
+def _build_engines():
+    sync_engine = create_engine(DATABASE_URL, echo=False, **_engine_options(DATABASE_URL, False))
+    _instrument(sync_engine)
+    return sync_engine, _build_async_engine(ASYNC_DATABASE_URL)
+
 
-# Simple, synchronous engine (SQLModel uses SQLAlchemy)
-engine = create_engine(DATABASE_URL, echo=False)
+# Synchronous engine, kept for Alembic, table creation and scripts;
+# async engine used by the API route handlers
+engine, async_engine = _build_engines()
+
+
+class ReplicaSet:
+    """Async engines for read replicas, handed out round-robin among the healthy ones.
+
+    A replica that fails with a connection error is marked down and skipped
+    until the health check (`check`, every REPLICA_CHECK_INTERVAL seconds once `start`ed)
+    reaches it again.
+    """
+
+    def __init__(self, urls: List[str]):
+        self.engines = [_build_async_engine(to_async_url(url)) for url in urls]
+        self.healthy = [True] * len(self.engines)
+        self._next = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.engines)
+
+    def pick(self) -> Optional[AsyncEngine]:
+        """The next healthy replica, or None when all are down."""
+        for _ in range(len(self.engines)):
+            index = self._next % len(self.engines)
+            self._next += 1
+            if self.healthy[index]:
+                return self.engines[index]
+        return None
+
+    def mark_down(self, replica: AsyncEngine) -> None:
+        index = self.engines.index(replica)
+        if self.healthy[index]:
+            logger.warning("read replica %d is down; reading from the primary", index)
+        self.healthy[index] = False
+
+    @staticmethod
+    async def _ping(replica: AsyncEngine) -> None:
+        async with replica.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def check(self) -> List[bool]:
+        """Ping every replica and record which are up."""
+        for index, replica in enumerate(self.engines):
+            try:
+                await asyncio.wait_for(self._ping(replica), REPLICA_CHECK_TIMEOUT)
+            except (exc.DBAPIError, OSError, asyncio.TimeoutError):
+                self.mark_down(replica)
+            else:
+                if not self.healthy[index]:
+                    logger.warning("read replica %d is back up", index)
+                self.healthy[index] = True
+        return list(self.healthy)
+
+    async def _check_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(REPLICA_CHECK_INTERVAL)
+            await self.check()
+
+    async def start(self) -> None:
+        if self.engines:
+            self._task = asyncio.create_task(self._check_periodically())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def dispose(self) -> None:
+        for replica in self.engines:
+            await replica.dispose()
+
+
+def _is_connection_error(e: Exception) -> bool:
+    if isinstance(e, exc.DBAPIError):
+        return e.connection_invalidated or isinstance(e, (exc.OperationalError, exc.InterfaceError))
+    return isinstance(e, OSError)
+
+
+replicas = ReplicaSet(DATABASE_REPLICA_URLS)
+cache.track_writes = bool(replicas)
+
+
+def configure_replicas(replica_set: ReplicaSet) -> None:
+    """Swap the read replicas (e.g. for tests)."""
+    global replicas
+    replicas = replica_set
+    cache.track_writes = bool(replicas)
+
+
+def pool_status(eng) -> dict:
+    """Current occupancy plus cumulative checkout/wait statistics for an engine's pool."""
+    pool = eng.pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+            "timeout_seconds": pool.timeout(),
+        })
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        status.update(stats.snapshot())
+    return status
 
 
 def create_db_and_tables():
+    from . import search, stats  # noqa: F401 - register their DDL hooks
     SQLModel.metadata.create_all(engine)
 
 
+# Alembic revision this code expects: the newest file in alembic/versions.
+SCHEMA_REVISION = "0013_backfill_conversation_summaries"
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+async def check_schema_revision() -> str:
+    """Fail unless the database is migrated to SCHEMA_REVISION.
+
+    One query instead of `create_all`'s per-table reflection, and it opens the
+    first pooled connection the requests will reuse.
+    """
+    try:
+        async with async_engine.connect() as conn:
+            revision = (await conn.execute(text("SELECT version_num FROM alembic_version"))).scalar()
+    except exc.DBAPIError as e:
+        raise SchemaOutOfDate(f"Could not read the Alembic revision ({e.orig}); run `alembic upgrade head`") from e
+    if revision != SCHEMA_REVISION:
+        raise SchemaOutOfDate(
+            f"Database is at revision {revision}, this code expects {SCHEMA_REVISION}; run `alembic upgrade head`"
+        )
+    return revision
+
+
 @contextmanager
 def get_session():
     with Session(engine) as session:
         yield session
+
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    """Request-scoped AsyncSession dependency.
+
+    The session is rolled back if the handler raises and is always closed when the
+    request finishes, so its connection goes back to the pool even on errors.
+    """
+    session = AsyncSession(async_engine, expire_on_commit=False)
+    try:
+        yield session
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
+async def get_read_session(request: Request, user_id: str = Depends(get_current_user)) -> AsyncIterator[AsyncSession]:
+    """Request-scoped AsyncSession for read-only handlers.
+
+    Bound to the next healthy read replica, or to the primary when there is
+    none or when the user wrote within READ_YOUR_WRITES_SECONDS, so users
+    always see their own writes despite replication lag. A replica that fails
+    with a connection error is marked down: later requests use the other
+    replicas, or the primary, until the health check reaches it again.
+    """
+    replica = replicas.pick() if replicas and not await cache.wrote_recently(user_id) else None
+    if replica is not None:
+        # not cached by cached_json_response: the replica may lag behind the user's version
+        request.state.read_replica = True
+    session = AsyncSession(replica or async_engine, expire_on_commit=False)
+    try:
+        yield session
+    except Exception as e:
+        if replica is not None and _is_connection_error(e):
+            replicas.mark_down(replica)
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
+# The same session lifecycle as a context manager, for work outside the request
+# scope (e.g. inside a streaming response body).
+async_session_scope = asynccontextmanager(get_async_session)
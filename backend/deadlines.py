@@ -0,0 +1,117 @@
+"""Deadlines: pending tasks due soon or overdue, and the reminder scanner.
+
+A user's due-soon and overdue lists (`GET /api/tasks/due`, `/overdue`) are
+keyset pages over the (user_id, completed, due_date, id) index: equality on
+the first two columns leaves a range on `due_date`, so a page reads only its
+own rows however many tasks the user has.
+
+The scanner finds the tasks of all users whose deadline passed since its
+previous run and pushes a `task.overdue` event to each owner's feed. It reads
+`ix_tasks_pending_due`, a partial index on (due_date, id) holding only pending
+tasks with a due date, in keyset batches of `REMINDER_BATCH_SIZE`, so a run
+costs in proportion to the deadlines that passed, not to the table. (SQLite
+only prefers it over `ix_tasks_completed` once `ANALYZE` has collected
+statistics; Postgres keeps its own.)
+
+How far it has read is kept in `reminder_scans`. A run claims the window from
+there to now with a conditional UPDATE, so concurrent runs (several workers or
+processes) never remind twice; a run cut off after its claim drops that
+window's reminders (at most once). After a long pause only deadlines within
+`REMINDER_MAX_LAG_SECONDS` are reminded.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import false, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+
+from .db import async_session_scope
+from .events import publish_task_event
+from .metrics import REMINDERS
+from .models import ReminderScan, Task, TaskRead
+from .serialization import read_columns, rows_to_dicts
+
+REMINDER_INTERVAL = int(os.environ.get("REMINDER_INTERVAL", "60"))
+REMINDER_BATCH_SIZE = int(os.environ.get("REMINDER_BATCH_SIZE", "1000"))
+REMINDER_MAX_LAG = timedelta(seconds=int(os.environ.get("REMINDER_MAX_LAG_SECONDS", "86400")))
+
+OVERDUE_SCAN = "overdue"
+
+TASK_FIELDS, TASK_COLUMNS = read_columns(TaskRead, Task)
+
+
+def pending_due(user_id: str, start: Optional[datetime], end: datetime, after: Optional[list] = None):
+    """The user's pending tasks due in [start, end), soonest first, resuming after `after` = [due_date, id]."""
+    stmt = select(*TASK_COLUMNS).where(
+        Task.user_id == user_id, Task.completed == False, Task.due_date < end  # noqa: E712
+    )
+    if start is not None:
+        stmt = stmt.where(Task.due_date >= start)
+    if after is not None:
+        stmt = stmt.where(tuple_(Task.due_date, Task.id) > tuple_(*after))
+    return stmt.order_by(Task.due_date, Task.id)
+
+
+async def claim_window(now: datetime, name: str = OVERDUE_SCAN) -> Optional[Tuple[datetime, datetime]]:
+    """Advance the scan position to `now`; returns the (start, end] window to scan, or None."""
+    async with async_session_scope() as session:
+        scan = await session.get(ReminderScan, name)
+        if scan is None:
+            # first run: deadlines that passed before the scanner existed are not reminded
+            session.add(ReminderScan(name=name, scanned_through=now))
+            try:
+                await session.commit()
+            except IntegrityError:
+                pass
+            return None
+        previous = scan.scanned_through
+        if previous >= now:
+            return None
+        claimed = await session.execute(
+            update(ReminderScan)
+            .where(ReminderScan.name == name, ReminderScan.scanned_through == previous)
+            .values(scanned_through=now)
+        )
+        await session.commit()
+    if claimed.rowcount != 1:
+        # another run claimed it first
+        return None
+    return max(previous, now - REMINDER_MAX_LAG), now
+
+
+async def scan_overdue(now: Optional[datetime] = None, batch_size: int = 0) -> dict:
+    """Push `task.overdue` for pending tasks whose deadline passed since the previous scan."""
+    now = now or datetime.utcnow()
+    batch_size = batch_size or REMINDER_BATCH_SIZE
+    window = await claim_window(now)
+    if window is None:
+        return {"reminded": 0, "batches": 0}
+    start, end = window
+    reminded = batches = 0
+    position = None
+    while True:
+        # the index predicate spelled out as literals, so the planner can match ix_tasks_pending_due
+        stmt = select(*TASK_COLUMNS).where(
+            Task.completed == false(), Task.due_date.isnot(None), Task.due_date <= end
+        )
+        if position is None:
+            stmt = stmt.where(Task.due_date > start)
+        else:
+            stmt = stmt.where(tuple_(Task.due_date, Task.id) > tuple_(*position))
+        # one short read per batch, so no connection is held while events go out
+        async with async_session_scope() as session:
+            rows = (await session.exec(stmt.order_by(Task.due_date, Task.id).limit(batch_size))).all()
+        if not rows:
+            break
+        batches += 1
+        for task in rows_to_dicts(TASK_FIELDS, rows):
+            await publish_task_event(task["user_id"], {"type": "task.overdue", "task": task})
+        reminded += len(rows)
+        REMINDERS.inc(amount=len(rows))
+        if len(rows) < batch_size:
+            break
+        last = rows[-1]
+        position = (last.due_date, last.id)
+    return {"reminded": reminded, "batches": batches, "from": start, "through": end}
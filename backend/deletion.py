@@ -0,0 +1,71 @@
+"""Set-based deletes of conversations and whole accounts.
+
+Nothing is loaded through the ORM: rows go with `DELETE ... WHERE` statements.
+Large deletes run in batches of `DELETE_BATCH_SIZE` rows, each in its own short
+transaction, so no table is locked for the whole operation and other writers
+get in between batches. A batched delete is idempotent; if it is interrupted,
+running it again finishes the job.
+
+`chat_messages.conversation_id` also carries `ON DELETE CASCADE` (migration
+0008). The explicit message deletes are still needed because SQLite only
+enforces foreign keys with `PRAGMA foreign_keys=ON`, which this app does not
+set. Where the cascade is enforced, they leave nothing for it to do.
+"""
+import asyncio
+import os
+from typing import Dict, Optional
+
+from sqlalchemy import delete
+from sqlmodel import select
+
+from .db import async_session_scope
+from .models import ChatConversation, ChatMessage, ImportRun, Job, Task, TaskStats, TaskTombstone, User
+
+DELETE_BATCH_SIZE = int(os.environ.get("DELETE_BATCH_SIZE", "1000"))
+
+
+async def delete_in_batches(model, *criteria, batch_size: int = 0) -> int:
+    """Delete the `model` rows matching `criteria`, `batch_size` rows per transaction."""
+    batch_size = batch_size or DELETE_BATCH_SIZE
+    total = 0
+    while True:
+        async with async_session_scope() as session:
+            batch = select(model.id).where(*criteria).limit(batch_size).scalar_subquery()
+            result = await session.execute(
+                delete(model).where(model.id.in_(batch)).execution_options(synchronize_session=False)
+            )
+            await session.commit()
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
+        # let queued requests use the database between batches
+        await asyncio.sleep(0)
+
+
+async def delete_conversation_messages(conversation_id: int, batch_size: int = 0) -> int:
+    return await delete_in_batches(ChatMessage, ChatMessage.conversation_id == conversation_id, batch_size=batch_size)
+
+
+async def delete_account(user_id: str, batch_size: int = 0, keep_job_id: Optional[int] = None) -> Dict[str, int]:
+    """Remove every row belonging to the user, then the user row.
+
+    That is their tasks, counters, tombstones, conversations, messages, import
+    runs and jobs, except `keep_job_id`: the job running this deletion, kept so
+    its outcome can be polled and pruned with the other finished jobs.
+    """
+    counts = {
+        "messages": await delete_in_batches(ChatMessage, ChatMessage.user_id == user_id, batch_size=batch_size),
+        "conversations": await delete_in_batches(
+            ChatConversation, ChatConversation.user_id == user_id, batch_size=batch_size
+        ),
+        "tasks": await delete_in_batches(Task, Task.user_id == user_id, batch_size=batch_size),
+    }
+    async with async_session_scope() as session:
+        await session.execute(delete(TaskStats).where(TaskStats.user_id == user_id))
+        await session.execute(delete(TaskTombstone).where(TaskTombstone.user_id == user_id))
+        await session.execute(delete(ImportRun).where(ImportRun.user_id == user_id))
+        await session.execute(delete(User).where(User.id == user_id))
+        # queued jobs would act on data that is gone; a running one finds its row gone and stops there
+        await session.execute(delete(Job).where(Job.user_id == user_id, Job.id != keep_job_id))
+        await session.commit()
+    return counts
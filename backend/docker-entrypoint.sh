@@ -23,6 +23,8 @@ done
 
 echo "DB is up — running migrations"
 alembic -c alembic.ini upgrade head
+# migrated just now: workers only verify the revision instead of reflecting every table
+export SCHEMA_ON_STARTUP=${SCHEMA_ON_STARTUP:-check}
 
 echo "Starting server"
 exec uvicorn main:app --host 0.0.0.0 --port 8000 --reload
@@ -0,0 +1,182 @@
+"""Per-user task change feed behind `/ws/tasks`.
+
+The task handlers publish an event after each committed write; every open
+WebSocket of that user receives it instead of re-polling `GET /api/tasks`.
+
+Events go through a broker so several workers can share one feed. The default
+`LocalBroker` delivers within this process only. Set `EVENTS_URL=redis://...`
+to fan out through Redis pub/sub (requires the optional `redis` package).
+
+Each subscriber has a bounded queue. Publishers never wait on a slow
+consumer: when its queue is full the pending events are dropped and replaced
+by a single `{"type": "resync"}` event, telling the client to refetch the list.
+"""
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Optional, Set
+
+from .serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+EVENTS_URL = os.environ.get("EVENTS_URL", "")
+EVENTS_QUEUE_SIZE = int(os.environ.get("EVENTS_QUEUE_SIZE", "256"))
+
+RESYNC = dumps({"type": "resync"})
+
+Deliver = Callable[[str, bytes], None]
+
+
+class Subscription:
+    """One consumer's bounded event queue, bound to the event loop that created it."""
+
+    def __init__(self, maxsize: int = EVENTS_QUEUE_SIZE):
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def put(self, payload: bytes) -> None:
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self._put(payload)
+        elif not self.loop.is_closed():
+            # published from another thread / event loop
+            self.loop.call_soon_threadsafe(self._put, payload)
+
+    def _put(self, payload: bytes) -> None:
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def get(self) -> bytes:
+        return await self.queue.get()
+
+
+class LocalBroker:
+    """In-process broker: events only reach subscribers of this worker."""
+
+    def attach(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, user_id: str, payload: bytes) -> None:
+        self._deliver(user_id, payload)
+
+
+class RedisBroker:
+    """Broker on Redis pub/sub (e.g. `redis.asyncio.Redis`), shared by all workers.
+
+    Every worker publishes to `<prefix><user_id>` and listens on `<prefix>*`,
+    delivering what it receives to its local subscribers.
+    """
+
+    def __init__(self, client, prefix: str = "tasks:"):
+        self.client = client
+        self.prefix = prefix
+        self._listener: Optional[asyncio.Task] = None
+
+    def attach(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    async def start(self) -> None:
+        pubsub = self.client.pubsub()
+        await pubsub.psubscribe(f"{self.prefix}*")
+        self._listener = asyncio.create_task(self._listen(pubsub))
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    async def publish(self, user_id: str, payload: bytes) -> None:
+        await self.client.publish(f"{self.prefix}{user_id}", payload)
+
+    async def _listen(self, pubsub) -> None:
+        async for message in pubsub.listen():
+            if message.get("type") != "pmessage":
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            self._deliver(channel[len(self.prefix):], message["data"])
+
+
+class TaskEventBus:
+    """Fans published task events out to the subscribers of each user."""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        broker.attach(self._deliver)
+
+    def _deliver(self, user_id: str, payload: bytes) -> None:
+        for subscription in tuple(self._subscribers.get(user_id, ())):
+            subscription.put(payload)
+
+    async def start(self) -> None:
+        await self.broker.start()
+
+    async def stop(self) -> None:
+        await self.broker.stop()
+
+    def subscriber_count(self, user_id: Optional[str] = None) -> int:
+        if user_id is not None:
+            return len(self._subscribers.get(user_id, ()))
+        return sum(len(subs) for subs in self._subscribers.values())
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: str, maxsize: int = EVENTS_QUEUE_SIZE) -> AsyncIterator[Subscription]:
+        subscription = Subscription(maxsize)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subs = self._subscribers.get(user_id)
+            if subs is not None:
+                subs.discard(subscription)
+                if not subs:
+                    del self._subscribers[user_id]
+
+    async def publish(self, user_id: str, event: dict) -> None:
+        """Send `event` to every subscriber of `user_id`; never raises."""
+        try:
+            await self.broker.publish(user_id, dumps(event))
+        except Exception:
+            # the write is already committed; clients see it on their next fetch
+            logger.exception("failed to publish task event")
+
+
+def _build_bus() -> TaskEventBus:
+    if EVENTS_URL.startswith(("redis://", "rediss://")):
+        import redis.asyncio as redis  # optional dependency
+
+        return TaskEventBus(RedisBroker(redis.from_url(EVENTS_URL)))
+    return TaskEventBus(LocalBroker())
+
+
+task_events = _build_bus()
+
+
+def configure_events(bus: TaskEventBus) -> None:
+    """Swap the event bus (e.g. for tests)."""
+    global task_events
+    task_events = bus
+
+
+async def publish_task_event(user_id: str, event: dict) -> None:
+    """Push `event` to the user's open feeds; call after each committed task write."""
+    await task_events.publish(user_id, event)
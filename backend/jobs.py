@@ -0,0 +1,336 @@
+"""Background jobs persisted in the `jobs` table.
+
+Request handlers `enqueue` a job in their own transaction, so the job exists
+exactly when the write that needs it does. Workers claim the oldest queued job
+with a conditional UPDATE (safe with several workers or processes), run its
+handler and record the outcome in the handler's transaction, so a job's effects
+and its `succeeded` status commit together.
+
+A job stays `running` under a lease of `JOBS_LEASE_SECONDS`, which its worker
+renews while the handler runs; if the worker dies (e.g. on restart) the job
+becomes claimable again once the lease expires. A job is attempted at most
+`JOBS_MAX_ATTEMPTS` times, whether its handler failed or its worker died, and
+is then `failed`.
+
+The API process runs `JOBS_CONCURRENCY` workers in its event loop unless
+`JOBS_WORKER=false`; `python -m backend.jobs` runs them as a separate process.
+Wherever workers run, the deadline scanner (`deadlines.scan_overdue`) also
+runs every `REMINDER_INTERVAL` seconds.
+
+Kinds:
+- `chat_reply`: generate and store the bot reply to a user message
+- `delete_conversation`: delete a conversation and all of its messages
+- `delete_account`: delete all of a user's data (see `deletion.delete_account`)
+- `prune`: delete chat messages older than `CHAT_RETENTION_DAYS`, finished
+  jobs older than `JOBS_RETENTION_DAYS` and task tombstones older than
+  `TOMBSTONE_RETENTION_DAYS` (compacting the delta sync log); scheduled every
+  `JOBS_PRUNE_INTERVAL` seconds when a retention is set, unless one is
+  already queued or running
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import and_, delete, or_, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from .cache import bump_user_version
+from .conversations import record_messages, refresh_summaries
+from .db import async_session_scope
+from .deadlines import REMINDER_INTERVAL, scan_overdue
+from .deletion import delete_account, delete_conversation_messages
+from .models import ChatConversation, ChatMessage, Job, TaskTombstone
+from .sync import TOMBSTONE_RETENTION_DAYS
+
+logger = logging.getLogger(__name__)
+
+JOBS_WORKER = os.environ.get("JOBS_WORKER", "true").lower() in ("1", "true", "yes")
+JOBS_CONCURRENCY = int(os.environ.get("JOBS_CONCURRENCY", "2"))
+JOBS_POLL_INTERVAL = float(os.environ.get("JOBS_POLL_INTERVAL", "1"))
+JOBS_LEASE_SECONDS = int(os.environ.get("JOBS_LEASE_SECONDS", "300"))
+JOBS_MAX_ATTEMPTS = int(os.environ.get("JOBS_MAX_ATTEMPTS", "3"))
+JOBS_RETENTION_DAYS = int(os.environ.get("JOBS_RETENTION_DAYS", "7"))
+JOBS_PRUNE_INTERVAL = int(os.environ.get("JOBS_PRUNE_INTERVAL", "3600"))
+CHAT_RETENTION_DAYS = int(os.environ.get("CHAT_RETENTION_DAYS", "0"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+Handler = Callable[[AsyncSession, Job], Awaitable[Optional[Dict[str, Any]]]]
+HANDLERS: Dict[str, Handler] = {}
+
+
+def job_handler(kind: str):
+    """Register the coroutine that runs jobs of `kind`."""
+    def register(func: Handler) -> Handler:
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(session: AsyncSession, kind: str, payload: Dict[str, Any], user_id: Optional[str] = None) -> Job:
+    """Add a job to the caller's transaction; it becomes visible when the caller commits.
+
+    Call `job_worker.notify()` after the commit to start it without waiting for
+    the next poll.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind '{kind}'")
+    job = Job(kind=kind, payload=payload, user_id=user_id)
+    session.add(job)
+    return job
+
+
+@job_handler("chat_reply")
+async def _chat_reply(session: AsyncSession, job: Job) -> Dict[str, Any]:
+    from .routes.chat import chatbot
+
+    user_msg = await session.get(ChatMessage, job.payload["message_id"])
+    conv = await session.get(ChatConversation, job.payload["conversation_id"])
+    if user_msg is None or conv is None:
+        # the conversation was deleted before the reply was generated
+        return {"message_id": None}
+    # run the (possibly expensive) generator off the event loop
+    content = await run_in_threadpool(chatbot.get_response, user_msg.content)
+    bot_msg = ChatMessage(user_id=job.user_id, conversation_id=conv.id, content=content, sender="bot")
+    record_messages(conv, [bot_msg])
+    session.add_all([bot_msg, conv])
+    await session.flush()
+    return {"message_id": bot_msg.id}
+
+
+@job_handler("delete_conversation")
+async def _delete_conversation(session: AsyncSession, job: Job) -> Dict[str, Any]:
+    conversation_id = job.payload["conversation_id"]
+    # messages go in short batched transactions; the conversation row commits with the job
+    deleted = await delete_conversation_messages(conversation_id)
+    await session.execute(delete(ChatConversation).where(ChatConversation.id == conversation_id))
+    return {"deleted_messages": deleted}
+
+
+@job_handler("delete_account")
+async def _delete_account(session: AsyncSession, job: Job) -> Dict[str, Any]:
+    return {"deleted": await delete_account(job.user_id, keep_job_id=job.id)}
+
+
+@job_handler("prune")
+async def _prune(session: AsyncSession, job: Job) -> Dict[str, Any]:
+    now = datetime.utcnow()
+    result = {"deleted_messages": 0, "deleted_jobs": 0, "deleted_tombstones": 0}
+    days = job.payload.get("chat_retention_days", CHAT_RETENTION_DAYS)
+    if days:
+        expired = ChatMessage.created_at < now - timedelta(days=days)
+        touched = (await session.exec(select(ChatMessage.conversation_id).where(expired).distinct())).all()
+        deleted = await session.execute(delete(ChatMessage).where(expired))
+        await refresh_summaries(session, touched)
+        result["deleted_messages"] = deleted.rowcount
+    days = job.payload.get("jobs_retention_days", JOBS_RETENTION_DAYS)
+    if days:
+        deleted = await session.execute(
+            delete(Job).where(Job.status.in_(FINISHED), Job.finished_at < now - timedelta(days=days))
+        )
+        result["deleted_jobs"] = deleted.rowcount
+    days = job.payload.get("tombstone_retention_days", TOMBSTONE_RETENTION_DAYS)
+    if days:
+        deleted = await session.execute(
+            delete(TaskTombstone).where(TaskTombstone.deleted_at < now - timedelta(days=days))
+        )
+        result["deleted_tombstones"] = deleted.rowcount
+    return result
+
+
+class JobWorker:
+    """Claims and runs queued jobs from the `jobs` table."""
+
+    def __init__(self, concurrency: int = JOBS_CONCURRENCY, poll_interval: float = JOBS_POLL_INTERVAL):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake idle workers after enqueuing (no-op when none run in this loop)."""
+        if self._wakeup is not None:
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is self._loop:
+                self._wakeup.set()
+            elif not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        if CHAT_RETENTION_DAYS or JOBS_RETENTION_DAYS or TOMBSTONE_RETENTION_DAYS:
+            self._tasks.append(asyncio.create_task(self._schedule_prune()))
+        if REMINDER_INTERVAL:
+            self._tasks.append(asyncio.create_task(self._scan_deadlines()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+
+    async def run_pending(self) -> int:
+        """Run claimable jobs until none are left; returns how many ran."""
+        count = 0
+        while await self.run_one():
+            count += 1
+        return count
+
+    async def run_one(self) -> bool:
+        job_id = await self._claim()
+        if job_id is None:
+            return False
+        await self._run(job_id)
+        return True
+
+    async def _work(self) -> None:
+        while True:
+            # cleared before looking, so a notify during the lookup is not lost
+            self._wakeup.clear()
+            try:
+                if await self.run_one():
+                    continue
+            except Exception:
+                logger.exception("job worker error")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _schedule_prune(self) -> None:
+        while True:
+            try:
+                if await self._enqueue_prune():
+                    self.notify()
+            except Exception:
+                logger.exception("prune scheduling failed")
+            await asyncio.sleep(JOBS_PRUNE_INTERVAL)
+
+    async def _enqueue_prune(self) -> bool:
+        # every process running workers schedules prunes; one pending prune is enough
+        async with async_session_scope() as session:
+            pending = (await session.exec(
+                select(Job.id).where(Job.kind == "prune", Job.status.in_((QUEUED, RUNNING))).limit(1)
+            )).first()
+            if pending is not None:
+                return False
+            enqueue(session, "prune", {})
+            await session.commit()
+        return True
+
+    async def _scan_deadlines(self) -> None:
+        while True:
+            await asyncio.sleep(REMINDER_INTERVAL)
+            try:
+                await scan_overdue()
+            except Exception:
+                logger.exception("deadline scan failed")
+
+    async def _claim(self) -> Optional[int]:
+        now = datetime.utcnow()
+        expired = and_(Job.status == RUNNING, Job.started_at < now - timedelta(seconds=JOBS_LEASE_SECONDS))
+        claimable = or_(Job.status == QUEUED, and_(expired, Job.attempts < JOBS_MAX_ATTEMPTS))
+        async with async_session_scope() as session:
+            while True:
+                candidate = (await session.exec(
+                    select(Job.id, Job.attempts).where(or_(Job.status == QUEUED, expired)).order_by(Job.id).limit(1)
+                )).first()
+                if candidate is None:
+                    return None
+                job_id, attempts = candidate
+                if attempts >= JOBS_MAX_ATTEMPTS:
+                    # its last attempt took the worker down (crash, OOM): not retried again
+                    await session.execute(
+                        update(Job)
+                        .where(Job.id == job_id, expired)
+                        .values(status=FAILED, finished_at=now, error="Worker lost on every attempt")
+                    )
+                    await session.commit()
+                    continue
+                # only one worker's UPDATE matches; the others retry with the next job
+                claimed = await session.execute(
+                    update(Job)
+                    .where(Job.id == job_id, claimable)
+                    .values(status=RUNNING, started_at=now, attempts=Job.attempts + 1)
+                )
+                await session.commit()
+                if claimed.rowcount == 1:
+                    return job_id
+
+    async def _renew_lease(self, job_id: int) -> None:
+        while True:
+            await asyncio.sleep(JOBS_LEASE_SECONDS / 3)
+            async with async_session_scope() as session:
+                await session.execute(
+                    update(Job).where(Job.id == job_id, Job.status == RUNNING).values(started_at=datetime.utcnow())
+                )
+                await session.commit()
+
+    async def _run(self, job_id: int) -> None:
+        # a handler running past the lease would otherwise be claimed and run a second time
+        heartbeat = asyncio.create_task(self._renew_lease(job_id))
+        try:
+            await self._execute(job_id)
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+
+    async def _execute(self, job_id: int) -> None:
+        async with async_session_scope() as session:
+            job = await session.get(Job, job_id)
+            if job is None:
+                # deleted with its user's account
+                return
+            handler = HANDLERS.get(job.kind)
+            try:
+                if handler is None:
+                    raise LookupError(f"No handler for job kind '{job.kind}'")
+                result = await handler(session, job)
+                job.status, job.result, job.error = SUCCEEDED, result, None
+                job.finished_at = datetime.utcnow()
+                session.add(job)
+                await session.commit()
+            except Exception as e:
+                logger.exception("job %s (%s) failed", job_id, job.kind)
+                await session.rollback()
+                job = await session.get(Job, job_id)
+                if job is None:
+                    return
+                job.error = str(e) or type(e).__name__
+                if job.attempts >= JOBS_MAX_ATTEMPTS or handler is None:
+                    job.status, job.finished_at = FAILED, datetime.utcnow()
+                else:
+                    job.status = QUEUED
+                session.add(job)
+                await session.commit()
+                return
+        if job.user_id:
+            await bump_user_version(job.user_id)
+
+
+job_worker = JobWorker()
+
+
+async def _main() -> None:
+    from .db import create_db_and_tables
+
+    create_db_and_tables()
+    await job_worker.start()
+    await asyncio.gather(*job_worker._tasks)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
@@ -1,11 +1,15 @@
+# first, so the import phase covers everything below
+from .startup import LAZY_ROUTERS, SCHEMA_ON_STARTUP, LazyRouters, StartupMiddleware, startup_timer
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from sqlmodel import SQLModel
 import os
 
-from .db import engine, create_db_and_tables
+# events and metrics serve the eagerly included task routes (see backend.startup)
+from . import events, metrics
+from . import db
+from .db import async_engine, check_schema_revision, create_db_and_tables
 from .routes.tasks import router as tasks_router
-from .routes.chat import router as chat_router
 
 app = FastAPI(title="Task API")
 
@@ -30,16 +34,70 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Before-Cursor", "X-After-Cursor"],
 )
 
 app.include_router(tasks_router)
-app.include_router(chat_router)
+
+# the remaining routers, by the path prefixes they serve (see backend.startup)
+lazy_routers = LazyRouters(app, {
+    "backend.routes.chat": ("/api/chat",),
+    "backend.routes.admin": ("/api/admin",),
+    "backend.routes.jobs": ("/api/jobs",),
+    "backend.routes.account": ("/api/account",),
+    "backend.routes.transfer": ("/api/export", "/api/import"),
+})
+if not LAZY_ROUTERS:
+    lazy_routers.include_all()
+app.add_middleware(StartupMiddleware, routers=lazy_routers)
+
+
+def openapi():
+    # the schema documents every route, loaded or not
+    lazy_routers.include_all()
+    return FastAPI.openapi(app)
+
+
+app.openapi = openapi
+
+if metrics.METRICS_ENABLED:
+    metrics.install(app)
+
+startup_timer.mark("import")
 
 
 @app.on_event("startup")
-def on_startup():
-    # ensure DB and tables exist
-    create_db_and_tables()
+async def on_startup():
+    with startup_timer.phase("schema"):
+        if SCHEMA_ON_STARTUP == "create":
+            # ensure DB and tables exist
+            create_db_and_tables()
+        elif SCHEMA_ON_STARTUP == "check":
+            await check_schema_revision()
+    with startup_timer.phase("events"):
+        await events.task_events.start()
+    with startup_timer.phase("jobs"):
+        # imported here: the worker and its handlers are not needed to serve requests
+        from . import jobs
+
+        if jobs.JOBS_WORKER:
+            await jobs.job_worker.start()
+    await db.replicas.start()
+    startup_timer.ready()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    from . import jobs
+
+    await events.task_events.stop()
+    await jobs.job_worker.stop()
+    await db.replicas.stop()
+    # close pooled connections (aiosqlite keeps a thread per connection that
+    # would otherwise hold the process open)
+    await async_engine.dispose()
+    await db.replicas.dispose()
+
 
 @app.get("/health")
 def health_check():
@@ -0,0 +1,297 @@
+"""Request timing, SQL instrumentation and a Prometheus `/metrics` endpoint.
+
+Off by default. With `METRICS_ENABLED=true`, `install(app)` adds an ASGI
+middleware that times every request per route template, SQLAlchemy cursor
+hooks on the primary and read replica engines that time every statement
+(logging those slower than `SLOW_QUERY_MS`) and attribute query counts and DB
+time to the request, and a `GET /metrics` route in the Prometheus text format,
+guarded like the admin endpoints (`auth.require_admin`). Time spent verifying
+JWTs and encoding list responses is recorded as separate phases. When
+disabled nothing is installed, and the phase hooks cost one attribute check.
+
+The collectors are implemented here rather than with `prometheus_client`,
+so there is no extra dependency; values are per process.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from fastapi import Depends, FastAPI, Response
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "200"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name, self.help, self.label_names = name, help_text, tuple(label_names)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                yield f"{self.name}{_labels(self.label_names, labels)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help_text, tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets + (float("inf"),), series[:-1]):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else _number(bound)
+                    le_label = 'le="' + le + '"'
+                    yield f"{self.name}_bucket{_labels(self.label_names, labels, le_label)} {cumulative}"
+                yield f"{self.name}_sum{_labels(self.label_names, labels)} {_number(series[-1])}"
+                yield f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}"
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Request latency by route template.", ("method", "route", "status"))
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements issued per request.", ("method", "route"), COUNT_BUCKETS)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time per request spent executing SQL.", ("method", "route"), LATENCY_BUCKETS)
+QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time by statement type.", ("statement",), QUERY_BUCKETS)
+SLOW_QUERIES = Counter(
+    "db_slow_queries_total", f"SQL statements slower than SLOW_QUERY_MS ({SLOW_QUERY_MS:g} ms).", ("statement",))
+PHASE_SECONDS = Histogram(
+    "app_phase_duration_seconds", "Time spent in auth (JWT verification) and response serialization.",
+    ("phase",), QUERY_BUCKETS)
+RATE_LIMITED = Counter(
+    "http_rate_limited_total", "Requests rejected with 429 by a per-user rate limit.", ("limit",))
+COALESCED = Counter(
+    "http_coalesced_requests_total", "Read requests served by joining an identical in-flight request.", ("route",))
+
+REMINDERS = Counter("task_reminders_total", "task.overdue events pushed by the deadline scanner.")
+
+COLLECTORS = (
+    REQUEST_SECONDS, REQUEST_QUERIES, REQUEST_DB_SECONDS, QUERY_SECONDS, SLOW_QUERIES, PHASE_SECONDS,
+    RATE_LIMITED, COALESCED, REMINDERS,
+)
+
+
+class _RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# Mutable per-request holder; SQLAlchemy runs async-driver hooks in a greenlet
+# that shares the request's context, and sync dependencies get a copy of it.
+_request_stats: ContextVar[Optional[_RequestStats]] = ContextVar("request_stats", default=None)
+
+
+_enabled = False
+
+
+def observe_phase(phase: str, seconds: float) -> None:
+    """Record time spent in an application phase ('auth', 'serialize')."""
+    if _enabled:
+        PHASE_SECONDS.observe(seconds, phase)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    QUERY_SECONDS.observe(elapsed, kind)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.inc(kind)
+        logger.warning("slow query (%.1f ms): %s", elapsed * 1000, " ".join(statement.split())[:500])
+
+
+def _handle_error(exception_context):
+    # the statement failed, so after_cursor_execute will not pop its start time
+    starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(sync_engine) -> None:
+    """Attach the statement timing hooks to a (sync or `AsyncEngine.sync_engine`) engine."""
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(sync_engine, "handle_error", _handle_error)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each HTTP request by its route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        stats = _RequestStats()
+        token = _request_stats.set(stats)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_stats.reset(token)
+            route = scope.get("route")
+            # unmatched paths share one label so scanners cannot blow up cardinality
+            path = getattr(route, "path", None) or "<unmatched>"
+            method = scope["method"]
+            REQUEST_SECONDS.observe(elapsed, method, path, str(status))
+            REQUEST_QUERIES.observe(stats.queries, method, path)
+            REQUEST_DB_SECONDS.observe(stats.db_seconds, method, path)
+
+
+def _pool_lines(engines: Dict[str, object]) -> Iterable[str]:
+    from .db import pool_status
+
+    gauges = {
+        "size": "Configured pool size.",
+        "checked_out": "Connections currently checked out.",
+        "checked_in": "Idle connections in the pool.",
+        "overflow": "Overflow connections currently open.",
+    }
+    counters = {
+        "checkouts": "Connection checkouts.",
+        "timeouts": "Checkouts that timed out waiting for a connection.",
+        "wait_seconds_total": "Time spent waiting for a connection.",
+    }
+    statuses = {name: pool_status(eng) for name, eng in engines.items()}
+    for key, help_text in gauges.items():
+        yield f"# HELP db_pool_{key} {help_text}"
+        yield f"# TYPE db_pool_{key} gauge"
+        for name, status in statuses.items():
+            if key in status:
+                yield f'db_pool_{key}{{engine="{name}"}} {_number(status[key])}'
+    for key, help_text in counters.items():
+        metric = f"db_pool_{key}" if key.endswith("_total") else f"db_pool_{key}_total"
+        yield f"# HELP {metric} {help_text}"
+        yield f"# TYPE {metric} counter"
+        for name, status in statuses.items():
+            if key in status:
+                yield f'{metric}{{engine="{name}"}} {_number(status[key])}'
+
+
+def render(engines: Dict[str, object]) -> str:
+    """All metrics in the Prometheus text exposition format."""
+    from .auth import token_cache
+
+    lines = []
+    for collector in COLLECTORS:
+        lines.extend(collector.render())
+    lines.extend(_pool_lines(engines))
+    cache = token_cache.stats()
+    for key in ("hits", "misses", "evictions"):
+        lines.append(f"# TYPE auth_token_cache_{key}_total counter")
+        lines.append(f"auth_token_cache_{key}_total {cache[key]}")
+    return "\n".join(lines) + "\n"
+
+
+def _engines() -> Dict[str, object]:
+    from . import db
+
+    engines = {"async": db.async_engine.sync_engine, "sync": db.engine}
+    # looked up on each scrape: configure_replicas may swap the set
+    for index, replica in enumerate(db.replicas.engines):
+        engines[f"replica{index}"] = replica.sync_engine
+    return engines
+
+
+def install(app: FastAPI) -> None:
+    """Enable request/SQL instrumentation and serve `GET /metrics` on `app`."""
+    global _enabled
+    from . import db
+    from .auth import require_admin
+
+    for eng in _engines().values():
+        instrument_engine(eng)
+    # replica engines built later (configure_replicas)
+    if instrument_engine not in db.engine_hooks:
+        db.engine_hooks.append(instrument_engine)
+    app.add_middleware(MetricsMiddleware)
+
+    # per-route traffic and pool sizes are as sensitive as /api/admin/*
+    @app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_admin)])
+    def metrics():
+        return Response(render(_engines()), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    _enabled = True
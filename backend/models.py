@@ -1,8 +1,8 @@
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from sqlmodel import SQLModel, Field
 from sqlmodel import Column
-from sqlalchemy import DateTime, Boolean, String
+from sqlalchemy import DateTime, Boolean, ForeignKey, Integer, String, Index, JSON, text
 
 
 class User(SQLModel, table=True):
@@ -21,6 +21,20 @@ class TaskBase(SQLModel):
 
 class Task(TaskBase, table=True):
     __tablename__ = "tasks"
+    # Composite indexes backing keyset pagination of GET /api/tasks, one per sort mode.
+    __table_args__ = (
+        Index("ix_tasks_user_completed_created_at", "user_id", "completed", "created_at", "id"),
+        Index("ix_tasks_user_completed_title", "user_id", "completed", "title", "id"),
+        Index("ix_tasks_user_completed_due_date", "user_id", "completed", "due_date", "id"),
+        # Backs GET /api/tasks/changes (tasks changed after a sync token).
+        Index("ix_tasks_user_updated_at", "user_id", "updated_at", "id"),
+        # Pending tasks with a due date, across all users, for the deadline scanner (deadlines.py).
+        Index(
+            "ix_tasks_pending_due", "due_date", "id",
+            sqlite_where=text("completed = 0 AND due_date IS NOT NULL"),
+            postgresql_where=text("completed = false AND due_date IS NOT NULL"),
+        ),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: str = Field(foreign_key="users.id", index=True)
     due_date: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, nullable=True))
@@ -52,12 +66,93 @@ class TaskUpdate(SQLModel):
     due_date: Optional[datetime] = None
 
 
+class TaskStats(SQLModel, table=True):
+    """Per-user task counters, maintained by the task handlers in the same transaction."""
+    __tablename__ = "task_stats"
+    user_id: str = Field(primary_key=True)
+    total: int = Field(default=0, nullable=False)
+    completed: int = Field(default=0, nullable=False)
+
+
+class TaskStatsRead(SQLModel):
+    total: int
+    completed: int
+    pending: int
+    overdue: int
+    due_this_week: int
+
+
+class TaskTombstone(SQLModel, table=True):
+    """A deleted task, kept so delta sync can report the deletion; pruned after a retention period."""
+    __tablename__ = "task_tombstones"
+    __table_args__ = (
+        Index("ix_task_tombstones_user_deleted_at", "user_id", "deleted_at", "id"),
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: str = Field(nullable=False)
+    task_id: int = Field(nullable=False)
+    deleted_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime, nullable=False, default=datetime.utcnow))
+
+
+class ReminderScan(SQLModel, table=True):
+    """How far a deadline scanner has read; advanced by each run (see deadlines.py)."""
+    __tablename__ = "reminder_scans"
+    name: str = Field(primary_key=True, max_length=50)
+    scanned_through: datetime = Field(sa_column=Column(DateTime, nullable=False))
+
+
+class TaskChanges(SQLModel):
+    """One page of GET /api/tasks/changes."""
+    tasks: List[TaskRead]
+    deleted: List[int]
+    next: str
+    has_more: bool
+
+
+# Bulk task operations
+MAX_BULK_ITEMS = 500
+
+
+class TaskBulkCreate(SQLModel):
+    items: List[TaskCreate] = Field(..., min_items=1, max_items=MAX_BULK_ITEMS)
+
+
+class TaskBulkUpdateItem(TaskUpdate):
+    id: int
+
+
+class TaskBulkUpdate(SQLModel):
+    items: List[TaskBulkUpdateItem] = Field(..., min_items=1, max_items=MAX_BULK_ITEMS)
+
+
+class TaskBulkDelete(SQLModel):
+    ids: List[int] = Field(..., min_items=1, max_items=MAX_BULK_ITEMS)
+
+
+class TaskBulkResult(SQLModel):
+    id: Optional[int] = None
+    status: int
+    task: Optional[TaskRead] = None
+    error: Optional[str] = None
+
+
+class TaskBulkResponse(SQLModel):
+    results: List[TaskBulkResult]
+
+
 # Chat Models
 class ChatMessage(SQLModel, table=True):
     __tablename__ = "chat_messages"
+    # Backs conversation lookups and keyset pagination of message history.
+    __table_args__ = (
+        Index("ix_chat_messages_conversation_created_at", "conversation_id", "created_at", "id"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: str = Field(foreign_key="users.id", index=True)
-    conversation_id: int = Field(foreign_key="chat_conversations.id", index=True)
+    # ON DELETE CASCADE backs up the explicit set-based deletes (see deletion.py)
+    conversation_id: int = Field(sa_column=Column(
+        Integer, ForeignKey("chat_conversations.id", ondelete="CASCADE"), nullable=False
+    ))
     content: str = Field(..., min_length=1, max_length=2000)
     sender: str = Field(..., regex="^(user|bot)$")
     created_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime, default=datetime.utcnow))
@@ -77,11 +172,19 @@ class ChatMessageRead(SQLModel):
 
 class ChatConversation(SQLModel, table=True):
     __tablename__ = "chat_conversations"
+    # Backs keyset pagination of the conversation list (most recently active first).
+    __table_args__ = (
+        Index("ix_chat_conversations_user_updated_at", "user_id", "updated_at", "id"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: str = Field(foreign_key="users.id", index=True)
     title: str = Field(default="New Conversation", max_length=200)
     created_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime, default=datetime.utcnow))
     updated_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow))
+    # Denormalized from chat_messages, written with the messages (see conversations.py).
+    message_count: int = Field(default=0, sa_column=Column(Integer, nullable=False, server_default="0"))
+    last_message_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime))
+    last_message_snippet: Optional[str] = Field(default=None, max_length=200)
 
 
 class ChatConversationCreate(SQLModel):
@@ -93,3 +196,96 @@ class ChatConversationRead(SQLModel):
     title: str
     created_at: datetime
     updated_at: datetime
+    message_count: int = 0
+    last_message_at: Optional[datetime] = None
+    last_message_snippet: Optional[str] = None
+
+
+# Background jobs
+class Job(SQLModel, table=True):
+    __tablename__ = "jobs"
+    # Backs the worker's "oldest claimable job" lookup.
+    __table_args__ = (
+        Index("ix_jobs_status_id", "status", "id"),
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: Optional[str] = Field(default=None, index=True)
+    kind: str = Field(..., max_length=50)
+    payload: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON, nullable=False))
+    status: str = Field(default="queued", max_length=20)
+    attempts: int = Field(default=0, nullable=False)
+    result: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(JSON))
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime, default=datetime.utcnow))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class JobRead(SQLModel):
+    id: int
+    kind: str
+    status: str
+    attempts: int
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+class ChatMessageAccepted(SQLModel):
+    """202 response of a deferred chat turn: the stored user message and the reply job."""
+    message: ChatMessageRead
+    job: JobRead
+
+
+# Export / import
+class ImportRun(SQLModel, table=True):
+    """Progress of one `POST /api/import`, committed with each batch so an import can resume."""
+    __tablename__ = "imports"
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: str = Field(index=True)
+    status: str = Field(default="running", max_length=20)
+    # input lines fully applied; a resumed upload skips this many
+    lines: int = Field(default=0, nullable=False)
+    tasks: int = Field(default=0, nullable=False)
+    conversations: int = Field(default=0, nullable=False)
+    messages: int = Field(default=0, nullable=False)
+    # exported conversation id -> imported conversation id, for the messages that follow
+    conversation_ids: Dict[str, int] = Field(default_factory=dict, sa_column=Column(JSON, nullable=False))
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime, default=datetime.utcnow))
+    updated_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow))
+
+
+class ImportRead(SQLModel):
+    id: int
+    status: str
+    lines: int
+    tasks: int
+    conversations: int
+    messages: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class TaskImport(SQLModel):
+    title: str = Field(..., min_length=1, max_length=200)
+    description: Optional[str] = Field(None, max_length=1000)
+    completed: bool = False
+    due_date: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+
+
+class ChatConversationImport(SQLModel):
+    id: int
+    title: str = Field(default="New Conversation", max_length=200)
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class ChatMessageImport(SQLModel):
+    conversation_id: int
+    content: str = Field(..., min_length=1, max_length=2000)
+    sender: str = Field(..., regex="^(user|bot)$")
+    created_at: Optional[datetime] = None
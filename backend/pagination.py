@@ -0,0 +1,48 @@
+"""Opaque cursor tokens for keyset pagination.
+
+A cursor records the sort key values of the last row on a page so the next
+page can resume with a `(key, id) > (last_key, last_id)` style predicate
+instead of an OFFSET scan. Tokens are URL-safe base64 JSON; clients should
+treat them as opaque.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Sequence
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(kind: str, values: Sequence[Any]) -> str:
+    """Build a cursor for `kind` (e.g. the sort mode) from the row's key values."""
+    payload = json.dumps([kind, [_encode_value(v) for v in values]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, kind: str) -> List[Any]:
+    """Return the key values stored in `token`.
+
+    Raises ValueError if the token is malformed or was issued for a different `kind`.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        token_kind, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+        raise ValueError("Malformed cursor")
+    if token_kind != kind or not isinstance(values, list):
+        raise ValueError("Cursor does not match this query")
+    try:
+        return [_decode_value(v) for v in values]
+    except (TypeError, ValueError):
+        raise ValueError("Malformed cursor")
@@ -0,0 +1,145 @@
+"""Per-user token-bucket rate limits.
+
+Each route opts in with `dependencies=[Depends(rate_limit("<limit>"))]`. The
+dependency resolves the user with `get_current_user` (shared with the route,
+so the token is verified once) and takes one token from that user's bucket
+for the limit. An empty bucket answers 429 with `Retry-After` before the
+route opens a database session, so one client cannot tie up the pool.
+
+Limits are `<rate per second>/<burst>` pairs, defaulting to `DEFAULT_LIMITS`
+and overridden with e.g. `RATE_LIMITS="chat_send=0.5/5,tasks_read=50/200"`.
+
+Buckets live in this process by default. With several workers set
+`RATE_LIMIT_URL=redis://...` to share them through Redis (requires the
+optional `redis` package); the refill-and-take runs as one Lua script, so
+concurrent workers cannot overspend a bucket.
+"""
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from fastapi import Depends, HTTPException
+
+from .auth import get_current_user
+from .metrics import RATE_LIMITED
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_URL = os.environ.get("RATE_LIMIT_URL", "")
+RATE_LIMIT_STORE_SIZE = int(os.environ.get("RATE_LIMIT_STORE_SIZE", "100000"))
+
+# limit name -> (tokens per second, bucket size)
+DEFAULT_LIMITS: Dict[str, Tuple[float, int]] = {
+    "tasks_read": (20, 100),
+    "tasks_write": (10, 50),
+    "chat_read": (20, 100),
+    "chat_send": (2, 20),
+    "transfer": (0.2, 5),
+}
+
+
+def parse_limits(spec: str) -> Dict[str, Tuple[float, int]]:
+    """'chat_send=0.5/5,tasks_read=50/200' -> {'chat_send': (0.5, 5), 'tasks_read': (50.0, 200)}"""
+    limits = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, value = part.partition("=")
+        rate, _, burst = value.partition("/")
+        limits[name.strip()] = (float(rate), int(burst or max(1, math.ceil(float(rate)))))
+    return limits
+
+
+LIMITS = {**DEFAULT_LIMITS, **parse_limits(os.environ.get("RATE_LIMITS", ""))}
+
+
+def take_token(tokens: float, updated: float, now: float, rate: float, burst: int) -> Tuple[bool, float]:
+    """Refill a bucket holding `tokens` as of `updated` and try to take one; returns (allowed, tokens left)."""
+    tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+    if tokens >= 1:
+        return True, tokens - 1
+    return False, tokens
+
+
+class MemoryRateLimitStore:
+    """Buckets in a bounded in-process LRU; an evicted bucket starts full again."""
+
+    def __init__(self, maxsize: int = RATE_LIMIT_STORE_SIZE):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (burst, now))
+        allowed, tokens = take_token(tokens, updated, now, rate, burst)
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return allowed, tokens
+
+
+# KEYS[1] bucket hash; ARGV rate, burst, now. Mirrors `take_token`.
+TAKE_SCRIPT = """
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisRateLimitStore:
+    """Buckets shared through a Redis-compatible asyncio client; only `eval` is used."""
+
+    def __init__(self, client, prefix: str = "rl:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        allowed, tokens = await self.client.eval(TAKE_SCRIPT, 1, self.prefix + key, rate, burst, time.time())
+        return bool(int(allowed)), float(tokens)
+
+
+def _build_store():
+    if RATE_LIMIT_URL.startswith(("redis://", "rediss://")):
+        import redis.asyncio as redis  # optional dependency
+
+        return RedisRateLimitStore(redis.from_url(RATE_LIMIT_URL))
+    return MemoryRateLimitStore()
+
+
+rate_limit_store = _build_store()
+
+
+def configure_rate_limits(store) -> None:
+    """Swap the bucket store (e.g. for tests)."""
+    global rate_limit_store
+    rate_limit_store = store
+
+
+def rate_limit(name: str):
+    """Dependency charging one request to the current user's `name` bucket."""
+    if name not in LIMITS:
+        raise ValueError(f"Unknown rate limit '{name}'")
+
+    async def check(user_id: str = Depends(get_current_user)) -> None:
+        if not RATE_LIMIT_ENABLED:
+            return
+        rate, burst = LIMITS[name]
+        allowed, tokens = await rate_limit_store.take(f"{name}:{user_id}", rate, burst)
+        if not allowed:
+            RATE_LIMITED.inc(name)
+            retry_after = math.ceil((1 - tokens) / rate)
+            raise HTTPException(
+                status_code=429, detail="Too many requests", headers={"Retry-After": str(retry_after)}
+            )
+
+    return check
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..auth import get_current_user
+from ..db import get_async_session
+from ..jobs import enqueue, job_worker
+from ..models import JobRead
+
+router = APIRouter()
+
+
+@router.delete('/api/account', response_model=JobRead, status_code=202)
+async def delete_account(
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Delete all of the user's tasks, conversations and messages.
+
+    The deletion runs as a background `delete_account` job in bounded batches;
+    poll `GET /api/jobs/{id}` for completion.
+    """
+    job = enqueue(session, 'delete_account', {}, user_id)
+    await session.commit()
+    job_worker.notify()
+    return job
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+
+from ..auth import require_admin, token_cache
+from .. import db
+from ..db import engine, async_engine, pool_status, get_async_session
+from ..jobs import enqueue, job_worker
+from ..models import JobRead
+from ..startup import startup_timer
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+router = APIRouter()
+
+
+@router.get('/api/admin/pool', dependencies=[Depends(require_admin)])
+def get_pool_stats():
+    """Connection pool occupancy and checkout wait statistics."""
+    return {
+        "async": pool_status(async_engine.sync_engine),
+        "sync": pool_status(engine),
+        "replicas": [
+            {"healthy": healthy, **pool_status(replica.sync_engine)}
+            for replica, healthy in zip(db.replicas.engines, db.replicas.healthy)
+        ],
+    }
+
+
+@router.get('/api/admin/auth-cache', dependencies=[Depends(require_admin)])
+def get_auth_cache_stats():
+    """Verified-token cache size and hit/miss counters."""
+    return token_cache.stats()
+
+
+@router.get('/api/admin/startup', dependencies=[Depends(require_admin)])
+def get_startup_timings():
+    """How long this worker took to import, start and serve its first request."""
+    return startup_timer.report()
+
+
+@router.post('/api/admin/jobs/prune', response_model=JobRead, status_code=202, dependencies=[Depends(require_admin)])
+async def prune_now(
+    chat_retention_days: Optional[int] = Query(None, ge=1),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Queue a `prune` job now; `chat_retention_days` overrides CHAT_RETENTION_DAYS."""
+    payload = {} if chat_retention_days is None else {"chat_retention_days": chat_retention_days}
+    job = enqueue(session, "prune", payload)
+    await session.commit()
+    job_worker.notify()
+    return job
@@ -1,156 +1,357 @@
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Header
-from typing import List, Optional
-import jwt
+import json
 import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, func, tuple_
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from typing import List, Optional
 
-from ..db import get_session
+from ..auth import get_current_user
+from ..cache import cached_json_response, bump_user_version
+from ..db import get_async_session, get_read_session, async_session_scope
 from sqlmodel import select
-from ..models import ChatMessage, ChatMessageCreate, ChatMessageRead, ChatConversation, ChatConversationCreate, ChatConversationRead
+from sqlmodel.ext.asyncio.session import AsyncSession
+from ..models import (
+    ChatMessage, ChatMessageCreate, ChatMessageRead, ChatMessageAccepted,
+    ChatConversation, ChatConversationCreate, ChatConversationRead, JobRead,
+)
+from ..jobs import enqueue, job_worker
 from ..chatbot_service import ChatbotService
+from ..conversations import record_messages
+from ..pagination import encode_cursor, decode_cursor
+from ..ratelimit import rate_limit
+from ..serialization import FastJSONResponse, dumps, read_columns, rows_to_dicts
 
 router = APIRouter()
 chatbot = ChatbotService()
 
+DEFAULT_CONVERSATION_PAGE_SIZE = 50
+MAX_CONVERSATION_PAGE_SIZE = 500
+DEFAULT_MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 500
+# conversations with more messages than this are deleted by a background job
+CONVERSATION_DELETE_INLINE_LIMIT = int(os.environ.get("CONVERSATION_DELETE_INLINE_LIMIT", "1000"))
 
-def get_current_user(authorization: Optional[str] = Header(None)) -> str:
-    """Auth dependency.
+# list responses select these columns as plain rows and encode them directly
+CONVERSATION_FIELDS, CONVERSATION_COLUMNS = read_columns(ChatConversationRead, ChatConversation)
+MESSAGE_FIELDS, MESSAGE_COLUMNS = read_columns(ChatMessageRead, ChatMessage)
 
-    If `JWT_SECRET` env var is set, decode and verify JWT (expect `sub` claim as user id).
-    Otherwise, for convenience in local dev, treat the token string as the user id.
-    """
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing Authorization header")
-    parts = authorization.split()
-    if len(parts) != 2 or parts[0].lower() != "bearer":
-        raise HTTPException(status_code=401, detail="Invalid Authorization header")
-    token = parts[1]
-
-    secret = os.environ.get('JWT_SECRET')
-    if secret:
-        try:
-            payload = jwt.decode(token, secret, algorithms=["HS256"])
-            user_id = payload.get('sub') or payload.get('user_id')
-            if not user_id:
-                raise HTTPException(status_code=401, detail="Invalid token payload")
-            return user_id
-        except jwt.PyJWTError:
-            raise HTTPException(status_code=401, detail="Invalid JWT token")
 
-    # Fallback: treat token as user_id (dev only)
-    return token
+@router.get('/api/chat/conversations', response_model=List[ChatConversationRead], dependencies=[Depends(rate_limit('chat_read'))])
+async def list_conversations(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_CONVERSATION_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """List the user's chat conversations, most recently active first (ETag / If-None-Match aware).
+
+    Each carries its message count and a preview of its latest message. Without
+    `limit` or `cursor` all of them are returned; when paginating, the
+    `X-Next-Cursor` header carries the token for the following page.
+    """
+    async def build():
+        nonlocal limit
+        stmt = select(*CONVERSATION_COLUMNS).where(ChatConversation.user_id == user_id)
+        if cursor:
+            try:
+                values = decode_cursor(cursor, 'conversations')
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            if len(values) != 2:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            stmt = stmt.where(tuple_(ChatConversation.updated_at, ChatConversation.id) < tuple_(*values))
+            if limit is None:
+                limit = DEFAULT_CONVERSATION_PAGE_SIZE
+        stmt = stmt.order_by(ChatConversation.updated_at.desc(), ChatConversation.id.desc())
 
+        headers = {}
+        if limit is None:
+            conversations = (await session.exec(stmt)).all()
+        else:
+            # one extra row tells whether another page exists
+            conversations = (await session.exec(stmt.limit(limit + 1))).all()
+            if len(conversations) > limit:
+                conversations = conversations[:limit]
+                last = conversations[-1]
+                headers['X-Next-Cursor'] = encode_cursor('conversations', [last.updated_at, last.id])
+        return dumps(rows_to_dicts(CONVERSATION_FIELDS, conversations)), headers
 
-@router.get('/api/chat/conversations', response_model=List[ChatConversationRead])
-def list_conversations(user_id: str = Depends(get_current_user)):
-    """List all chat conversations for the user."""
-    with get_session() as session:
-        stmt = select(ChatConversation).where(ChatConversation.user_id == user_id).order_by(ChatConversation.updated_at.desc())
-        conversations = session.exec(stmt).all()
-        return conversations
+    return await cached_json_response(request, user_id, build)
 
 
 @router.post('/api/chat/conversations', response_model=ChatConversationRead, status_code=201)
-def create_conversation(
+async def create_conversation(
     conversation_in: ChatConversationCreate,
-    user_id: str = Depends(get_current_user)
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """Create a new chat conversation."""
-    with get_session() as session:
-        conversation = ChatConversation(
-            user_id=user_id,
-            title=conversation_in.title or "New Conversation"
-        )
-        session.add(conversation)
-        session.commit()
-        session.refresh(conversation)
-        return conversation
+    conversation = ChatConversation(
+        user_id=user_id,
+        title=conversation_in.title or "New Conversation"
+    )
+    session.add(conversation)
+    await session.commit()
+    await bump_user_version(user_id)
+    await session.refresh(conversation)
+    return conversation
 
 
-@router.get('/api/chat/conversations/{conversation_id}/messages', response_model=List[ChatMessageRead])
-def get_messages(
+@router.get(
+    '/api/chat/conversations/{conversation_id}/messages',
+    response_model=List[ChatMessageRead],
+    dependencies=[Depends(rate_limit('chat_read'))],
+)
+async def get_messages(
     conversation_id: int,
-    user_id: str = Depends(get_current_user)
+    before: Optional[str] = Query(None),
+    after: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_MESSAGE_PAGE_SIZE),
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_read_session),
 ):
-    """Get all messages in a conversation."""
-    with get_session() as session:
-        # Verify conversation belongs to user
-        conv = session.get(ChatConversation, conversation_id)
-        if not conv or conv.user_id != user_id:
-            raise HTTPException(status_code=404, detail="Conversation not found")
+    """Get messages in a conversation, oldest first.
+
+    Without `limit`, `before` or `after` the whole history is returned. With them,
+    a window of at most `limit` messages is returned: the latest ones by default,
+    those older than `before`, or those newer than `after`. The `X-Before-Cursor`
+    header is set when older messages exist, and `X-After-Cursor` holds the
+    position of the newest message returned (use it to poll for new messages).
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either 'before' or 'after', not both")
 
-        stmt = select(ChatMessage).where(
-            (ChatMessage.conversation_id == conversation_id) & (ChatMessage.user_id == user_id)
-        ).order_by(ChatMessage.created_at.asc())
-        messages = session.exec(stmt).all()
-        return messages
+    # Verify conversation belongs to user
+    conv = await session.get(ChatConversation, conversation_id)
+    if not conv or conv.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Conversation not found")
 
+    stmt = select(*MESSAGE_COLUMNS).where(
+        (ChatMessage.conversation_id == conversation_id) & (ChatMessage.user_id == user_id)
+    )
+    position = tuple_(ChatMessage.created_at, ChatMessage.id)
 
-@router.post('/api/chat/conversations/{conversation_id}/messages', response_model=ChatMessageRead, status_code=201)
-def send_message(
+    if not (before or after or limit):
+        stmt = stmt.order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc())
+        return FastJSONResponse(rows_to_dicts(MESSAGE_FIELDS, (await session.exec(stmt)).all()))
+
+    limit = limit or DEFAULT_MESSAGE_PAGE_SIZE
+    try:
+        cursor = decode_cursor(before or after, 'messages') if (before or after) else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor is not None and len(cursor) != 2:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if after:
+        stmt = stmt.where(position > tuple_(*cursor))
+        stmt = stmt.order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc()).limit(limit)
+        messages = (await session.exec(stmt)).all()
+        has_older = True
+    else:
+        if before:
+            stmt = stmt.where(position < tuple_(*cursor))
+        # newest first to take the window, then flip back to chronological order
+        stmt = stmt.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(limit + 1)
+        messages = (await session.exec(stmt)).all()
+        has_older = len(messages) > limit
+        messages = list(reversed(messages[:limit]))
+
+    headers = {}
+    if messages:
+        if has_older:
+            headers['X-Before-Cursor'] = encode_cursor('messages', [messages[0].created_at, messages[0].id])
+        headers['X-After-Cursor'] = encode_cursor('messages', [messages[-1].created_at, messages[-1].id])
+    elif after:
+        # nothing new yet: keep polling from the same position
+        headers['X-After-Cursor'] = after
+    return FastJSONResponse(rows_to_dicts(MESSAGE_FIELDS, messages), headers=headers)
+
+
+@router.post(
+    '/api/chat/conversations/{conversation_id}/messages',
+    response_model=ChatMessageRead,
+    status_code=201,
+    responses={202: {'model': ChatMessageAccepted}},
+    dependencies=[Depends(rate_limit('chat_send'))],
+)
+async def send_message(
     conversation_id: int,
     message_in: ChatMessageCreate,
-    user_id: str = Depends(get_current_user)
+    defer: bool = Query(False),
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    """Send a message and get a bot response."""
+    """Send a message and get a bot response.
+
+    The reply is generated before anything is written; both messages and the
+    conversation timestamp are then stored in a single flush and commit.
+
+    With `defer=true` only the user message is stored, together with a
+    `chat_reply` job; the response is 202 with the message and the job to poll
+    at `GET /api/jobs/{id}` (its result holds the bot message id).
+    """
     try:
-        with get_session() as session:
-            # Verify conversation belongs to user
-            conv = session.get(ChatConversation, conversation_id)
-            if not conv or conv.user_id != user_id:
-                raise HTTPException(status_code=404, detail="Conversation not found")
-
-            # Validate message content
-            if not message_in.content or not message_in.content.strip():
-                raise HTTPException(status_code=400, detail="Message cannot be empty")
-
-            # Save user message
-            user_msg = ChatMessage(
-                user_id=user_id,
-                conversation_id=conversation_id,
-                content=message_in.content.strip(),
-                sender="user"
-            )
-            session.add(user_msg)
-            session.commit()
-            session.refresh(user_msg)
-
-            # Generate bot response
-            bot_response_text = chatbot.get_response(message_in.content)
-            bot_msg = ChatMessage(
-                user_id=user_id,
-                conversation_id=conversation_id,
-                content=bot_response_text,
-                sender="bot"
-            )
-            session.add(bot_msg)
-            session.commit()
-            session.refresh(bot_msg)
-
-            # Update conversation timestamp
-            conv.updated_at = datetime.utcnow()
-            session.add(conv)
-            session.commit()
-
-            # Return the bot message (latest in conversation)
-            return bot_msg
+        # Validate message content
+        if not message_in.content or not message_in.content.strip():
+            raise HTTPException(status_code=400, detail="Message cannot be empty")
+
+        # Verify conversation belongs to user
+        conv = await session.get(ChatConversation, conversation_id)
+        if not conv or conv.user_id != user_id:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+
+        user_msg = ChatMessage(
+            user_id=user_id,
+            conversation_id=conversation_id,
+            content=message_in.content.strip(),
+            sender="user"
+        )
+
+        if defer:
+            record_messages(conv, [user_msg])
+            session.add_all([user_msg, conv])
+            await session.flush()
+            job = enqueue(session, 'chat_reply', {'conversation_id': conversation_id, 'message_id': user_msg.id}, user_id)
+            await session.commit()
+            job_worker.notify()
+            await bump_user_version(user_id)
+            accepted = ChatMessageAccepted(message=ChatMessageRead.from_orm(user_msg), job=JobRead.from_orm(job))
+            return FastJSONResponse(jsonable_encoder(accepted), status_code=202)
+
+        # Generate bot response off the event loop, as the stream and the job do
+        bot_msg = ChatMessage(
+            user_id=user_id,
+            conversation_id=conversation_id,
+            content=await run_in_threadpool(chatbot.get_response, message_in.content),
+            sender="bot"
+        )
+
+        # One transaction for the whole turn, conversation summary included; ids
+        # are assigned by the flush (via RETURNING where the driver supports it),
+        # so no refresh is needed.
+        record_messages(conv, [user_msg, bot_msg])
+        session.add_all([user_msg, bot_msg, conv])
+        await session.commit()
+        await bump_user_version(user_id)
+
+        # Return the bot message (latest in conversation)
+        return bot_msg
     except Exception as e:
         if isinstance(e, HTTPException):
             raise
         raise HTTPException(status_code=500, detail=f"Error processing message: {str(e)}")
 
 
-@router.delete('/api/chat/conversations/{conversation_id}', status_code=204)
-def delete_conversation(
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post(
+    '/api/chat/conversations/{conversation_id}/messages/stream',
+    status_code=201,
+    dependencies=[Depends(rate_limit('chat_send'))],
+)
+async def send_message_stream(
     conversation_id: int,
-    user_id: str = Depends(get_current_user)
+    message_in: ChatMessageCreate,
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    """Delete a chat conversation."""
-    with get_session() as session:
-        conv = session.get(ChatConversation, conversation_id)
-        if not conv or conv.user_id != user_id:
-            raise HTTPException(status_code=404, detail="Conversation not found")
+    """Send a message and stream the bot response as Server-Sent Events.
+
+    Events, in order: `user_message` with the stored user message, one `token` per
+    reply chunk as the chatbot produces it, then `done` with the stored bot message
+    (or `error` if generating or saving the reply failed).
+    """
+    conv = await session.get(ChatConversation, conversation_id)
+    if not conv or conv.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    if not message_in.content or not message_in.content.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+
+    user_msg = ChatMessage(
+        user_id=user_id,
+        conversation_id=conversation_id,
+        content=message_in.content.strip(),
+        sender="user"
+    )
+    record_messages(conv, [user_msg])
+    session.add_all([user_msg, conv])
+    # no refresh: it would open a new transaction and pin a connection while streaming
+    await session.commit()
+    await bump_user_version(user_id)
+    user_msg_data = ChatMessageRead.from_orm(user_msg).dict()
+
+    async def events():
+        yield _sse("user_message", user_msg_data)
+        try:
+            chunks = []
+            # run the (possibly blocking) generator off the event loop
+            async for chunk in iterate_in_threadpool(chatbot.stream_response(message_in.content)):
+                chunks.append(chunk)
+                yield _sse("token", {"text": chunk})
+
+            async with async_session_scope() as stream_session:
+                bot_msg = ChatMessage(
+                    user_id=user_id,
+                    conversation_id=conversation_id,
+                    content="".join(chunks),
+                    sender="bot"
+                )
+                stream_conv = await stream_session.get(ChatConversation, conversation_id)
+                record_messages(stream_conv, [bot_msg])
+                stream_session.add_all([bot_msg, stream_conv])
+                await stream_session.commit()
+                await bump_user_version(user_id)
+                await stream_session.refresh(bot_msg)
+                yield _sse("done", ChatMessageRead.from_orm(bot_msg).dict())
+        except Exception as e:
+            yield _sse("error", {"detail": f"Error processing message: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        status_code=201,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.delete(
+    '/api/chat/conversations/{conversation_id}',
+    status_code=204,
+    responses={202: {'model': JobRead}},
+)
+async def delete_conversation(
+    conversation_id: int,
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Delete a chat conversation and its messages.
+
+    Conversations with more than `CONVERSATION_DELETE_INLINE_LIMIT` messages are
+    handed to a `delete_conversation` job; the response is then 202 with the job.
+    """
+    conv = await session.get(ChatConversation, conversation_id)
+    if not conv or conv.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    count = (await session.exec(
+        select(func.count()).select_from(ChatMessage).where(ChatMessage.conversation_id == conversation_id)
+    )).one()
+    if count > CONVERSATION_DELETE_INLINE_LIMIT:
+        job = enqueue(session, 'delete_conversation', {'conversation_id': conversation_id}, user_id)
+        await session.commit()
+        job_worker.notify()
+        return FastJSONResponse(jsonable_encoder(JobRead.from_orm(job)), status_code=202)
 
-        session.delete(conv)
-        session.commit()
-        return None
+    # set-based: messages are never loaded into the session
+    await session.execute(delete(ChatMessage).where(ChatMessage.conversation_id == conversation_id))
+    await session.execute(delete(ChatConversation).where(ChatConversation.id == conversation_id))
+    await session.commit()
+    await bump_user_version(user_id)
+    return None
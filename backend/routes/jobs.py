@@ -0,0 +1,40 @@
+import asyncio
+import time
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..auth import get_current_user
+from ..db import get_async_session
+from ..jobs import FINISHED
+from ..models import Job, JobRead
+
+router = APIRouter()
+
+MAX_WAIT_SECONDS = 30
+# how often a waiting request re-reads the job row
+WAIT_POLL_INTERVAL = 0.2
+
+
+@router.get('/api/jobs/{job_id}', response_model=JobRead)
+async def get_job(
+    job_id: int,
+    wait: float = Query(0, ge=0, le=MAX_WAIT_SECONDS),
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Status of one of the user's background jobs.
+
+    With `wait=<seconds>` the request is held until the job has finished
+    (`succeeded` or `failed`) or the wait runs out, so a client can long-poll
+    instead of re-polling.
+    """
+    deadline = time.monotonic() + wait
+    while True:
+        job = await session.get(Job, job_id, populate_existing=True)
+        if not job or job.user_id != user_id:
+            raise HTTPException(status_code=404, detail='Job not found')
+        if job.status in FINISHED or time.monotonic() >= deadline:
+            return job
+        # end the read transaction so the next read sees the worker's commit
+        await session.rollback()
+        await asyncio.sleep(min(WAIT_POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
@@ -1,103 +1,492 @@
-import os
-from fastapi import APIRouter, Depends, HTTPException, Header, Query
-from typing import List, Optional
+from datetime import datetime, timedelta
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from typing import List, Optional, Tuple
+from sqlalchemy import and_, or_, tuple_, update, delete
 from sqlmodel import select
-import jwt
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ..db import get_session
-from ..models import Task, TaskCreate, TaskRead, TaskUpdate
+from ..auth import get_current_user
+from ..cache import cached_json_response, bump_user_version
+from ..deadlines import pending_due
+from ..db import get_async_session, get_read_session
+from .. import events
+from ..models import (
+    Task, TaskCreate, TaskRead, TaskUpdate, TaskChanges,
+    TaskBulkCreate, TaskBulkUpdate, TaskBulkDelete, TaskBulkResult, TaskBulkResponse, TaskStatsRead,
+)
+from ..pagination import encode_cursor, decode_cursor
+from ..ratelimit import rate_limit
+from ..search import search_statement
+from ..serialization import FastJSONResponse, dumps, read_columns, rows_to_dicts
+from ..stats import DUE_SOON_WINDOW, adjust_counters, aggregate_stats, counter_stats
+from ..sync import SyncTokenExpired, changes_since, decode_token, initial_position, record_tombstones
 
 router = APIRouter()
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
 
-def get_current_user(authorization: Optional[str] = Header(None)) -> str:
-    """Auth dependency.
+# list responses select these columns as plain rows and encode them directly
+TASK_FIELDS, TASK_COLUMNS = read_columns(TaskRead, Task)
+
+
+def _order_by(sort: str):
+    if sort == 'title':
+        return (Task.title.asc(), Task.id.asc())
+    if sort == 'due_date':
+        # earliest due date first, tasks without a due date last
+        return (Task.due_date.asc().nullslast(), Task.id.asc())
+    return (Task.created_at.desc(), Task.id.desc())
+
+
+def _cursor_values(sort: str, task: Task) -> list:
+    if sort == 'title':
+        return [task.title, task.id]
+    if sort == 'due_date':
+        return [task.due_date, task.id]
+    return [task.created_at, task.id]
 
-    If `JWT_SECRET` env var is set, decode and verify JWT (expect `sub` claim as user id).
-    Otherwise, for convenience in local dev, treat the token string as the user id.
-    """
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing Authorization header")
-    parts = authorization.split()
-    if len(parts) != 2 or parts[0].lower() != "bearer":
-        raise HTTPException(status_code=401, detail="Invalid Authorization header")
-    token = parts[1]
-
-    secret = os.environ.get('JWT_SECRET')
-    if secret:
-        try:
-            payload = jwt.decode(token, secret, algorithms=["HS256"])
-            user_id = payload.get('sub') or payload.get('user_id')
-            if not user_id:
-                raise HTTPException(status_code=401, detail="Invalid token payload")
-            return user_id
-        except jwt.PyJWTError:
-            raise HTTPException(status_code=401, detail="Invalid JWT token")
 
-    # Fallback: treat token as user_id (dev only)
-    return token
+def _task_event(kind: str, task) -> dict:
+    """`task.created` / `task.updated` feed event carrying the task as in `TaskRead`."""
+    return {'type': f'task.{kind}', 'task': {field: getattr(task, field) for field in TASK_FIELDS}}
 
 
-@router.get('/api/tasks', response_model=List[TaskRead])
-def list_tasks(
+def _after_cursor(sort: str, values: list):
+    """Keyset predicate selecting rows that sort strictly after the cursor row."""
+    key, last_id = values
+    if sort == 'title':
+        return tuple_(Task.title, Task.id) > tuple_(key, last_id)
+    if sort == 'due_date':
+        if key is None:
+            return and_(Task.due_date.is_(None), Task.id > last_id)
+        return or_(tuple_(Task.due_date, Task.id) > tuple_(key, last_id), Task.due_date.is_(None))
+    return tuple_(Task.created_at, Task.id) < tuple_(key, last_id)
+
+
+@router.get('/api/tasks', response_model=List[TaskRead], dependencies=[Depends(rate_limit('tasks_read'))])
+async def list_tasks(
+    request: Request,
     status: Optional[str] = Query('all', regex=r'^(all|pending|completed)$'),
     sort: Optional[str] = Query('created', regex=r'^(created|title|due_date)$'),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
     user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_read_session),
 ):
-    with get_session() as session:
-        stmt = select(Task).where(Task.user_id == user_id)
+    """List the user's tasks.
+
+    Without `limit` or `cursor` the full list is returned. When paginating, the
+    `X-Next-Cursor` response header carries the token for the following page and
+    is omitted on the last page. Responses carry an ETag; a matching
+    `If-None-Match` gets a 304 without querying the database.
+    """
+    async def build():
+        nonlocal limit
+        stmt = select(*TASK_COLUMNS).where(Task.user_id == user_id)
         if status == 'pending':
             stmt = stmt.where(Task.completed == False)
         elif status == 'completed':
             stmt = stmt.where(Task.completed == True)
 
-        if sort == 'title':
-            stmt = stmt.order_by(Task.title)
-        elif sort == 'due_date':
-            # sort earliest due date first
-            stmt = stmt.order_by(Task.due_date.asc())
+        if cursor:
+            try:
+                values = decode_cursor(cursor, sort)
+            except ValueError:
+                raise HTTPException(status_code=400, detail='Invalid cursor')
+            if len(values) != 2:
+                raise HTTPException(status_code=400, detail='Invalid cursor')
+            stmt = stmt.where(_after_cursor(sort, values))
+            if limit is None:
+                limit = DEFAULT_PAGE_SIZE
+
+        stmt = stmt.order_by(*_order_by(sort))
+
+        headers = {}
+        if limit is None:
+            results = (await session.exec(stmt)).all()
         else:
-            stmt = stmt.order_by(Task.created_at.desc())
+            # fetch one extra row to learn whether another page exists
+            results = (await session.exec(stmt.limit(limit + 1))).all()
+            if len(results) > limit:
+                results = results[:limit]
+                headers['X-Next-Cursor'] = encode_cursor(sort, _cursor_values(sort, results[-1]))
+        return dumps(rows_to_dicts(TASK_FIELDS, results)), headers
+
+    return await cached_json_response(request, user_id, build)
+
+
+@router.get('/api/tasks/search', response_model=List[TaskRead], dependencies=[Depends(rate_limit('tasks_read'))])
+async def search_tasks(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """Full-text search over the user's task titles and descriptions, best match first.
+
+    Every word of `q` must match (the last one as a prefix). Pages are chained
+    through the `X-Next-Cursor` header as in `list_tasks`.
+    """
+    async def build():
+        offset = 0
+        if cursor:
+            try:
+                (offset,) = decode_cursor(cursor, 'search')
+            except ValueError:
+                raise HTTPException(status_code=400, detail='Invalid cursor')
+            if not isinstance(offset, int) or offset < 0:
+                raise HTTPException(status_code=400, detail='Invalid cursor')
+
+        headers = {}
+        stmt = search_statement(session.bind.dialect.name, user_id, q, limit + 1, offset, columns=TASK_COLUMNS)
+        results = (await session.exec(stmt)).all() if stmt is not None else []
+        if len(results) > limit:
+            results = results[:limit]
+            headers['X-Next-Cursor'] = encode_cursor('search', [offset + limit])
+        return dumps(rows_to_dicts(TASK_FIELDS, results)), headers
+
+    return await cached_json_response(request, user_id, build)
+
+
+@router.get('/api/tasks/stats', response_model=TaskStatsRead, dependencies=[Depends(rate_limit('tasks_read'))])
+async def get_task_stats(
+    source: str = Query('counters', regex=r'^(counters|aggregate)$'),
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Dashboard counts: total, completed, pending, overdue and due in the next 7 days.
+
+    `source=counters` (default) reads the maintained per-user counters;
+    `source=aggregate` recomputes everything with one grouped query.
+    """
+    now = datetime.utcnow()
+    if source == 'aggregate':
+        return await aggregate_stats(session, user_id, now)
+    return await counter_stats(session, user_id, now)
+
+
+@router.get('/api/tasks/changes', response_model=TaskChanges, dependencies=[Depends(rate_limit('tasks_read'))])
+async def task_changes(
+    since: Optional[str] = Query(None),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Tasks created or updated and ids of tasks deleted since the `since` token.
+
+    Without `since` every task is returned (an initial sync). Store `next` and
+    pass it as `since` on the following call; while `has_more` is true, call
+    again right away. A token older than the tombstone retention gets 410: sync
+    again from scratch.
+    """
+    now = datetime.utcnow()
+    if since is None:
+        position = initial_position(now)
+    else:
+        try:
+            position = decode_token(since)
+        except ValueError:
+            raise HTTPException(status_code=400, detail='Invalid sync token')
+    try:
+        page = await changes_since(session, user_id, position, limit, now)
+    except SyncTokenExpired:
+        raise HTTPException(status_code=410, detail='Sync token expired; sync again without `since`')
+    return FastJSONResponse(page._asdict())
+
 
-        results = session.exec(stmt).all()
-        return results
+async def _deadline_page(session: AsyncSession, user_id: str, kind: str, start: Optional[datetime],
+                         end: datetime, limit: int, cursor: Optional[str]) -> FastJSONResponse:
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, kind)
+        except ValueError:
+            raise HTTPException(status_code=400, detail='Invalid cursor')
+        if len(after) != 2:
+            raise HTTPException(status_code=400, detail='Invalid cursor')
+    # one extra row tells whether another page exists
+    rows = (await session.exec(pending_due(user_id, start, end, after).limit(limit + 1))).all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers['X-Next-Cursor'] = encode_cursor(kind, [rows[-1].due_date, rows[-1].id])
+    return FastJSONResponse(rows_to_dicts(TASK_FIELDS, rows), headers=headers)
+
+
+@router.get('/api/tasks/due', response_model=List[TaskRead], dependencies=[Depends(rate_limit('tasks_read'))])
+async def due_tasks(
+    within: int = Query(int(DUE_SOON_WINDOW.total_seconds()), ge=1, le=366 * 24 * 3600),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """Pending tasks due from now to `within` seconds from now (default 7 days), soonest first.
+
+    Paginated like `GET /api/tasks`: `X-Next-Cursor` carries the next page's token.
+    """
+    now = datetime.utcnow()
+    return await _deadline_page(session, user_id, 'due', now, now + timedelta(seconds=within), limit, cursor)
+
+
+@router.get('/api/tasks/overdue', response_model=List[TaskRead], dependencies=[Depends(rate_limit('tasks_read'))])
+async def overdue_tasks(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """Pending tasks whose due date has passed, longest overdue first (paginated with `X-Next-Cursor`)."""
+    return await _deadline_page(session, user_id, 'overdue', None, datetime.utcnow(), limit, cursor)
 
 
-@router.post('/api/tasks', response_model=TaskRead, status_code=201)
-def create_task(task_in: TaskCreate, user_id: str = Depends(get_current_user)):
+@router.post('/api/tasks', response_model=TaskRead, status_code=201, dependencies=[Depends(rate_limit('tasks_write'))])
+async def create_task(
+    task_in: TaskCreate,
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
     # Build Task explicitly to ensure fields and defaults are set
     task = Task(**task_in.dict())
     task.user_id = user_id
-    with get_session() as session:
-        session.add(task)
-        session.commit()
-        session.refresh(task)
-        return task
-
-
-@router.put('/api/tasks/{task_id}', response_model=TaskRead)
-def update_task(task_id: int, task_in: TaskUpdate, user_id: str = Depends(get_current_user)):
-    with get_session() as session:
-        task = session.get(Task, task_id)
-        if not task or task.user_id != user_id:
-            raise HTTPException(status_code=404, detail='Task not found')
-
-        task_data = task_in.dict(exclude_unset=True)
-        for key, value in task_data.items():
-            setattr(task, key, value)
-
-        session.add(task)
-        session.commit()
-        session.refresh(task)
-        return task
-
-
-@router.delete('/api/tasks/{task_id}', status_code=204)
-def delete_task(task_id: int, user_id: str = Depends(get_current_user)):
-    with get_session() as session:
-        task = session.get(Task, task_id)
-        if not task or task.user_id != user_id:
-            raise HTTPException(status_code=404, detail='Task not found')
-        session.delete(task)
-        session.commit()
-        return None
+    session.add(task)
+    await adjust_counters(session, user_id, total=1)
+    await session.commit()
+    await bump_user_version(user_id)
+    await session.refresh(task)
+    await events.publish_task_event(user_id, _task_event('created', task))
+    return task
+
+
+def _check_unique_ids(ids: List[int]) -> None:
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail='Duplicate task ids in request')
+
+
+async def _owned_tasks(session: AsyncSession, user_id: str, ids: List[int]) -> dict:
+    """Load the user's tasks among `ids` with a single query, keyed by id."""
+    stmt = select(Task).where(Task.user_id == user_id, Task.id.in_(ids))
+    return {task.id: task for task in (await session.exec(stmt)).all()}
+
+
+@router.post('/api/tasks/bulk', response_model=TaskBulkResponse, dependencies=[Depends(rate_limit('tasks_write'))])
+async def bulk_create_tasks(
+    bulk_in: TaskBulkCreate,
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Create several tasks in one transaction."""
+    tasks = [Task(**item.dict(), user_id=user_id) for item in bulk_in.items]
+    session.add_all(tasks)
+    # a single flush lets SQLAlchemy batch the INSERTs
+    await session.flush()
+    await adjust_counters(session, user_id, total=len(tasks))
+    await session.commit()
+    await bump_user_version(user_id)
+    for task in tasks:
+        await events.publish_task_event(user_id, _task_event('created', task))
+    return TaskBulkResponse(results=[
+        TaskBulkResult(id=task.id, status=201, task=TaskRead.from_orm(task)) for task in tasks
+    ])
+
+
+# Counter deltas come from the rows a statement changed, never from a read
+# taken earlier: concurrent writes to the same task would each count their change.
+async def _set_completed(session: AsyncSession, user_id: str, ids, completed: bool, now: datetime) -> int:
+    """Set `completed` on those of `ids` not already in that state; returns how many changed."""
+    result = await session.execute(
+        update(Task)
+        .where(Task.user_id == user_id, Task.id.in_(ids), Task.completed != completed)
+        .values(completed=completed, updated_at=now)
+        .execution_options(synchronize_session='evaluate')
+    )
+    return result.rowcount
+
+
+async def _delete_tasks(session: AsyncSession, user_id: str, ids) -> Tuple[int, int]:
+    """Delete the user's tasks among `ids`; returns (completed, pending) rows deleted."""
+    counts = []
+    for completed in (True, False):
+        result = await session.execute(
+            delete(Task)
+            .where(Task.user_id == user_id, Task.id.in_(ids), Task.completed == completed)
+            .execution_options(synchronize_session='evaluate')
+        )
+        counts.append(result.rowcount)
+    return counts[0], counts[1]
+
+
+@router.patch('/api/tasks/bulk', response_model=TaskBulkResponse, dependencies=[Depends(rate_limit('tasks_write'))])
+async def bulk_update_tasks(
+    bulk_in: TaskBulkUpdate,
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Apply several task updates in one transaction.
+
+    Items carrying the same changes (e.g. "complete all") are applied with one
+    `UPDATE ... WHERE id IN (...)` statement. Tasks the user does not own are
+    reported as 404 and left untouched.
+    """
+    ids = [item.id for item in bulk_in.items]
+    _check_unique_ids(ids)
+    owned = await _owned_tasks(session, user_id, ids)
+
+    groups = {}
+    toggles = {True: [], False: []}
+    for item in bulk_in.items:
+        if item.id not in owned:
+            continue
+        changes = item.dict(exclude_unset=True, exclude={'id'})
+        if changes:
+            groups.setdefault(tuple(sorted(changes.items())), []).append(item.id)
+        if changes.get('completed') is not None:
+            toggles[changes['completed']].append(item.id)
+
+    now = datetime.utcnow()
+    completed_delta = 0
+    for completed, toggle_ids in toggles.items():
+        if toggle_ids:
+            changed = await _set_completed(session, user_id, toggle_ids, completed, now)
+            completed_delta += changed if completed else -changed
+    for changes, group_ids in groups.items():
+        stmt = (
+            update(Task)
+            .where(Task.user_id == user_id, Task.id.in_(group_ids))
+            .values(**dict(changes), updated_at=now)
+            .execution_options(synchronize_session='evaluate')
+        )
+        await session.execute(stmt)
+    await adjust_counters(session, user_id, completed=completed_delta)
+    await session.commit()
+    await bump_user_version(user_id)
+    for group_ids in groups.values():
+        for task_id in group_ids:
+            await events.publish_task_event(user_id, _task_event('updated', owned[task_id]))
+
+    results = []
+    for item in bulk_in.items:
+        task = owned.get(item.id)
+        if task is None:
+            results.append(TaskBulkResult(id=item.id, status=404, error='Task not found'))
+        else:
+            results.append(TaskBulkResult(id=item.id, status=200, task=TaskRead.from_orm(task)))
+    return TaskBulkResponse(results=results)
+
+
+@router.delete('/api/tasks/bulk', response_model=TaskBulkResponse, dependencies=[Depends(rate_limit('tasks_write'))])
+async def bulk_delete_tasks(
+    bulk_in: TaskBulkDelete,
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Delete several tasks with one `DELETE ... WHERE id IN (...)` statement."""
+    _check_unique_ids(bulk_in.ids)
+    owned_ids = set((await session.exec(
+        select(Task.id).where(Task.user_id == user_id, Task.id.in_(bulk_in.ids))
+    )).all())
+    if owned_ids:
+        completed, pending = await _delete_tasks(session, user_id, owned_ids)
+        await adjust_counters(session, user_id, total=-(completed + pending), completed=-completed)
+        await record_tombstones(session, user_id, owned_ids)
+    await session.commit()
+    await bump_user_version(user_id)
+    for task_id in owned_ids:
+        await events.publish_task_event(user_id, {'type': 'task.deleted', 'id': task_id})
+    return TaskBulkResponse(results=[
+        TaskBulkResult(id=task_id, status=204) if task_id in owned_ids
+        else TaskBulkResult(id=task_id, status=404, error='Task not found')
+        for task_id in bulk_in.ids
+    ])
+
+
+@router.put('/api/tasks/{task_id}', response_model=TaskRead, dependencies=[Depends(rate_limit('tasks_write'))])
+async def update_task(
+    task_id: int,
+    task_in: TaskUpdate,
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    task = await session.get(Task, task_id)
+    if not task or task.user_id != user_id:
+        raise HTTPException(status_code=404, detail='Task not found')
+
+    task_data = task_in.dict(exclude_unset=True)
+    completed = task_data.pop('completed', None)
+    if completed is not None:
+        changed = await _set_completed(session, user_id, [task_id], completed, datetime.utcnow())
+        await adjust_counters(session, user_id, completed=changed if completed else -changed)
+    for key, value in task_data.items():
+        setattr(task, key, value)
+    session.add(task)
+    await session.commit()
+    await bump_user_version(user_id)
+    await session.refresh(task)
+    await events.publish_task_event(user_id, _task_event('updated', task))
+    return task
+
+
+@router.delete('/api/tasks/{task_id}', status_code=204, dependencies=[Depends(rate_limit('tasks_write'))])
+async def delete_task(
+    task_id: int,
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    task = await session.get(Task, task_id)
+    if not task or task.user_id != user_id:
+        raise HTTPException(status_code=404, detail='Task not found')
+    completed, pending = await _delete_tasks(session, user_id, [task_id])
+    if not completed + pending:
+        # deleted by a concurrent request since it was read
+        raise HTTPException(status_code=404, detail='Task not found')
+    await adjust_counters(session, user_id, total=-1, completed=-completed)
+    await record_tombstones(session, user_id, [task_id])
+    await session.commit()
+    await bump_user_version(user_id)
+    await events.publish_task_event(user_id, {'type': 'task.deleted', 'id': task_id})
+    return None
+
+
+@router.websocket('/ws/tasks')
+async def task_feed(websocket: WebSocket):
+    """Push the user's task changes as JSON text frames.
+
+    Authenticates with the same `Authorization: Bearer <token>` header as the
+    REST routes; browsers, which cannot set headers on a WebSocket, may pass
+    `?token=<token>` instead. Frames are `task.created` / `task.updated` (with
+    the task), `task.deleted` (with its id) and `resync`, sent when this client
+    fell too far behind and should refetch `GET /api/tasks`.
+    """
+    token = websocket.query_params.get('token')
+    authorization = websocket.headers.get('authorization') or (f'Bearer {token}' if token else None)
+    try:
+        user_id = get_current_user(authorization)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+
+    # subscribe before accepting so no event between the two is missed
+    async with events.task_events.subscribe(user_id) as subscription:
+        await websocket.accept()
+
+        async def forward():
+            while True:
+                await websocket.send_text((await subscription.get()).decode())
+
+        async def until_disconnect():
+            while (await websocket.receive())['type'] != 'websocket.disconnect':
+                pass
+
+        tasks = [asyncio.create_task(forward()), asyncio.create_task(until_disconnect())]
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+        for task in done:
+            if not task.cancelled() and task.exception() and not isinstance(task.exception(), WebSocketDisconnect):
+                raise task.exception()
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..auth import get_current_user
+from ..db import get_async_session
+from ..models import ImportRead, ImportRun
+from ..ratelimit import rate_limit
+from ..serialization import FastJSONResponse
+from ..transfer import EXPORTS, FAILED, RUNNING, SUCCEEDED, export_csv, export_ndjson, import_ndjson
+
+router = APIRouter()
+
+# a `running` import not updated for this long was cut off (e.g. by a restart) and may be resumed
+IMPORT_STALE_AFTER = timedelta(minutes=5)
+
+
+@router.get('/api/export', dependencies=[Depends(rate_limit('transfer'))])
+async def export_data(
+    format: str = Query('ndjson', regex='^(ndjson|csv)$'),
+    kind: str = Query('all', regex='^(all|tasks|conversations|messages)$'),
+    user_id: str = Depends(get_current_user),
+):
+    """Stream the user's tasks, conversations and messages.
+
+    NDJSON holds every kind (or just `kind`), one record per line with a `type`
+    field; CSV holds one `kind` with a header row.
+    """
+    if format == 'csv':
+        if kind == 'all':
+            raise HTTPException(status_code=400, detail='CSV export needs a single kind')
+        body, media_type = export_csv(user_id, kind), 'text/csv'
+    else:
+        kinds = list(EXPORTS) if kind == 'all' else [kind]
+        body, media_type = export_ndjson(user_id, kinds), 'application/x-ndjson'
+    filename = f"{kind}-{datetime.utcnow():%Y%m%d}.{format}"
+    return StreamingResponse(
+        body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.post('/api/import', response_model=ImportRead, dependencies=[Depends(rate_limit('transfer'))])
+async def import_data(
+    request: Request,
+    import_id: Optional[int] = Query(None, description="resume this failed import with the same file"),
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Import an NDJSON export (as produced by `GET /api/export`).
+
+    The body is read and applied incrementally in batched transactions. The
+    response is the import's final state: 200 when it succeeded, 422 when it
+    stopped at an invalid line or an error, with `lines` counting the input
+    lines applied. Progress can be followed meanwhile with
+    `GET /api/import/{id}`.
+    """
+    if import_id is None:
+        run = ImportRun(user_id=user_id)
+        session.add(run)
+    else:
+        stale = datetime.utcnow() - IMPORT_STALE_AFTER
+        # the conditional UPDATE keeps two uploads from resuming the same import
+        claimed = await session.execute(
+            update(ImportRun)
+            .where(ImportRun.id == import_id, ImportRun.user_id == user_id, or_(
+                ImportRun.status == FAILED, and_(ImportRun.status == RUNNING, ImportRun.updated_at < stale),
+            ))
+            .values(status=RUNNING, error=None, updated_at=datetime.utcnow())
+        )
+        run = await session.get(ImportRun, import_id, populate_existing=True)
+        if not run or run.user_id != user_id:
+            raise HTTPException(status_code=404, detail='Import not found')
+        if claimed.rowcount != 1:
+            detail = 'Import already succeeded' if run.status == SUCCEEDED else 'Import is in progress'
+            raise HTTPException(status_code=409, detail=detail)
+    await session.commit()
+
+    run = await import_ndjson(run, request.stream())
+    status_code = 200 if run.status == SUCCEEDED else 422
+    return FastJSONResponse(jsonable_encoder(ImportRead.from_orm(run)), status_code=status_code)
+
+
+@router.get('/api/import/{import_id}', response_model=ImportRead)
+async def get_import(
+    import_id: int,
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Progress of an import: lines applied and rows created so far."""
+    run = await session.get(ImportRun, import_id)
+    if not run or run.user_id != user_id:
+        raise HTTPException(status_code=404, detail='Import not found')
+    return run
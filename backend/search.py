@@ -0,0 +1,116 @@
+"""Full-text search over task titles and descriptions.
+
+SQLite uses an FTS5 external-content table (`tasks_fts`) kept in sync with
+`tasks` by triggers; Postgres uses a GIN index on a weighted `tsvector`
+expression. Migration 0005 creates both for Alembic deployments; the
+`after_create` hook below does the same when tables come from `create_all`.
+Other backends fall back to a `LIKE` scan.
+"""
+import re
+from typing import List
+
+from sqlalchemy import column, event, func, literal_column, or_, table
+from sqlmodel import select
+
+from .models import Task
+
+SEARCH_CONFIG = "english"
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+    "title, description, content='tasks', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN "
+    "INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE OF title, description ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+]
+
+POSTGRES_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_tasks_search ON tasks USING GIN ("
+    f"(setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')))",
+]
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# lightweight handle on the FTS5 table for building queries
+tasks_fts = table("tasks_fts", column("rowid"), column("tasks_fts"))
+
+
+@event.listens_for(Task.__table__, "after_create")
+def _create_search_index(target, connection, **kw):
+    ddl = {"sqlite": SQLITE_DDL, "postgresql": POSTGRES_DDL}.get(connection.dialect.name, [])
+    for statement in ddl:
+        connection.exec_driver_sql(statement)
+
+
+def _search_vector():
+    # Must render exactly like the indexed expression in POSTGRES_DDL (literals,
+    # not bound parameters) for the planner to use the GIN index.
+    config = literal_column(f"'{SEARCH_CONFIG}'")
+    empty = literal_column("''")
+    return func.setweight(
+        func.to_tsvector(config, func.coalesce(Task.title, empty)), literal_column("'A'")
+    ).op('||')(
+        func.setweight(func.to_tsvector(config, func.coalesce(Task.description, empty)), literal_column("'B'"))
+    )
+
+
+def fts5_query(q: str) -> str:
+    """Turn free text into a safe FTS5 query: all words must match, the last as a prefix."""
+    words = _WORD_RE.findall(q)
+    if not words:
+        return ""
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_statement(dialect: str, user_id: str, q: str, limit: int, offset: int, columns=None):
+    """SELECT of the user's tasks matching `q`, best match first; None if `q` has no words.
+
+    Selects whole `Task` objects unless `columns` narrows it to those columns.
+    """
+    entities = columns or (Task,)
+    if dialect == "sqlite":
+        match = fts5_query(q)
+        if not match:
+            return None
+        # bm25 scores are negative, lower is better; weight title matches 10x
+        rank = func.bm25(literal_column("tasks_fts"), 10.0, 1.0)
+        stmt = (
+            select(*entities)
+            .join(tasks_fts, tasks_fts.c.rowid == Task.id)
+            .where(tasks_fts.c.tasks_fts.op("MATCH")(match), Task.user_id == user_id)
+            .order_by(rank, Task.id)
+        )
+    elif dialect == "postgresql":
+        if not _WORD_RE.search(q):
+            return None
+        query = func.websearch_to_tsquery(literal_column(f"'{SEARCH_CONFIG}'"), q)
+        vector = _search_vector()
+        stmt = (
+            select(*entities)
+            .where(Task.user_id == user_id, vector.op('@@')(query))
+            .order_by(func.ts_rank(vector, query).desc(), Task.id)
+        )
+    else:
+        stmt = like_statement(user_id, q, columns)
+        if stmt is None:
+            return None
+    return stmt.limit(limit).offset(offset)
+
+
+def like_statement(user_id: str, q: str, columns=None):
+    """Unindexed substring scan; the fallback and the benchmark baseline."""
+    words: List[str] = _WORD_RE.findall(q)
+    if not words:
+        return None
+    stmt = select(*(columns or (Task,))).where(Task.user_id == user_id)
+    for word in words:
+        pattern = f"%{word}%"
+        stmt = stmt.where(or_(Task.title.ilike(pattern), Task.description.ilike(pattern)))
+    return stmt.order_by(Task.created_at.desc(), Task.id.desc())
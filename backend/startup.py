@@ -0,0 +1,148 @@
+"""Worker startup: schema handling, lazily included routers and timings.
+
+`SCHEMA_ON_STARTUP` sets what a starting worker does about the schema:
+- `create` (default): `create_all`, which reflects every table and creates the
+  missing ones; convenient in development
+- `check`: one query verifying the database is at the Alembic revision this
+  code expects (`db.SCHEMA_REVISION`), failing the start otherwise; for
+  deployments that run `alembic upgrade head` before the app
+- `skip`: nothing
+
+Only the task routes are included at import. The other routers are imported
+and included on the first request under one of their path prefixes (or when
+the OpenAPI schema is built), so a cold worker does not pay for chat, admin or
+transfer code before it can serve tasks. `LAZY_ROUTERS=false` includes them
+all at import.
+
+The services the task routes use are still imported with them: `events`
+(writes publish to the task feed), `metrics` (its middleware has to be added
+before the app starts) and `deadlines` (the due/overdue lists), all cheap next
+to the models and FastAPI. The job worker and its handlers (`jobs`, with
+`deletion` and `conversations`) are imported by the startup hook, inside its
+`jobs` phase, or by the first router that enqueues a job.
+
+`startup_timer` records each phase from importing `backend.main` to the first
+request; it is logged when the worker is ready and served at
+`GET /api/admin/startup`. Nothing heavier than the standard library is
+imported here, so the import phase is measured from the top of `backend.main`.
+"""
+import importlib
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+SCHEMA_ON_STARTUP = os.environ.get("SCHEMA_ON_STARTUP", "create")
+LAZY_ROUTERS = os.environ.get("LAZY_ROUTERS", "true").lower() in ("1", "true", "yes")
+
+if SCHEMA_ON_STARTUP not in ("create", "check", "skip"):
+    raise ValueError(f"SCHEMA_ON_STARTUP must be create, check or skip, not '{SCHEMA_ON_STARTUP}'")
+
+logger = logging.getLogger(__name__)
+
+
+def process_age() -> Optional[float]:
+    """Seconds since this process started (Linux only, 10ms resolution)."""
+    try:
+        with open("/proc/self/stat") as f:
+            # the command name may contain spaces; fields after it are space separated
+            start_ticks = int(f.read().rpartition(")")[2].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+class StartupTimer:
+    """Phase durations of a worker's start, measured from its creation."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.ready_at: Optional[float] = None
+        self.process_ready: Optional[float] = None
+        self.first_request_at: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def mark(self, name: str) -> None:
+        """Record `name` as lasting from the start until now (e.g. `import`)."""
+        self.phases[name] = time.perf_counter() - self.started
+
+    def ready(self) -> None:
+        self.ready_at = time.perf_counter() - self.started
+        self.process_ready = process_age()
+        logger.info("worker ready in %.1f ms (%s)", self.ready_at * 1000,
+                    ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.phases.items()))
+
+    def request(self) -> None:
+        if self.first_request_at is None:
+            self.first_request_at = time.perf_counter() - self.started
+
+    def report(self) -> dict:
+        return {
+            "schema_on_startup": SCHEMA_ON_STARTUP,
+            "phases_ms": {name: _ms(seconds) for name, seconds in self.phases.items()},
+            "ready_ms": _ms(self.ready_at),
+            "process_ready_ms": _ms(self.process_ready),
+            "first_request_ms": _ms(self.first_request_at),
+        }
+
+
+startup_timer = StartupTimer()
+
+
+class LazyRouters:
+    """Routers included into `app` when a request first needs them."""
+
+    def __init__(self, app, routers: Dict[str, Tuple[str, ...]]):
+        self.app = app
+        # module -> path prefixes served by its `router`
+        self.pending = dict(routers)
+        self.loaded: List[str] = []
+
+    def include(self, module: str) -> None:
+        if module not in self.pending:
+            return
+        with startup_timer.phase(f"router {module}"):
+            self.app.include_router(importlib.import_module(module).router)
+        del self.pending[module]
+        self.loaded.append(module)
+        # rebuilt with the new routes on the next request for it
+        self.app.openapi_schema = None
+
+    def include_for(self, path: str) -> None:
+        for module, prefixes in list(self.pending.items()):
+            if path.startswith(prefixes):
+                self.include(module)
+
+    def include_all(self) -> None:
+        for module in list(self.pending):
+            self.include(module)
+
+
+class StartupMiddleware:
+    """Pure ASGI middleware including lazy routers before routing and timing the first request."""
+
+    def __init__(self, app, routers: LazyRouters):
+        self.app = app
+        self.routers = routers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket"):
+            startup_timer.request()
+            if self.routers.pending:
+                self.routers.include_for(scope["path"])
+        await self.app(scope, receive, send)
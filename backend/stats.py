@@ -0,0 +1,102 @@
+"""Task dashboard statistics.
+
+`task_stats` holds per-user `total` / `completed` counters that the task
+handlers adjust in the same transaction as each write, so those counts are a
+primary-key lookup. The time-dependent counts (overdue, due this week) cannot
+be maintained incrementally; they come from a range count over pending tasks
+on the (user_id, completed, due_date, id) index. `aggregate_stats` computes
+everything in one grouped query straight from `tasks` instead.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, event, func, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .models import Task, TaskStats, TaskStatsRead
+
+DUE_SOON_WINDOW = timedelta(days=7)
+
+# Fills task_stats from tasks; used when the table is created on an existing database.
+BACKFILL_SQL = (
+    "INSERT INTO task_stats (user_id, total, completed) "
+    "SELECT user_id, count(*), sum(CASE WHEN completed THEN 1 ELSE 0 END) FROM tasks GROUP BY user_id"
+)
+
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+@event.listens_for(TaskStats.__table__, "after_create")
+def _backfill_counters(target, connection, **kw):
+    # on a fresh database `tasks` may not exist yet, and there is nothing to count
+    if inspect(connection).has_table("tasks"):
+        connection.exec_driver_sql(BACKFILL_SQL)
+
+
+async def adjust_counters(session: AsyncSession, user_id: str, total: int = 0, completed: int = 0) -> None:
+    """Add `total` / `completed` deltas to the user's counters (within the caller's transaction)."""
+    if not total and not completed:
+        return
+    dialect_insert = _UPSERT_DIALECTS.get(session.bind.dialect.name)
+    if dialect_insert is not None:
+        stmt = dialect_insert(TaskStats).values(user_id=user_id, total=total, completed=completed)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TaskStats.user_id],
+            set_={"total": TaskStats.total + stmt.excluded.total, "completed": TaskStats.completed + stmt.excluded.completed},
+        )
+        await session.execute(stmt)
+        return
+
+    row = await session.get(TaskStats, user_id, with_for_update=True)
+    if row is None:
+        session.add(TaskStats(user_id=user_id, total=total, completed=completed))
+    else:
+        row.total += total
+        row.completed += completed
+        session.add(row)
+
+
+def _due_counts(now: datetime):
+    pending = Task.completed == False  # noqa: E712
+    overdue = func.sum(case((pending & (Task.due_date < now), 1), else_=0))
+    due_this_week = func.sum(case(
+        (pending & (Task.due_date >= now) & (Task.due_date < now + DUE_SOON_WINDOW), 1), else_=0
+    ))
+    return overdue, due_this_week
+
+
+async def aggregate_stats(session: AsyncSession, user_id: str, now: datetime) -> TaskStatsRead:
+    """All counts in one grouped aggregate over the user's tasks."""
+    overdue, due_this_week = _due_counts(now)
+    stmt = (
+        select(
+            func.count(Task.id),
+            func.sum(case((Task.completed == True, 1), else_=0)),  # noqa: E712
+            overdue,
+            due_this_week,
+        )
+        .where(Task.user_id == user_id)
+        .group_by(Task.user_id)
+    )
+    row = (await session.exec(stmt)).first()
+    total, completed, overdue_n, week_n = (int(v or 0) for v in (row or (0, 0, 0, 0)))
+    return TaskStatsRead(
+        total=total, completed=completed, pending=total - completed, overdue=overdue_n, due_this_week=week_n,
+    )
+
+
+async def counter_stats(session: AsyncSession, user_id: str, now: datetime) -> TaskStatsRead:
+    """Totals from task_stats, due counts from an index range over pending tasks."""
+    counters = await session.get(TaskStats, user_id)
+    total, completed = (counters.total, counters.completed) if counters else (0, 0)
+    overdue, due_this_week = _due_counts(now)
+    stmt = select(overdue, due_this_week).where(
+        Task.user_id == user_id,
+        Task.completed == False,  # noqa: E712
+        Task.due_date < now + DUE_SOON_WINDOW,
+    )
+    overdue_n, week_n = (int(v or 0) for v in (await session.exec(stmt)).one())
+    return TaskStatsRead(
+        total=total, completed=completed, pending=total - completed, overdue=overdue_n, due_this_week=week_n,
+    )
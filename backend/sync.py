@@ -0,0 +1,134 @@
+"""Delta sync of a user's tasks (`GET /api/tasks/changes`).
+
+A sync token records how far a client has read two streams: its tasks in
+`(updated_at, id)` order (every write bumps `updated_at`) and the tombstones
+left by deleted tasks in `(deleted_at, id)` order. A page reads at most
+`limit + 1` rows from each stream through the `(user_id, updated_at, id)` and
+`(user_id, deleted_at, id)` indexes, so its cost follows the number of
+changes, not the number of tasks.
+
+Timestamps are taken before commit, so a slow transaction can commit a change
+stamped earlier than one a client has already seen. The token of a last page
+therefore never points later than `SYNC_SETTLE_SECONDS` before the read: the
+most recent changes are sent again by the next sync, and clients apply changes
+idempotently (upsert or delete by id).
+
+Tombstones older than `TOMBSTONE_RETENTION_DAYS` are pruned by the `prune`
+job; a token whose tombstone position is older than that is rejected and the
+client starts over. A last page moves that position up to the settle horizon,
+so only a client that has not synced for the whole window is affected.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Iterable, List, NamedTuple, Tuple
+
+from sqlalchemy import insert, tuple_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .models import Task, TaskRead, TaskTombstone
+from .pagination import decode_cursor, encode_cursor
+from .serialization import read_columns, rows_to_dicts
+
+SYNC_SETTLE_SECONDS = float(os.environ.get("SYNC_SETTLE_SECONDS", "5"))
+TOMBSTONE_RETENTION_DAYS = int(os.environ.get("TOMBSTONE_RETENTION_DAYS", "30"))
+
+EPOCH = datetime(1970, 1, 1)
+
+TASK_FIELDS, TASK_COLUMNS = read_columns(TaskRead, Task)
+
+# (task updated_at, task id, tombstone deleted_at, tombstone id) read so far
+Position = Tuple[datetime, int, datetime, int]
+
+
+class SyncTokenExpired(Exception):
+    """The token predates the tombstone retention window; deletions may have been missed."""
+
+
+class ChangesPage(NamedTuple):
+    tasks: List[dict]
+    deleted: List[int]
+    next: str
+    has_more: bool
+
+
+def initial_position(now: datetime) -> Position:
+    # every task, and the deletions from here on (earlier ones concern tasks the client never saw)
+    return EPOCH, 0, now - timedelta(seconds=SYNC_SETTLE_SECONDS), 0
+
+
+def encode_token(position: Position) -> str:
+    return encode_cursor("changes", list(position))
+
+
+def decode_token(token: str) -> Position:
+    """Raises ValueError for a malformed token."""
+    values = decode_cursor(token, "changes")
+    if (len(values) != 4 or not all(isinstance(v, datetime) for v in values[::2])
+            or not all(isinstance(v, int) for v in values[1::2])):
+        raise ValueError("Malformed sync token")
+    return tuple(values)
+
+
+async def record_tombstones(session: AsyncSession, user_id: str, task_ids: Iterable[int]) -> None:
+    """Record deleted tasks in the caller's transaction."""
+    now = datetime.utcnow()
+    rows = [{"user_id": user_id, "task_id": task_id, "deleted_at": now} for task_id in task_ids]
+    if rows:
+        await session.execute(insert(TaskTombstone), rows)
+
+
+async def changes_since(session: AsyncSession, user_id: str, position: Position, limit: int,
+                        now: datetime) -> ChangesPage:
+    """Tasks written and ids deleted after `position`, oldest first, at most `limit` of them."""
+    task_at, task_id, tomb_at, tomb_id = position
+    if tomb_at < now - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+        raise SyncTokenExpired()
+
+    tasks = (await session.exec(
+        select(*TASK_COLUMNS)
+        .where(Task.user_id == user_id, tuple_(Task.updated_at, Task.id) > tuple_(task_at, task_id))
+        .order_by(Task.updated_at, Task.id)
+        .limit(limit + 1)
+    )).all()
+    tombstones = (await session.exec(
+        select(TaskTombstone.deleted_at, TaskTombstone.id, TaskTombstone.task_id)
+        .where(TaskTombstone.user_id == user_id,
+               tuple_(TaskTombstone.deleted_at, TaskTombstone.id) > tuple_(tomb_at, tomb_id))
+        .order_by(TaskTombstone.deleted_at, TaskTombstone.id)
+        .limit(limit + 1)
+    )).all()
+
+    updated_at, id_ = TASK_FIELDS.index("updated_at"), TASK_FIELDS.index("id")
+    merged = sorted(
+        [(row[updated_at], 0, row[id_], row) for row in tasks]
+        + [(row.deleted_at, 1, row.id, row) for row in tombstones],
+        key=lambda change: change[:3],
+    )
+    has_more = len(merged) > limit
+    merged = merged[:limit]
+
+    # the latest change per task wins, e.g. a deletion after an update
+    latest = {}
+    for at, is_tombstone, row_id, row in merged:
+        if is_tombstone:
+            tomb_at, tomb_id = at, row_id
+            latest[row.task_id] = None
+        else:
+            task_at, task_id = at, row_id
+            latest[row_id] = row
+
+    if not has_more:
+        horizon = now - timedelta(seconds=SYNC_SETTLE_SECONDS)
+        if task_at > horizon:
+            task_at, task_id = horizon, 0
+        # every tombstone up to the horizon has been read: a client that sees no
+        # deletions keeps its token inside the retention window
+        tomb_at, tomb_id = horizon, 0
+
+    return ChangesPage(
+        tasks=rows_to_dicts(TASK_FIELDS, (row for row in latest.values() if row is not None)),
+        deleted=[task for task, row in latest.items() if row is None],
+        next=encode_token((task_at, task_id, tomb_at, tomb_id)),
+        has_more=has_more,
+    )
@@ -0,0 +1,13 @@
+import os
+import tempfile
+
+# Point the app at a throwaway SQLite database before `backend.db` is imported,
+# so test runs never write to the checked-in dev.db. Set TEST_DATABASE_URL to
+# run the suite against another database (e.g. a local Postgres).
+_tmpdir = tempfile.mkdtemp(prefix="task-api-tests-")
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL") or f"sqlite:///{os.path.join(_tmpdir, 'test.db')}"
+
+from backend import models  # noqa: E402,F401 - registers tables on SQLModel.metadata
+from backend.db import create_db_and_tables  # noqa: E402
+
+create_db_and_tables()
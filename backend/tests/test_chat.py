@@ -0,0 +1,374 @@
+import json
+import random
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.chatbot_service import ChatbotService, OFF_TOPIC_RESPONSE
+from backend.db import async_engine
+from sqlalchemy import event
+
+client = TestClient(app)
+
+AUTH = {"Authorization": "Bearer chatuser"}
+
+
+def test_conversation_flow():
+    resp = client.post('/api/chat/conversations', json={"title": "Help"}, headers=AUTH)
+    assert resp.status_code == 201
+    conv_id = resp.json()['id']
+
+    resp = client.post(f'/api/chat/conversations/{conv_id}/messages', json={"content": "How do I create a task?"}, headers=AUTH)
+    assert resp.status_code == 201
+    assert resp.json()['sender'] == 'bot'
+
+    resp = client.get(f'/api/chat/conversations/{conv_id}/messages', headers=AUTH)
+    assert resp.status_code == 200
+    assert [m['sender'] for m in resp.json()] == ['user', 'bot']
+
+    resp = client.get('/api/chat/conversations', headers=AUTH)
+    assert any(c['id'] == conv_id for c in resp.json())
+
+
+def test_chat_turn_is_one_transaction():
+    conv_id = client.post('/api/chat/conversations', json={}, headers=AUTH).json()['id']
+    commits = []
+
+    def listener(conn):
+        commits.append(conn)
+
+    event.listen(async_engine.sync_engine, "commit", listener)
+    try:
+        resp = client.post(f'/api/chat/conversations/{conv_id}/messages', json={"content": "help"}, headers=AUTH)
+    finally:
+        event.remove(async_engine.sync_engine, "commit", listener)
+    assert resp.status_code == 201
+    assert len(commits) == 1
+
+
+def test_conversation_belongs_to_user():
+    conv_id = client.post('/api/chat/conversations', json={}, headers=AUTH).json()['id']
+    other = {"Authorization": "Bearer someoneelse"}
+    resp = client.get(f'/api/chat/conversations/{conv_id}/messages', headers=other)
+    assert resp.status_code == 404
+    resp = client.delete(f'/api/chat/conversations/{conv_id}', headers=other)
+    assert resp.status_code == 404
+    resp = client.delete(f'/api/chat/conversations/{conv_id}', headers=AUTH)
+    assert resp.status_code == 204
+
+
+def test_chatbot_intents():
+    bot = ChatbotService(rng=random.Random(0))
+    assert bot.get_response("what's the weather?") == OFF_TOPIC_RESPONSE
+    # "hello" alone is not task-related, but wins priority once a task keyword is present
+    assert bot.get_response("hello") == OFF_TOPIC_RESPONSE
+    assert bot.get_response("Hello, how do I delete?") in bot.responses["hello"]
+    assert bot.get_response("I want to DELETE a task") in bot.responses["task"]
+    assert bot.get_response("when is it due") in bot.responses["task"]
+
+    messages = ["help me", "sort please", "create one", "", "edit"]
+    first = ChatbotService(rng=random.Random(7)).get_responses(messages)
+    assert first == ChatbotService(rng=random.Random(7)).get_responses(messages)
+
+
+def _parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_streaming_reply():
+    conv_id = client.post('/api/chat/conversations', json={}, headers=AUTH).json()['id']
+    resp = client.post(f'/api/chat/conversations/{conv_id}/messages/stream', json={"content": "how do I sort?"}, headers=AUTH)
+    assert resp.status_code == 201
+    assert resp.headers['content-type'].startswith('text/event-stream')
+
+    events = _parse_sse(resp.text)
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == 'user_message' and kinds[-1] == 'done'
+    assert set(kinds[1:-1]) == {'token'}
+
+    reply = events[-1][1]
+    assert reply['sender'] == 'bot'
+    assert "".join(data['text'] for kind, data in events if kind == 'token') == reply['content']
+
+    messages = client.get(f'/api/chat/conversations/{conv_id}/messages', headers=AUTH).json()
+    assert [m['id'] for m in messages] == [events[0][1]['id'], reply['id']]
+
+
+def test_message_history_pagination():
+    conv_id = client.post('/api/chat/conversations', json={}, headers=AUTH).json()['id']
+    for i in range(4):
+        client.post(f'/api/chat/conversations/{conv_id}/messages', json={"content": f"help {i}"}, headers=AUTH)
+    url = f'/api/chat/conversations/{conv_id}/messages'
+    full = [m['id'] for m in client.get(url, headers=AUTH).json()]
+    assert len(full) == 8
+
+    # latest window, then scroll back
+    resp = client.get(url, params={"limit": 3}, headers=AUTH)
+    assert [m['id'] for m in resp.json()] == full[-3:]
+    seen = [m['id'] for m in resp.json()]
+    cursor = resp.headers['X-Before-Cursor']
+    while cursor:
+        resp = client.get(url, params={"limit": 3, "before": cursor}, headers=AUTH)
+        seen = [m['id'] for m in resp.json()] + seen
+        cursor = resp.headers.get('X-Before-Cursor')
+    assert seen == full
+
+    # poll for newer messages from the oldest page
+    resp = client.get(url, params={"limit": 2}, headers=AUTH)
+    after = resp.headers['X-After-Cursor']
+    resp = client.get(url, params={"after": after}, headers=AUTH)
+    assert resp.json() == []
+    assert resp.headers['X-After-Cursor'] == after
+    client.post(url, json={"content": "help again"}, headers=AUTH)
+    resp = client.get(url, params={"after": after}, headers=AUTH)
+    assert [m['sender'] for m in resp.json()] == ['user', 'bot']
+
+
+def _run_jobs():
+    import asyncio
+    from backend.jobs import job_worker
+
+    async def run():
+        try:
+            return await job_worker.run_pending()
+        finally:
+            # pooled aiosqlite connections (and their threads) belong to this loop
+            await async_engine.dispose()
+    return asyncio.run(run())
+
+
+def test_deferred_reply_job():
+    conv_id = client.post('/api/chat/conversations', json={}, headers=AUTH).json()['id']
+    resp = client.post(f'/api/chat/conversations/{conv_id}/messages', params={"defer": "true"},
+                       json={"content": "How do I delete a task?"}, headers=AUTH)
+    assert resp.status_code == 202
+    body = resp.json()
+    assert body['message']['sender'] == 'user' and body['job']['status'] == 'queued'
+    job_id = body['job']['id']
+    assert client.get(f'/api/jobs/{job_id}', headers={"Authorization": "Bearer someoneelse"}).status_code == 404
+
+    assert _run_jobs() >= 1
+    job = client.get(f'/api/jobs/{job_id}', params={"wait": 1}, headers=AUTH).json()
+    assert job['status'] == 'succeeded' and job['attempts'] == 1
+    messages = client.get(f'/api/chat/conversations/{conv_id}/messages', headers=AUTH).json()
+    assert [m['sender'] for m in messages] == ['user', 'bot']
+    assert messages[1]['id'] == job['result']['message_id']
+
+
+def test_jobs_survive_restart_and_retry():
+    import asyncio
+    from datetime import datetime, timedelta
+    from backend import jobs
+    from backend.db import async_session_scope
+    from backend.models import Job
+
+    async def scenario():
+        async with async_session_scope() as session:
+            # one job orphaned by a worker that died mid-run, one that always fails
+            orphan = jobs.enqueue(session, "prune", {"jobs_retention_days": 0}, "chatuser")
+            orphan.status, orphan.started_at = jobs.RUNNING, datetime.utcnow() - timedelta(seconds=jobs.JOBS_LEASE_SECONDS + 1)
+            broken = jobs.enqueue(session, "chat_reply", {}, "chatuser")
+            # one whose every attempt took its worker down
+            crasher = jobs.enqueue(session, "prune", {}, "chatuser")
+            crasher.status, crasher.attempts = jobs.RUNNING, jobs.JOBS_MAX_ATTEMPTS
+            crasher.started_at = orphan.started_at
+            await session.commit()
+            ids = orphan.id, broken.id, crasher.id
+
+        # a fresh worker, as after a restart
+        await jobs.JobWorker().run_pending()
+        async with async_session_scope() as session:
+            return [await session.get(Job, job_id) for job_id in ids]
+
+    orphan, broken, crasher = asyncio.run(scenario())
+    assert orphan.status == "succeeded"
+    assert broken.status == "failed" and broken.attempts == jobs.JOBS_MAX_ATTEMPTS and broken.error
+    assert crasher.status == "failed" and crasher.attempts == jobs.JOBS_MAX_ATTEMPTS and crasher.finished_at
+
+
+def test_running_job_renews_its_lease(monkeypatch):
+    import asyncio
+    from backend import jobs
+    from backend.db import async_session_scope
+    from backend.models import Job
+
+    runs = []
+
+    async def slow(session, job):
+        runs.append(job.id)
+        await asyncio.sleep(1)
+        return {}
+
+    monkeypatch.setitem(jobs.HANDLERS, "slow", slow)
+    monkeypatch.setattr(jobs, "JOBS_LEASE_SECONDS", 0.3)
+
+    async def scenario():
+        try:
+            async with async_session_scope() as session:
+                job = jobs.enqueue(session, "slow", {})
+                await session.commit()
+            first, second = jobs.JobWorker(), jobs.JobWorker()
+            running = asyncio.create_task(first.run_one())
+            # a second worker polling for longer than the lease finds nothing to claim
+            claims = []
+            for _ in range(8):
+                await asyncio.sleep(0.1)
+                claims.append(await second._claim())
+            await running
+            async with async_session_scope() as session:
+                return claims, await session.get(Job, job.id)
+        finally:
+            await async_engine.dispose()
+
+    claims, job = asyncio.run(scenario())
+    assert claims == [None] * 8 and runs == [job.id]
+    assert job.status == "succeeded" and job.attempts == 1
+
+
+def test_prune_schedule_survives_errors_and_skips_duplicates(monkeypatch):
+    import asyncio
+    from backend import jobs
+    from backend.db import async_session_scope
+    from backend.models import Job
+    from sqlmodel import select
+
+    monkeypatch.setattr(jobs, "JOBS_PRUNE_INTERVAL", 0.05)
+    failures = []
+    real_scope = jobs.async_session_scope
+
+    def flaky_scope():
+        if not failures:
+            failures.append(1)
+            raise RuntimeError("database unavailable")
+        return real_scope()
+
+    async def scenario():
+        try:
+            await jobs.JobWorker().run_pending()
+            monkeypatch.setattr(jobs, "async_session_scope", flaky_scope)
+            # two processes' schedulers, the first tick of one failing
+            schedulers = [asyncio.create_task(jobs.JobWorker()._schedule_prune()) for _ in range(2)]
+            await asyncio.sleep(0.3)
+            for task in schedulers:
+                task.cancel()
+            await asyncio.gather(*schedulers, return_exceptions=True)
+            async with async_session_scope() as session:
+                return schedulers, (await session.exec(
+                    select(Job.id).where(Job.kind == "prune", Job.status == jobs.QUEUED)
+                )).all()
+        finally:
+            await async_engine.dispose()
+
+    schedulers, queued = asyncio.run(scenario())
+    assert failures and all(task.cancelled() for task in schedulers)
+    assert len(queued) == 1
+    _run_jobs()
+
+
+def test_large_conversation_delete_and_prune_jobs(monkeypatch):
+    from backend.routes import chat
+    conv_id = client.post('/api/chat/conversations', json={}, headers=AUTH).json()['id']
+    for _ in range(2):
+        client.post(f'/api/chat/conversations/{conv_id}/messages', json={"content": "help"}, headers=AUTH)
+
+    monkeypatch.setattr(chat, "CONVERSATION_DELETE_INLINE_LIMIT", 3)
+    resp = client.delete(f'/api/chat/conversations/{conv_id}', headers=AUTH)
+    assert resp.status_code == 202
+    _run_jobs()
+    job = client.get(f"/api/jobs/{resp.json()['id']}", headers=AUTH).json()
+    assert job['status'] == 'succeeded' and job['result'] == {"deleted_messages": 4}
+    assert client.get(f'/api/chat/conversations/{conv_id}/messages', headers=AUTH).status_code == 404
+
+    # small conversations are still deleted inline, messages included
+    conv_id = client.post('/api/chat/conversations', json={}, headers=AUTH).json()['id']
+    client.post(f'/api/chat/conversations/{conv_id}/messages', json={"content": "help"}, headers=AUTH)
+    assert client.delete(f'/api/chat/conversations/{conv_id}', headers=AUTH).status_code == 204
+
+    resp = client.post('/api/admin/jobs/prune', params={"chat_retention_days": 1})
+    assert resp.status_code == 202
+    _run_jobs()
+    assert client.get(f"/api/jobs/{resp.json()['id']}", headers=AUTH).status_code == 404  # system job
+
+
+def test_account_deletion_in_batches(monkeypatch):
+    from backend import deletion
+    from backend.models import ChatMessage
+
+    fk = next(iter(ChatMessage.__table__.c.conversation_id.foreign_keys))
+    assert fk.ondelete == "CASCADE"
+
+    monkeypatch.setattr(deletion, "DELETE_BATCH_SIZE", 2)
+    doomed = {"Authorization": "Bearer doomed"}
+    client.post('/api/tasks/bulk', json={"items": [{"title": f"t{i}"} for i in range(5)]}, headers=doomed)
+    conv_id = client.post('/api/chat/conversations', json={}, headers=doomed).json()['id']
+    for _ in range(3):
+        client.post(f'/api/chat/conversations/{conv_id}/messages', json={"content": "help"}, headers=doomed)
+    client.post('/api/tasks', json={"title": "survivor"}, headers=AUTH)
+    client.delete(f"/api/tasks/{client.post('/api/tasks', json={'title': 'gone'}, headers=doomed).json()['id']}", headers=doomed)
+    client.post('/api/import', content=b'{"type": "task", "title": "imported"}', headers=doomed)
+
+    resp = client.delete('/api/account', headers=doomed)
+    assert resp.status_code == 202
+    # queued behind the deletion: it would act on data that is gone
+    client.post(f'/api/chat/conversations/{conv_id}/messages', params={"defer": "true"}, json={"content": "help"}, headers=doomed)
+    _run_jobs()
+    job = client.get(f"/api/jobs/{resp.json()['id']}", headers=doomed).json()
+    assert job['status'] == 'succeeded'
+    assert job['result']['deleted'] == {"messages": 7, "conversations": 1, "tasks": 6}
+
+    # nothing of the user is left in any table but the deletion job itself
+    from sqlmodel import SQLModel
+    from backend.db import engine
+    with engine.connect() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            column = table.c.get('user_id', table.c.id if table.name == 'users' else None)
+            if column is None:
+                continue
+            ids = [row.id if 'id' in row._fields else row.user_id for row in conn.execute(table.select().where(column == 'doomed'))]
+            assert ids == ([job['id']] if table.name == 'jobs' else []), table.name
+
+    assert client.get('/api/tasks', headers=doomed).json() == []
+    assert client.get('/api/chat/conversations', headers=doomed).json() == []
+    assert client.get('/api/tasks/stats', headers=doomed).json()['total'] == 0
+    assert any(t['title'] == 'survivor' for t in client.get('/api/tasks', headers=AUTH).json())
+
+
+def test_conversation_list_previews():
+    from datetime import datetime, timedelta
+    from backend.db import engine
+    from backend.models import ChatMessage
+    from sqlalchemy import update
+
+    headers = {"Authorization": "Bearer previewer"}
+    ids = [client.post('/api/chat/conversations', json={"title": f"c{i}"}, headers=headers).json()['id'] for i in range(3)]
+    client.post(f'/api/chat/conversations/{ids[0]}/messages', json={"content": "How do I create a task?"}, headers=headers)
+    client.post(f'/api/chat/conversations/{ids[1]}/messages/stream', json={"content": "how do I sort?"}, headers=headers)
+    client.post(f'/api/chat/conversations/{ids[2]}/messages', params={"defer": "true"},
+                json={"content": "x" * 300}, headers=headers)
+
+    listed = {c['id']: c for c in client.get('/api/chat/conversations', headers=headers).json()}
+    assert [listed[i]['message_count'] for i in ids] == [2, 2, 1]
+    assert listed[ids[2]]['last_message_snippet'] == "x" * 200
+    messages = client.get(f'/api/chat/conversations/{ids[1]}/messages', headers=headers).json()
+    assert listed[ids[1]]['last_message_snippet'] == messages[-1]['content'][:200]
+    assert listed[ids[1]]['last_message_at'] == messages[-1]['created_at']
+    _run_jobs()
+    latest = client.get('/api/chat/conversations', params={"limit": 1}, headers=headers)
+    # the deferred reply made it the most recently active
+    assert [(c['id'], c['message_count']) for c in latest.json()] == [(ids[2], 2)]
+
+    page = client.get('/api/chat/conversations', params={"cursor": latest.headers['X-Next-Cursor']}, headers=headers)
+    assert [c['id'] for c in page.json()] == [ids[1], ids[0]] and 'X-Next-Cursor' not in page.headers
+    assert client.get('/api/chat/conversations', params={"cursor": "garbage"}, headers=headers).status_code == 400
+
+    # retention recounts the conversations it removed messages from, without reordering them
+    with engine.begin() as conn:
+        conn.execute(update(ChatMessage).where(ChatMessage.conversation_id == ids[0])
+                     .values(created_at=datetime.utcnow() - timedelta(days=2)))
+    client.post('/api/admin/jobs/prune', params={"chat_retention_days": 1})
+    _run_jobs()
+    listed = client.get('/api/chat/conversations', headers=headers).json()
+    assert [c['id'] for c in listed] == [ids[2], ids[1], ids[0]]
+    assert (listed[2]['message_count'], listed[2]['last_message_at'], listed[2]['last_message_snippet']) == (0, None, None)
@@ -1,7 +1,9 @@
 import json
 from fastapi.testclient import TestClient
 from backend.main import app
-import os
+from backend import auth, cache
+from backend.db import async_engine
+from sqlalchemy import event
 import jwt
 
 client = TestClient(app)
@@ -55,8 +57,8 @@ def test_auth_required():
 
 
 def test_jwt_auth():
-    # set a JWT_SECRET and sign a token
-    os.environ['JWT_SECRET'] = 'testsecret'
+    # configure a JWT secret and sign a token
+    auth.configure('testsecret')
     token = jwt.encode({'sub': 'jwtuser'}, 'testsecret', algorithm='HS256')
 
     headers = {"Authorization": f"Bearer {token}"}
@@ -64,5 +66,785 @@ def test_jwt_auth():
     assert resp.status_code == 201
     data = resp.json()
     assert data['user_id'] == 'jwtuser'
+
+    # the second request is served from the verified-token cache
+    hits = auth.token_cache.hits
+    resp = client.get('/api/tasks', headers=headers)
+    assert resp.status_code == 200
+    assert auth.token_cache.hits == hits + 1
+
+    resp = client.get('/api/tasks', headers={"Authorization": "Bearer not-a-jwt"})
+    assert resp.status_code == 401
     # cleanup
-    del os.environ['JWT_SECRET']
+    auth.configure(None)
+
+
+def test_token_cache_expiry_and_bound():
+    cache = auth.TokenCache(maxsize=2, ttl=60)
+    cache.put('a', 'user-a')
+    cache.put('b', 'user-b', exp=0)  # already expired
+    assert cache.get('a') == 'user-a'
+    assert cache.get('b') is None
+    cache.put('c', 'user-c')
+    cache.put('d', 'user-d')
+    assert cache.get('a') is None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_cursor_pagination():
+    headers = {"Authorization": "Bearer pageuser"}
+    for i in range(5):
+        client.post('/api/tasks', json={"title": f"Page {i}"}, headers=headers)
+
+    for sort in ('created', 'title', 'due_date'):
+        seen = []
+        cursor = None
+        while True:
+            params = {"sort": sort, "limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            resp = client.get('/api/tasks', params=params, headers=headers)
+            assert resp.status_code == 200
+            page = resp.json()
+            assert len(page) <= 2
+            seen.extend(t['id'] for t in page)
+            cursor = resp.headers.get('X-Next-Cursor')
+            if not cursor:
+                break
+        full = client.get('/api/tasks', params={"sort": sort}, headers=headers).json()
+        assert seen == [t['id'] for t in full]
+        assert len(seen) == 5
+
+
+def test_invalid_cursor():
+    resp = client.get('/api/tasks', params={"cursor": "not-a-cursor"}, headers=AUTH)
+    assert resp.status_code == 400
+
+
+def test_pool_stats():
+    client.get('/api/tasks', headers=AUTH)
+    resp = client.get('/api/admin/pool')
+    assert resp.status_code == 200
+    stats = resp.json()['async']
+    assert stats['checkouts'] >= 1
+    assert stats['checked_out'] == 0
+
+
+def test_bulk_operations():
+    headers = {"Authorization": "Bearer bulkuser"}
+    resp = client.post('/api/tasks/bulk', json={"items": [{"title": f"Bulk {i}"} for i in range(3)]}, headers=headers)
+    assert resp.status_code == 200
+    results = resp.json()['results']
+    assert [r['status'] for r in results] == [201, 201, 201]
+    ids = [r['id'] for r in results]
+
+    other_id = client.post('/api/tasks', json={"title": "Not yours"}, headers=AUTH).json()['id']
+    items = [{"id": i, "completed": True} for i in ids] + [{"id": other_id, "completed": True}]
+    resp = client.patch('/api/tasks/bulk', json={"items": items}, headers=headers)
+    assert resp.status_code == 200
+    results = resp.json()['results']
+    assert [r['status'] for r in results] == [200, 200, 200, 404]
+    assert all(r['task']['completed'] for r in results[:3])
+
+    resp = client.get('/api/tasks?status=completed', headers=headers)
+    assert sorted(t['id'] for t in resp.json()) == sorted(ids)
+
+    resp = client.request('DELETE', '/api/tasks/bulk', json={"ids": ids + [other_id]}, headers=headers)
+    assert [r['status'] for r in resp.json()['results']] == [204, 204, 204, 404]
+    assert client.get('/api/tasks', headers=headers).json() == []
+
+
+class FakeRedis:
+    """In-memory stand-in for the redis.asyncio client calls used by RedisCache."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value if isinstance(value, bytes) else str(value).encode()
+        return True
+
+    async def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, b"0")) + 1).encode()
+        return int(self.data[key])
+
+    async def eval(self, script, numkeys, key, rate, burst, now):
+        # the rate limiter's bucket script, evaluated in Python
+        from backend.ratelimit import take_token
+        tokens, updated = self.data.get(key, (burst, now))
+        allowed, tokens = take_token(tokens, updated, now, rate, burst)
+        self.data[key] = (tokens, now)
+        return [int(allowed), str(tokens)]
+
+
+def _check_conditional_get(headers):
+    resp = client.get('/api/tasks', headers=headers)
+    assert resp.status_code == 200
+    etag = resp.headers['ETag']
+
+    statements = []
+
+    def listener(*args):
+        statements.append(args)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        resp = client.get('/api/tasks', headers={**headers, "If-None-Match": etag})
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", listener)
+    assert resp.status_code == 304
+    assert statements == []
+
+    client.post('/api/tasks', json={"title": "Changes the list"}, headers=headers)
+    resp = client.get('/api/tasks', headers={**headers, "If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers['ETag'] != etag
+    assert any(t['title'] == 'Changes the list' for t in resp.json())
+
+
+def test_conditional_get_memory_cache():
+    _check_conditional_get({"Authorization": "Bearer etaguser"})
+
+
+def test_conditional_get_redis_cache():
+    original = cache.response_cache
+    cache.configure_cache(cache.RedisCache(FakeRedis()))
+    try:
+        _check_conditional_get({"Authorization": "Bearer etaguser-redis"})
+    finally:
+        cache.configure_cache(original)
+
+
+def test_search_tasks():
+    headers = {"Authorization": "Bearer searchuser"}
+    client.post('/api/tasks', json={"title": "Buy groceries", "description": "milk and eggs"}, headers=headers)
+    client.post('/api/tasks', json={"title": "Call plumber", "description": "kitchen sink groceries leak"}, headers=headers)
+    client.post('/api/tasks', json={"title": "Groceries list"}, headers={"Authorization": "Bearer someoneelse"})
+
+    resp = client.get('/api/tasks/search', params={"q": "groceries"}, headers=headers)
+    assert resp.status_code == 200
+    # title matches rank above description matches; other users' tasks are excluded
+    assert [t['title'] for t in resp.json()] == ['Buy groceries', 'Call plumber']
+
+    assert [t['title'] for t in client.get('/api/tasks/search', params={"q": "plumb"}, headers=headers).json()] == ['Call plumber']
+    assert client.get('/api/tasks/search', params={"q": "?!"}, headers=headers).json() == []
+
+    # the index follows updates and deletes
+    task_id = client.get('/api/tasks/search', params={"q": "milk"}, headers=headers).json()[0]['id']
+    client.put(f'/api/tasks/{task_id}', json={"description": "bread"}, headers=headers)
+    assert client.get('/api/tasks/search', params={"q": "milk"}, headers=headers).json() == []
+    client.delete(f'/api/tasks/{task_id}', headers=headers)
+    assert client.get('/api/tasks/search', params={"q": "bread"}, headers=headers).json() == []
+
+    resp = client.get('/api/tasks/search', params={"q": "groceries", "limit": 1}, headers=headers)
+    assert len(resp.json()) == 1 and 'X-Next-Cursor' not in resp.headers
+
+
+def test_task_stats():
+    from datetime import datetime, timedelta
+    headers = {"Authorization": "Bearer statsuser"}
+    now = datetime.utcnow()
+    overdue = client.post('/api/tasks', json={"title": "Late", "due_date": (now - timedelta(days=1)).isoformat()}, headers=headers).json()
+    client.post('/api/tasks', json={"title": "Soon", "due_date": (now + timedelta(days=2)).isoformat()}, headers=headers)
+    client.post('/api/tasks', json={"title": "Later", "due_date": (now + timedelta(days=30)).isoformat()}, headers=headers)
+    ids = [r['id'] for r in client.post('/api/tasks/bulk', json={"items": [{"title": "a"}, {"title": "b"}]}, headers=headers).json()['results']]
+    client.patch('/api/tasks/bulk', json={"items": [{"id": i, "completed": True} for i in ids]}, headers=headers)
+    client.put(f"/api/tasks/{ids[0]}", json={"completed": False}, headers=headers)
+    client.request('DELETE', '/api/tasks/bulk', json={"ids": [ids[1]]}, headers=headers)
+    client.put(f"/api/tasks/{overdue['id']}", json={"completed": True}, headers=headers)
+
+    expected = {"total": 4, "completed": 1, "pending": 3, "overdue": 0, "due_this_week": 1}
+    assert client.get('/api/tasks/stats', headers=headers).json() == expected
+    assert client.get('/api/tasks/stats', params={"source": "aggregate"}, headers=headers).json() == expected
+
+    client.delete(f"/api/tasks/{overdue['id']}", headers=headers)
+    assert client.get('/api/tasks/stats', headers=headers).json()['completed'] == 0
+    empty = client.get('/api/tasks/stats', headers={"Authorization": "Bearer nobody"}).json()
+    assert empty == {"total": 0, "completed": 0, "pending": 0, "overdue": 0, "due_this_week": 0}
+
+
+def test_list_matches_read_model_encoding():
+    from datetime import datetime
+    from fastapi.encoders import jsonable_encoder
+    from backend.models import Task, TaskRead
+    from backend.serialization import dumps, read_columns, rows_to_dicts
+
+    headers = {"Authorization": "Bearer fastjson"}
+    client.post('/api/tasks', json={"title": "No due date"}, headers=headers)
+    client.post('/api/tasks', json={"title": "Due", "description": "d", "due_date": "2030-01-02T03:04:05.123456"}, headers=headers)
+    body = client.get('/api/tasks', headers=headers).json()
+    assert [t["title"] for t in body] == ["Due", "No due date"]
+    assert body[0]["due_date"] == "2030-01-02T03:04:05.123456" and body[1]["due_date"] is None
+    assert set(body[0]) == set(TaskRead.__fields__)
+
+    # the row path encodes exactly like the pydantic path
+    fields, _ = read_columns(TaskRead, Task)
+    task = Task(id=1, title="t", user_id="u", completed=False, created_at=datetime(2030, 1, 1), updated_at=datetime(2030, 1, 1, 0, 0, 0, 5))
+    expected = jsonable_encoder(TaskRead.from_orm(task))
+    assert json.loads(dumps(rows_to_dicts(fields, [[getattr(task, f) for f in fields]]))) == [expected]
+
+
+def test_metrics_endpoint(monkeypatch, tmp_path):
+    import asyncio
+    from fastapi import FastAPI
+    from backend import metrics
+    from backend.routes.tasks import router as tasks_router
+
+    metrics_app = FastAPI()
+    metrics_app.include_router(tasks_router)
+    metrics.install(metrics_app)
+    metrics_client = TestClient(metrics_app)
+
+    headers = {"Authorization": "Bearer metricsuser"}
+    before = metrics.REQUEST_SECONDS.count("GET", "/api/tasks", "200")
+    metrics_client.post('/api/tasks', json={"title": "Measured"}, headers=headers)
+    metrics_client.get('/api/tasks', headers=headers)
+    metrics_client.get('/no/such/path')
+    assert metrics.REQUEST_SECONDS.count("GET", "/api/tasks", "200") == before + 1
+    assert metrics.REQUEST_SECONDS.count("GET", "<unmatched>", "404") >= 1
+
+    body = metrics_client.get('/metrics').text
+    assert 'http_request_duration_seconds_count{method="POST",route="/api/tasks",status="201"}' in body
+    assert 'http_request_db_queries_bucket{method="POST",route="/api/tasks",le="+Inf"}' in body
+    assert 'db_query_duration_seconds_count{statement="INSERT"}' in body
+    assert 'app_phase_duration_seconds_count{phase="serialize"}' in body
+    assert 'db_pool_checked_out{engine="async"}' in body
+    # a list request runs at least the select; the db time is attributed to the route
+    assert 'http_request_db_seconds_count{method="GET",route="/api/tasks"} ' in body
+
+    # scraping needs the admin token once one is set, like /api/admin/*
+    monkeypatch.setenv('ADMIN_TOKEN', 'scraper-secret')
+    assert metrics_client.get('/metrics').status_code == 403
+    assert metrics_client.get('/metrics', headers={"Authorization": "Bearer scraper-secret"}).status_code == 200
+    monkeypatch.delenv('ADMIN_TOKEN')
+    monkeypatch.setenv('ENV', 'production')
+    assert metrics_client.get('/metrics').status_code == 404
+    monkeypatch.delenv('ENV')
+
+    # replicas configured after install are timed and their pools reported too
+    from backend import db
+    previous = db.replicas
+    db.configure_replicas(db.ReplicaSet([f"sqlite:///{tmp_path / 'replica.db'}"]))
+    try:
+        replica = db.replicas.engines[0].sync_engine
+        assert event.contains(replica, "before_cursor_execute", metrics._before_cursor_execute)
+        assert 'db_pool_checked_out{engine="replica0"}' in metrics_client.get('/metrics').text
+    finally:
+        asyncio.run(db.replicas.dispose())
+        db.configure_replicas(previous)
+
+
+def _task_writes(headers):
+    task = client.post('/api/tasks', json={"title": "Live"}, headers=headers).json()
+    client.put(f"/api/tasks/{task['id']}", json={"completed": True}, headers=headers)
+    client.delete(f"/api/tasks/{task['id']}", headers=headers)
+    return task
+
+
+def test_task_feed_websocket():
+    from contextlib import ExitStack
+    import pytest
+    from starlette.websockets import WebSocketDisconnect
+
+    headers = {"Authorization": "Bearer feeduser"}
+    with ExitStack() as stack:
+        sockets = [stack.enter_context(client.websocket_connect('/ws/tasks', headers=headers)) for _ in range(3)]
+        task = _task_writes(headers)
+        client.post('/api/tasks', json={"title": "Someone else's"}, headers={"Authorization": "Bearer other"})
+        for ws in sockets:
+            received = [ws.receive_json() for _ in range(3)]
+            assert [e["type"] for e in received] == ["task.created", "task.updated", "task.deleted"]
+            assert received[0]["task"]["title"] == "Live" and received[1]["task"]["completed"] is True
+            assert received[2]["id"] == task["id"]
+
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect('/ws/tasks') as ws:
+            ws.receive_text()
+    with client.websocket_connect('/ws/tasks?token=feedquery') as ws:
+        client.post('/api/tasks', json={"title": "Via query token"}, headers={"Authorization": "Bearer feedquery"})
+        assert ws.receive_json()["type"] == "task.created"
+
+
+def test_task_feed_replaces_polling():
+    import asyncio
+    import httpx
+    from contextlib import AsyncExitStack
+    from backend.events import task_events
+
+    headers = {"Authorization": "Bearer feedmany"}
+    task_selects = []
+
+    def count_selects(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT") and "FROM tasks" in statement:
+            task_selects.append(statement)
+
+    async def run(clients):
+        async with AsyncExitStack() as stack, httpx.AsyncClient(app=app, base_url="http://test") as http:
+            subs = [await stack.enter_async_context(task_events.subscribe("feedmany")) for _ in range(clients)]
+            task_selects.clear()
+            task = (await http.post('/api/tasks', json={"title": "Live"}, headers=headers)).json()
+            await http.put(f"/api/tasks/{task['id']}", json={"completed": True}, headers=headers)
+            await http.delete(f"/api/tasks/{task['id']}", headers=headers)
+            selects = len(task_selects)
+            for sub in subs:
+                assert [json.loads(await sub.get())["type"] for _ in range(3)] == ["task.created", "task.updated", "task.deleted"]
+            return selects
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_selects)
+    try:
+        without_clients = asyncio.run(run(0))
+        with_clients = asyncio.run(run(1000))
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count_selects)
+    # polling would cost a list query per client per change (3000 here); pushed
+    # updates cost nothing beyond the writes' own reads
+    assert with_clients == without_clients
+
+
+def test_task_feed_backpressure():
+    import asyncio
+    from backend.events import RESYNC, Subscription
+
+    async def slow_consumer():
+        sub = Subscription(maxsize=2)
+        for i in range(5):
+            sub.put(b"event %d" % i)
+        # the backlog is replaced by one resync marker; later events queue normally
+        sub.put(b"event 5")
+        return [await sub.get() for _ in range(sub.queue.qsize())], sub.dropped
+
+    received, dropped = asyncio.run(slow_consumer())
+    assert received == [RESYNC, b"event 5"] and dropped > 0
+
+
+def test_export_import_resume(monkeypatch):
+    from backend import transfer
+    source = {"Authorization": "Bearer exporter"}
+    target = {"Authorization": "Bearer importer"}
+    done = client.post('/api/tasks', json={"title": "Exported 1", "due_date": "2030-01-01T09:00:00"}, headers=source).json()
+    client.put(f"/api/tasks/{done['id']}", json={"completed": True}, headers=source)
+    client.post('/api/tasks/bulk', json={"items": [{"title": "Exported 2"}, {"title": "Exported 3"}]}, headers=source)
+    conv = client.post('/api/chat/conversations', json={"title": "Exported chat"}, headers=source).json()
+    client.post(f"/api/chat/conversations/{conv['id']}/messages", json={"content": "hello"}, headers=source)
+
+    resp = client.get('/api/export', headers=source)
+    assert resp.headers['content-type'].startswith('application/x-ndjson')
+    lines = resp.content.decode().splitlines()
+    assert [json.loads(line)['type'] for line in lines] == ['task'] * 3 + ['conversation'] + ['message'] * 2
+
+    csv_lines = client.get('/api/export', params={"format": "csv", "kind": "tasks"}, headers=source).text.splitlines()
+    assert csv_lines[0] == "id,title,description,completed,user_id,due_date,created_at,updated_at"
+    assert csv_lines[1].startswith(f"{done['id']},Exported 1,,true,exporter,2030-01-01T09:00:00,")
+    assert client.get('/api/export', params={"format": "csv"}, headers=source).status_code == 400
+
+    # the upload breaks at line 5; lines 1-4 commit in batches of two
+    monkeypatch.setattr(transfer, 'IMPORT_BATCH_SIZE', 2)
+    broken = lines[:4] + ['{"type": "message", "content": ""}'] + lines[5:]
+    resp = client.post('/api/import', content="\n".join(broken).encode(), headers=target)
+    assert resp.status_code == 422
+    failed = resp.json()
+    assert failed['status'] == 'failed' and failed['error'].startswith('line 5:')
+    assert (failed['lines'], failed['tasks'], failed['conversations'], failed['messages']) == (4, 3, 1, 0)
+    assert client.get(f"/api/import/{failed['id']}", headers=source).status_code == 404
+
+    # resuming with the fixed file applies only the rest
+    resp = client.post('/api/import', params={"import_id": failed['id']}, content="\n".join(lines).encode(), headers=target)
+    assert resp.status_code == 200
+    assert {k: resp.json()[k] for k in ('status', 'lines', 'tasks', 'conversations', 'messages')} == {
+        'status': 'succeeded', 'lines': 6, 'tasks': 3, 'conversations': 1, 'messages': 2}
+    assert client.post('/api/import', params={"import_id": failed['id']}, content=b"", headers=target).status_code == 409
+
+    tasks = client.get('/api/tasks', params={"sort": "title"}, headers=target).json()
+    assert [(t['title'], t['completed'], t['user_id']) for t in tasks] == [
+        ("Exported 1", True, "importer"), ("Exported 2", False, "importer"), ("Exported 3", False, "importer")]
+    assert client.get('/api/tasks/stats', headers=target).json()['completed'] == 1
+    [imported] = client.get('/api/chat/conversations', headers=target).json()
+    messages = client.get(f"/api/chat/conversations/{imported['id']}/messages", headers=target).json()
+    assert [m['sender'] for m in messages] == ['user', 'bot']
+    # summaries are recomputed for imported messages
+    assert (imported['message_count'], imported['last_message_snippet']) == (2, messages[-1]['content'][:200])
+
+
+def _check_rate_limit(monkeypatch, store, prefix):
+    from backend import ratelimit
+    monkeypatch.setattr(ratelimit, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setitem(ratelimit.LIMITS, 'tasks_read', (0.01, 3))
+    monkeypatch.setattr(ratelimit, 'rate_limit_store', store)
+    greedy = {"Authorization": f"Bearer {prefix}-greedy"}
+    assert [client.get('/api/tasks', headers=greedy).status_code for _ in range(3)] == [200] * 3
+    resp = client.get('/api/tasks', headers=greedy)
+    assert resp.status_code == 429 and 0 < int(resp.headers['Retry-After']) <= 100
+    # buckets are per user and per limit
+    assert client.get('/api/tasks', headers={"Authorization": f"Bearer {prefix}-polite"}).status_code == 200
+    assert client.post('/api/tasks', json={"title": "Still allowed"}, headers=greedy).status_code == 201
+
+
+def test_rate_limit_memory_store(monkeypatch):
+    from backend.ratelimit import MemoryRateLimitStore
+    _check_rate_limit(monkeypatch, MemoryRateLimitStore(), "rl-memory")
+
+
+def test_rate_limit_shared_store(monkeypatch):
+    from backend.ratelimit import RedisRateLimitStore
+    _check_rate_limit(monkeypatch, RedisRateLimitStore(FakeRedis()), "rl-redis")
+
+
+def test_concurrent_writes_keep_counters_exact():
+    import asyncio
+    import httpx
+
+    headers = {"Authorization": "Bearer racer"}
+    ids = [r['id'] for r in client.post('/api/tasks/bulk', json={"items": [{"title": f"Race {i}"} for i in range(10)]}, headers=headers).json()['results']]
+
+    async def race():
+        async with httpx.AsyncClient(app=app, base_url="http://test") as http:
+            # two requests per task, both completing it; only one changes the row
+            done = await asyncio.gather(*(http.put(f'/api/tasks/{i}', json={"completed": True}, headers=headers) for i in ids * 2))
+            both = await asyncio.gather(*(http.patch('/api/tasks/bulk', json={"items": [{"id": i, "completed": False} for i in ids[:4]]}, headers=headers) for _ in range(2)))
+            gone = await asyncio.gather(*(http.delete(f'/api/tasks/{i}', headers=headers) for i in ids[:6] * 2))
+            bulk_gone = await asyncio.gather(*(http.request('DELETE', '/api/tasks/bulk', json={"ids": ids[6:8]}, headers=headers) for _ in range(2)))
+        await async_engine.dispose()
+        return done, both, gone, bulk_gone
+
+    done, both, gone, bulk_gone = asyncio.run(race())
+    assert all(r.status_code == 200 for r in done + both + bulk_gone)
+    assert sorted(r.status_code for r in gone) == [204] * 6 + [404] * 6
+    counters = client.get('/api/tasks/stats', headers=headers).json()
+    assert counters == client.get('/api/tasks/stats', params={"source": "aggregate"}, headers=headers).json()
+    assert (counters['total'], counters['completed'], counters['pending']) == (2, 2, 0)
+
+
+def test_coalesced_reads_share_one_query(monkeypatch):
+    import asyncio
+    import httpx
+    from backend import metrics
+
+    headers = {"Authorization": "Bearer burstuser"}
+    client.post('/api/tasks/bulk', json={"items": [{"title": f"Burst {i}"} for i in range(50)]}, headers=headers)
+    task_selects = []
+
+    def count_selects(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT") and "FROM tasks" in statement:
+            task_selects.append(statement)
+
+    async def burst(size):
+        async with httpx.AsyncClient(app=app, base_url="http://test") as http:
+            # a write first, so the burst misses the response cache
+            await http.post('/api/tasks', json={"title": "Invalidate"}, headers=headers)
+            task_selects.clear()
+            responses = await asyncio.gather(*(http.get('/api/tasks', headers=headers) for _ in range(size)))
+        assert all(r.status_code == 200 and len(r.json()) == len(responses[0].json()) for r in responses)
+        await async_engine.dispose()
+        return len(task_selects)
+
+    async def no_sharing(key, func):
+        return await func(), False
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_selects)
+    try:
+        shared_before = metrics.COALESCED.value("/api/tasks")
+        coalesced = asyncio.run(burst(20))
+        assert metrics.COALESCED.value("/api/tasks") - shared_before == 19
+        monkeypatch.setattr(cache._in_flight, 'do', no_sharing)
+        uncoalesced = asyncio.run(burst(20))
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count_selects)
+    # 20 identical concurrent reads: one list query instead of twenty
+    assert (coalesced, uncoalesced) == (1, 20)
+
+
+def test_delta_sync_with_tombstones(monkeypatch):
+    import asyncio
+    from datetime import datetime, timedelta
+    from backend import jobs, sync
+    from backend.db import async_session_scope
+    from backend.models import Job, TaskTombstone
+    from sqlmodel import select
+
+    monkeypatch.setattr(sync, 'SYNC_SETTLE_SECONDS', 0)
+    headers = {"Authorization": "Bearer syncer"}
+    ids = [r['id'] for r in client.post('/api/tasks/bulk', json={"items": [{"title": f"Sync {i}"} for i in range(3)]}, headers=headers).json()['results']]
+
+    first = client.get('/api/tasks/changes', params={"limit": 2}, headers=headers).json()
+    assert [t['id'] for t in first['tasks']] == ids[:2] and first['has_more']
+    rest = client.get('/api/tasks/changes', params={"since": first['next']}, headers=headers).json()
+    assert [t['id'] for t in rest['tasks']] == ids[2:] and not rest['has_more']
+    token = rest['next']
+    assert client.get('/api/tasks/changes', params={"since": token}, headers=headers).json()['tasks'] == []
+
+    client.put(f"/api/tasks/{ids[0]}", json={"completed": True}, headers=headers)
+    client.delete(f"/api/tasks/{ids[1]}", headers=headers)
+    created = client.post('/api/tasks', json={"title": "Sync new"}, headers=headers).json()
+    changes = client.get('/api/tasks/changes', params={"since": token}, headers=headers).json()
+    assert [(t['id'], t['completed']) for t in changes['tasks']] == [(ids[0], True), (created['id'], False)]
+    assert changes['deleted'] == [ids[1]]
+    # updated then deleted within one page: only the deletion is reported
+    client.delete(f"/api/tasks/{ids[0]}", headers=headers)
+    later = client.get('/api/tasks/changes', params={"since": token}, headers=headers).json()
+    assert [t['id'] for t in later['tasks']] == [created['id']] and sorted(later['deleted']) == sorted(ids[:2])
+
+    assert client.get('/api/tasks/changes', params={"since": "garbage"}, headers=headers).status_code == 400
+    old = datetime.utcnow() - timedelta(days=sync.TOMBSTONE_RETENTION_DAYS + 1)
+    expired = sync.encode_token((old, 0, old, 0))
+    assert client.get('/api/tasks/changes', params={"since": expired}, headers=headers).status_code == 410
+
+    async def compact():
+        async with async_session_scope() as session:
+            tombstones = (await session.exec(select(TaskTombstone).where(TaskTombstone.user_id == 'syncer'))).all()
+            tombstones[0].deleted_at = old
+            session.add(tombstones[0])
+            result = await jobs.HANDLERS['prune'](session, Job(kind='prune', payload={}))
+            await session.commit()
+            remaining = (await session.exec(select(TaskTombstone.task_id).where(TaskTombstone.user_id == 'syncer'))).all()
+        await async_engine.dispose()
+        return result, remaining
+
+    result, remaining = asyncio.run(compact())
+    assert result['deleted_tombstones'] >= 1 and len(remaining) == 1
+
+
+def test_sync_token_without_deletions_does_not_expire():
+    import asyncio
+    from datetime import datetime, timedelta
+    from backend import sync
+    from backend.db import async_session_scope
+
+    headers = {"Authorization": "Bearer dailysyncer"}
+    client.post('/api/tasks', json={"title": "Synced daily"}, headers=headers)
+
+    async def sync_daily(days):
+        start = datetime.utcnow() - timedelta(days=days)
+        position = sync.initial_position(start)
+        try:
+            for day in range(days):
+                async with async_session_scope() as session:
+                    page = await sync.changes_since(session, 'dailysyncer', position, 100, start + timedelta(days=day))
+                position = sync.decode_token(page.next)
+        finally:
+            await async_engine.dispose()
+        return page.next
+
+    # daily syncs with no deletions span the retention window without the token expiring
+    token = asyncio.run(sync_daily(sync.TOMBSTONE_RETENTION_DAYS + 5))
+    resp = client.get('/api/tasks/changes', params={"since": token}, headers=headers)
+    assert resp.status_code == 200 and resp.json()['deleted'] == []
+
+
+def test_schema_revision_check():
+    import asyncio
+    import os
+    from alembic.script import ScriptDirectory
+    from backend import db
+    from sqlalchemy import text
+
+    # the expected revision must follow the migrations
+    scripts = ScriptDirectory(os.path.join(os.path.dirname(db.__file__), 'alembic'))
+    assert db.SCHEMA_REVISION == scripts.get_current_head()
+
+    async def check():
+        try:
+            return await db.check_schema_revision()
+        except db.SchemaOutOfDate as e:
+            return e
+        finally:
+            await async_engine.dispose()
+
+    # the test database is built with create_all, so it has no revision yet
+    assert isinstance(asyncio.run(check()), db.SchemaOutOfDate)
+    with db.engine.begin() as conn:
+        conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+        conn.execute(text("INSERT INTO alembic_version VALUES ('0009_imports')"))
+    try:
+        assert 'expects ' + db.SCHEMA_REVISION in str(asyncio.run(check()))
+        with db.engine.begin() as conn:
+            conn.execute(text("UPDATE alembic_version SET version_num = :v"), {"v": db.SCHEMA_REVISION})
+        assert asyncio.run(check()) == db.SCHEMA_REVISION
+    finally:
+        with db.engine.begin() as conn:
+            conn.execute(text("DROP TABLE alembic_version"))
+
+
+def test_lazy_routers():
+    from fastapi import FastAPI
+    from backend.startup import LazyRouters, StartupMiddleware
+
+    lazy_app = FastAPI()
+    routers = LazyRouters(lazy_app, {"backend.routes.jobs": ("/api/jobs",)})
+    lazy_app.add_middleware(StartupMiddleware, routers=routers)
+    lazy_client = TestClient(lazy_app)
+
+    assert lazy_client.get('/api/tasks').status_code == 404
+    assert routers.pending and not routers.loaded
+    # included by the first request under its prefix, which it then serves
+    assert lazy_client.get('/api/jobs/1', headers=AUTH).status_code == 404
+    assert routers.loaded == ["backend.routes.jobs"] and not routers.pending
+    assert lazy_client.get('/api/jobs/1').status_code == 401
+
+    # the app's OpenAPI schema lists routes that were not loaded yet
+    assert '/api/export' in client.get('/openapi.json').json()['paths']
+
+
+def test_read_replicas(monkeypatch, tmp_path):
+    import asyncio
+    import pytest
+    from sqlalchemy import exc
+    from backend import db
+    from backend.models import Task
+    from sqlmodel import Session, SQLModel, create_engine
+
+    # a "replica" holding a task the primary does not have, and one that is unreachable
+    replica_url = f"sqlite:///{tmp_path / 'replica.db'}"
+    replica = create_engine(replica_url)
+    SQLModel.metadata.create_all(replica)
+    with Session(replica) as session:
+        session.add(Task(user_id='reader', title='Only on the replica'))
+        session.commit()
+    replica.dispose()
+    previous = db.replicas
+    db.configure_replicas(db.ReplicaSet([f"sqlite:///{tmp_path / 'missing' / 'down.db'}", replica_url]))
+    headers = {"Authorization": "Bearer reader"}
+
+    def titles(**params):
+        return [t['title'] for t in client.get('/api/tasks', params=params, headers=headers).json()]
+
+    try:
+        # a replica failing with a connection error is marked down; reads then use the others
+        with pytest.raises(exc.OperationalError):
+            titles(sort='created')
+        assert titles(sort='title') == ['Only on the replica']
+        assert db.replicas.healthy == [False, True]
+        assert titles(sort='due_date') == ['Only on the replica']
+
+        # read-your-writes: right after a write the user's reads go to the primary
+        client.post('/api/tasks', json={"title": "Just written"}, headers=headers)
+        assert titles(status='pending') == ['Just written']
+        monkeypatch.setattr(cache, 'READ_YOUR_WRITES_SECONDS', 0)
+        assert titles(status='pending', sort='title') == ['Only on the replica']
+
+        async def check():
+            try:
+                return await db.replicas.check()
+            finally:
+                await db.replicas.dispose()
+
+        assert asyncio.run(check()) == [False, True]
+        # no healthy replica: the primary serves every read
+        db.replicas.healthy[1] = False
+        assert titles(status='pending', sort='due_date') == ['Just written']
+    finally:
+        db.configure_replicas(previous)
+
+
+def test_lagging_replica_is_not_cached(monkeypatch, tmp_path):
+    import asyncio
+    import time
+    from backend import db
+    from backend.models import Task
+    from sqlmodel import Session, SQLModel, create_engine
+
+    replica_url = f"sqlite:///{tmp_path / 'lagging.db'}"
+    replica = create_engine(replica_url)
+    SQLModel.metadata.create_all(replica)
+    previous = db.replicas
+    db.configure_replicas(db.ReplicaSet([replica_url]))
+    # replication lag longer than the read-your-writes window
+    monkeypatch.setattr(cache, 'READ_YOUR_WRITES_SECONDS', 0)
+    headers = {"Authorization": "Bearer lagger"}
+    try:
+        client.post('/api/tasks', json={"title": "Written"}, headers=headers)
+        stale = client.get('/api/tasks', headers=headers)
+        assert stale.json() == [] and 'ETag' not in stale.headers
+        # once the replica catches up, the same version serves the write
+        with Session(replica) as session:
+            session.add(Task(user_id='lagger', title='Written'))
+            session.commit()
+        assert [t['title'] for t in client.get('/api/tasks', headers=headers).json()] == ['Written']
+    finally:
+        db.configure_replicas(previous)
+        replica.dispose()
+
+    async def expiring():
+        memory = cache.MemoryCache(ttl=0.05)
+        await memory.set('k', b'body')
+        fresh = await memory.get('k')
+        time.sleep(0.06)
+        return fresh, await memory.get('k')
+
+    assert asyncio.run(expiring()) == (b'body', None)
+
+    from starlette.requests import Request
+
+    async def replica_and_primary():
+        async def build(body):
+            await asyncio.sleep(0.05)
+            return body, {}
+
+        requests = [Request({"type": "http", "method": "GET", "path": "/api/tasks", "query_string": b"", "headers": []})
+                    for _ in range(2)]
+        requests[0].state.read_replica = True
+        # concurrent identical misses, one on a lagging replica, one kept on the primary
+        responses = await asyncio.gather(
+            cache.cached_json_response(requests[0], 'flighter', lambda: build(b'[]')),
+            cache.cached_json_response(requests[1], 'flighter', lambda: build(b'["written"]')),
+        )
+        return [r.body for r in responses]
+
+    assert asyncio.run(replica_and_primary()) == [b'[]', b'["written"]']
+
+
+def test_due_overdue_and_reminders(monkeypatch):
+    import asyncio
+    from datetime import datetime, timedelta
+    from backend import deadlines
+
+    headers = {"Authorization": "Bearer deadliner"}
+    now = datetime.utcnow()
+    due = {title: (now + offset).isoformat() for title, offset in (
+        ("Late 2d", timedelta(days=-2)), ("Late 1h", timedelta(hours=-1)), ("Soon", timedelta(hours=1)),
+        ("Next week", timedelta(days=6)), ("Next month", timedelta(days=30)),
+    )}
+    items = [{"title": title, "due_date": at} for title, at in due.items()]
+    items += [{"title": "Done", "due_date": due["Late 1h"]}, {"title": "Undated"}]
+    done = client.post('/api/tasks/bulk', json={"items": items}, headers=headers).json()['results'][-2]['id']
+    client.put(f'/api/tasks/{done}', json={"completed": True}, headers=headers)
+
+    def titles(path, **params):
+        resp = client.get(path, params=params, headers=headers)
+        assert resp.status_code == 200
+        return [t['title'] for t in resp.json()], resp.headers.get('X-Next-Cursor')
+
+    assert titles('/api/tasks/due') == (["Soon", "Next week"], None)
+    assert titles('/api/tasks/due', within=7200)[0] == ["Soon"]
+    first, cursor = titles('/api/tasks/overdue', limit=1)
+    assert first == ["Late 2d"] and cursor
+    assert titles('/api/tasks/overdue', limit=1, cursor=cursor) == (["Late 1h"], None)
+    assert client.get('/api/tasks/overdue', params={"cursor": "garbage"}, headers=headers).status_code == 400
+
+    sent = []
+
+    async def capture(user_id, event):
+        sent.append((user_id, event['type'], event['task']['title']))
+
+    monkeypatch.setattr(deadlines, 'publish_task_event', capture)
+
+    async def scan():
+        try:
+            # the first run only records where later runs start
+            assert await deadlines.claim_window(now - timedelta(hours=3)) is None
+            first = await deadlines.scan_overdue(now + timedelta(hours=2), batch_size=1)
+            again = await deadlines.scan_overdue(now + timedelta(hours=2))
+            return first, again
+        finally:
+            await async_engine.dispose()
+
+    first, again = asyncio.run(scan())
+    mine = [s for s in sent if s[0] == 'deadliner']
+    # deadlines that passed in the window, once each; completed tasks are skipped
+    assert mine == [('deadliner', 'task.overdue', 'Late 1h'), ('deadliner', 'task.overdue', 'Soon')]
+    assert first['reminded'] == len(sent) and first['batches'] >= 2
+    assert again == {"reminded": 0, "batches": 0}
@@ -0,0 +1,238 @@
+"""Streaming export and resumable import of a user's tasks and chats.
+
+Export reads through a server-side cursor (`yield_per`) and encodes one
+partition of `EXPORT_CHUNK_ROWS` rows at a time, so memory stays flat however
+many rows a user has. NDJSON records carry a `type` (`task`, `conversation`,
+`message`); conversations come before the messages that reference them.
+
+Import consumes the same NDJSON line by line as the upload arrives. Every
+`IMPORT_BATCH_SIZE` lines are inserted in one transaction together with the
+import's progress row (`imports`), so after a failure the committed prefix is
+known exactly: re-posting the same file with the `import_id` skips it.
+"""
+import csv
+import io
+import os
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Sequence, Tuple
+
+from pydantic import validate_model
+from sqlalchemy import insert, update
+from sqlmodel import select
+
+from .cache import bump_user_version
+from .conversations import refresh_summaries
+from .db import async_session_scope
+from .events import publish_task_event
+from .models import (
+    ChatConversation, ChatConversationImport, ChatConversationRead, ChatMessage, ChatMessageImport,
+    ChatMessageRead, ImportRun, Task, TaskImport, TaskRead,
+)
+from .serialization import dumps, loads, read_columns
+from .stats import adjust_counters
+
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", "1000"))
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_LINE_BYTES = 1 << 20
+
+RUNNING, SUCCEEDED, FAILED = "running", "succeeded", "failed"
+
+# export kind -> (record type, fields, columns, model)
+EXPORTS = {
+    "tasks": ("task", *read_columns(TaskRead, Task), Task),
+    "conversations": ("conversation", *read_columns(ChatConversationRead, ChatConversation), ChatConversation),
+    "messages": ("message", *read_columns(ChatMessageRead, ChatMessage), ChatMessage),
+}
+RECORD_MODELS = {"task": TaskImport, "conversation": ChatConversationImport, "message": ChatMessageImport}
+
+
+async def _partitions(session, kind: str, user_id: str) -> AsyncIterator[Sequence[tuple]]:
+    _, _, columns, model = EXPORTS[kind]
+    stmt = select(*columns).where(model.user_id == user_id).order_by(model.id)
+    result = await session.stream(stmt.execution_options(yield_per=EXPORT_CHUNK_ROWS))
+    async for rows in result.partitions():
+        yield rows
+
+
+async def export_ndjson(user_id: str, kinds: Sequence[str]) -> AsyncIterator[bytes]:
+    """The user's rows of each kind as NDJSON, one chunk per partition."""
+    async with async_session_scope() as session:
+        for kind in kinds:
+            record_type, fields = EXPORTS[kind][:2]
+            async for rows in _partitions(session, kind, user_id):
+                yield b"".join(dumps({"type": record_type, **dict(zip(fields, row))}) + b"\n" for row in rows)
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def export_csv(user_id: str, kind: str) -> AsyncIterator[bytes]:
+    """The user's rows of one kind as CSV with a header row."""
+    fields = EXPORTS[kind][1]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    async with async_session_scope() as session:
+        async for rows in _partitions(session, kind, user_id):
+            writer.writerows([_csv_value(value) for value in row] for row in rows)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        # no rows: just the header
+        yield buffer.getvalue().encode()
+
+
+class ImportLineError(ValueError):
+    def __init__(self, line: int, detail: str):
+        super().__init__(f"line {line}: {detail}")
+        self.line = line
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a byte stream into lines without holding more than one line in memory."""
+    buffer = b""
+    count = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            count += 1
+            yield line
+        if len(buffer) > IMPORT_MAX_LINE_BYTES:
+            raise ImportLineError(count + 1, f"line longer than {IMPORT_MAX_LINE_BYTES} bytes")
+    if buffer:
+        yield buffer
+
+
+class Importer:
+    """Applies NDJSON records to one user's data in batched transactions."""
+
+    def __init__(self, run: ImportRun, batch_size: int = 0):
+        self.run = run
+        self.batch_size = batch_size or IMPORT_BATCH_SIZE
+        self.conversation_ids: Dict[int, int] = {int(k): v for k, v in run.conversation_ids.items()}
+        self.pending: List[Tuple[str, dict]] = []
+        self.pending_conversations = set()
+        # last input line parsed (committed or pending)
+        self.parsed_through = run.lines
+
+    def _parse(self, number: int, line: bytes) -> Tuple[str, dict]:
+        try:
+            data = loads(line)
+        except ValueError:
+            raise ImportLineError(number, "invalid JSON")
+        if not isinstance(data, dict) or data.get("type") not in RECORD_MODELS:
+            raise ImportLineError(number, f"type must be one of {', '.join(RECORD_MODELS)}")
+        record_type = data["type"]
+        # validated values only; building model instances would double the parse cost
+        record, _, error = validate_model(RECORD_MODELS[record_type], data)
+        if error is not None:
+            first = error.errors()[0]
+            raise ImportLineError(number, f"{'.'.join(map(str, first['loc']))}: {first['msg']}")
+        if record_type == "conversation":
+            self.pending_conversations.add(record["id"])
+        elif record_type == "message" and not (
+            record["conversation_id"] in self.conversation_ids
+            or record["conversation_id"] in self.pending_conversations
+        ):
+            raise ImportLineError(number, f"unknown conversation {record['conversation_id']}")
+        return record_type, record
+
+    async def feed(self, lines: AsyncIterator[bytes]) -> None:
+        """Apply `lines`, skipping those a previous attempt already committed."""
+        number = 0
+        try:
+            async for line in lines:
+                number += 1
+                if number <= self.run.lines:
+                    continue
+                if line.strip():
+                    self.pending.append(self._parse(number, line))
+                self.parsed_through = number
+                if len(self.pending) >= self.batch_size:
+                    await self.flush()
+        finally:
+            # whatever parsed before a failure is still applied
+            await self.flush()
+
+    async def flush(self) -> None:
+        if self.parsed_through == self.run.lines:
+            return
+        run = self.run
+        now = datetime.utcnow()
+        tasks, messages, completed, conversations = [], [], 0, 0
+        conversation_ids = dict(self.conversation_ids)
+        async with async_session_scope() as session:
+            for record_type, record in self.pending:
+                created = record["created_at"] or now
+                if record_type == "task":
+                    # stamped now, so delta sync reports imported tasks as changes
+                    tasks.append({**record, "user_id": run.user_id, "created_at": created, "updated_at": now})
+                    completed += record["completed"]
+                elif record_type == "conversation":
+                    conv = ChatConversation(user_id=run.user_id, title=record["title"],
+                                            created_at=created, updated_at=record["updated_at"] or created)
+                    session.add(conv)
+                    # the new id is needed by this batch's messages
+                    await session.flush()
+                    conversation_ids[record["id"]] = conv.id
+                    conversations += 1
+                else:
+                    messages.append({
+                        **record, "user_id": run.user_id, "created_at": created,
+                        "conversation_id": conversation_ids[record["conversation_id"]],
+                    })
+            if tasks:
+                await session.execute(insert(Task), tasks)
+                await adjust_counters(session, run.user_id, total=len(tasks), completed=completed)
+            if messages:
+                await session.execute(insert(ChatMessage), messages)
+                await refresh_summaries(session, {message["conversation_id"] for message in messages})
+            progress = {
+                "lines": self.parsed_through,
+                "tasks": run.tasks + len(tasks),
+                "conversations": run.conversations + conversations,
+                "messages": run.messages + len(messages),
+                "conversation_ids": {str(k): v for k, v in conversation_ids.items()},
+                "updated_at": now,
+            }
+            await session.execute(update(ImportRun).where(ImportRun.id == run.id).values(**progress))
+            await session.commit()
+        for key, value in progress.items():
+            setattr(run, key, value)
+        self.conversation_ids = conversation_ids
+        self.pending = []
+        self.pending_conversations = set()
+
+
+async def import_ndjson(run: ImportRun, chunks: AsyncIterator[bytes], batch_size: int = 0) -> ImportRun:
+    """Import an NDJSON byte stream into `run`'s user; returns the run with its outcome.
+
+    The run ends `succeeded`, or `failed` with `error` set and `lines` at the last
+    committed line.
+    """
+    importer = Importer(run, batch_size)
+    imported_tasks = run.tasks
+    try:
+        await importer.feed(iter_lines(chunks))
+        run.status, run.error = SUCCEEDED, None
+    except Exception as e:
+        run.status, run.error = FAILED, str(e) or type(e).__name__
+    async with async_session_scope() as session:
+        await session.execute(
+            update(ImportRun).where(ImportRun.id == run.id).values(status=run.status, error=run.error)
+        )
+        await session.commit()
+    await bump_user_version(run.user_id)
+    if run.tasks != imported_tasks:
+        # one refetch instead of an event per imported task
+        await publish_task_event(run.user_id, {"type": "resync"})
+    return run
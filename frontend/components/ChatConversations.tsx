@@ -8,6 +8,9 @@ type Conversation = {
     title: string
     created_at: string
     updated_at: string
+    message_count: number
+    last_message_at: string | null
+    last_message_snippet: string | null
 }
 
 type ChatConversationsProps = {
@@ -97,6 +100,7 @@ export default function ChatConversations({ onSelectConversation, selectedId }:
 }
                             >
     <p className="font-medium text-xs sm:text-sm text-gray-900 truncate" > { conv.title } </p>
+    { conv.last_message_snippet && <p className="text-xs text-gray-600 truncate" > { conv.last_message_snippet } </p>}
         < p className = "text-xs text-gray-500" >
             { new Date(conv.updated_at).toLocaleDateString() }
             </p>